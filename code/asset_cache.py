@@ -0,0 +1,184 @@
+import json
+import mmap
+import struct
+from hashlib import blake2b
+from os import makedirs, replace, stat, walk
+from os.path import dirname, exists, isdir, join, relpath
+from time import perf_counter
+from typing import Any, Callable
+
+from settings import *
+
+
+def source_files(*path) -> list[str]:
+    full_path = join(BASE_DIR,*path)
+    if not isdir(full_path):
+        return [full_path]
+    files: list[str] = []
+    for folder_path, _, file_names in walk(full_path):
+        files.extend(join(folder_path,file_name) for file_name in file_names)
+    return sorted(files)
+
+def file_hash(full_path: str) -> str:
+    with open(full_path,'rb') as file:
+        return blake2b(file.read(),digest_size=16).hexdigest()
+
+
+class Pixels():
+    """Raw BGRA pixels of one image; safe to build and pass around on any thread, unlike a surface."""
+
+    def __init__(self, data: bytes | memoryview, size: tuple[int, int]):
+        self.data = data
+        self.size = size
+
+    def surface(self) -> pygame.Surface:
+        return pygame.image.frombuffer(self.data,self.size,'BGRA')
+
+def surfaces(value: Any):
+    # the same tree with every Pixels leaf turned into a surface sharing its buffer
+    if isinstance(value,Pixels):
+        return value.surface()
+    if isinstance(value,dict):
+        return { key: surfaces(item) for key, item in value.items() }
+    return [surfaces(item) for item in value]
+
+
+class AssetPack():
+    """Single file holding pre-baked asset surfaces as raw BGRA pixels.
+
+    Layout: header (magic, index offset, index size), pixel blobs, JSON index.
+    Every registered key records the hash and mtime of its source files, so
+    stale keys are rebuilt on load while fresh ones are memory mapped and
+    turned back into surfaces without copying the pixels.
+    """
+
+    MAGIC = b'TMLPACK1'
+    HEADER = struct.Struct('<8sQQ')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, tuple[list[str], Callable[[], Any], bool]] = {}
+        self.index: dict[str, dict[str, Any]] = {}
+        self.built: dict[str, Any] = {}
+        self.buffer: memoryview | None = None
+        self.file = None
+        self.data: mmap.mmap | None = None
+        self.rebuilt: list[str] = []
+        self.touched: list[str] = []
+        self.timings: dict[str, float] = {}
+
+    def register(self, key: str, sources: list[str], builder: Callable[[], Any], decode_sources = True):
+        self.entries[key] = (sources, builder, decode_sources)
+
+    def __getitem__(self, key: str):
+        if key in self.built:
+            return self.built[key]
+        return surfaces(self.pixels(key))
+
+    def pixels(self, key: str):
+        # the entry as Pixels leaves over the mapping, for loaders that run off the main thread
+        if key in self.built:
+            return self.built[key]
+        return self.restore(self.index[key]['tree'])
+
+    # freshness
+    def is_fresh(self, key: str) -> bool:
+        entry = self.index.get(key)
+        sources = self.entries[key][0]
+        if not entry or sorted(entry['sources']) != sorted(relpath(source,BASE_DIR) for source in sources):
+            return False
+        for source in sources:
+            mtime, digest = entry['sources'][relpath(source,BASE_DIR)]
+            current_mtime = stat(source).st_mtime_ns
+            if current_mtime != mtime:
+                if file_hash(source) != digest:
+                    return False
+                entry['sources'][relpath(source,BASE_DIR)] = [current_mtime, digest]
+                self.touched.append(key)
+        return True
+
+    # reading
+    def read(self):
+        # the pack is mapped once; the header and index are parsed from the mapping and the pixels stay in it
+        if not exists(self.path) or stat(self.path).st_size < self.HEADER.size:
+            return
+        self.file = open(self.path,'rb')
+        self.data = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+        magic, index_offset, index_size = self.HEADER.unpack_from(self.data)
+        if magic != self.MAGIC:
+            self.unmap()
+            return
+        self.index = json.loads(self.data[index_offset:index_offset + index_size])
+        self.buffer = memoryview(self.data)
+
+    def unmap(self):
+        # surfaces restored from the old mapping keep it alive until they are gone
+        self.buffer = self.data = None
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def restore(self, tree: list):
+        match tree[0]:
+            case 'surface':
+                offset, width, height = tree[1:]
+                return Pixels(self.buffer[offset:offset + width * height * 4],(width,height))
+            case 'list':
+                return [self.restore(item) for item in tree[1]]
+            case 'dict':
+                return {key: self.restore(item) for key, item in tree[1].items()}
+
+    # writing
+    def serialize(self, value: Any, blobs: list[bytes], offset: list[int], seen: dict[int, list]) -> list:
+        if isinstance(value,(Pixels,pygame.Surface)):
+            if id(value) not in seen:
+                if isinstance(value,Pixels):
+                    blob, size = bytes(value.data), value.size
+                else:
+                    surf = value if value.get_flags() & pygame.SRCALPHA else value.convert_alpha()
+                    blob, size = pygame.image.tobytes(surf,'BGRA'), surf.get_size()
+                blobs.append(blob)
+                seen[id(value)] = ['surface',offset[0],*size]
+                offset[0] += len(blob)
+            return seen[id(value)]
+        if isinstance(value,dict):
+            return ['dict',{ key: self.serialize(item,blobs,offset,seen) for key, item in value.items()}]
+        return ['list',[self.serialize(item,blobs,offset,seen) for item in value]]
+
+    def write(self):
+        blobs: list[bytes] = []
+        offset = [self.HEADER.size]
+        index: dict[str, dict[str, Any]] = {}
+        for key, (sources, _, _) in self.entries.items():
+            if key in self.built:
+                hashes = { relpath(source,BASE_DIR): [stat(source).st_mtime_ns, file_hash(source)] for source in sources }
+            else:
+                hashes = self.index[key]['sources']
+            index[key] = {'sources': hashes, 'tree': self.serialize(self.pixels(key),blobs,offset,{})}
+
+        index_data = json.dumps(index).encode()
+        makedirs(dirname(self.path),exist_ok=True)
+        with open(self.path + '.tmp','wb') as file:
+            file.write(self.HEADER.pack(self.MAGIC,offset[0],len(index_data)))
+            for blob in blobs:
+                file.write(blob)
+            file.write(index_data)
+        self.unmap()
+        replace(self.path + '.tmp',self.path)
+
+    def load(self, prefetch: Callable[[list[str]], None] | None = None):
+        self.read()
+        stale = [key for key in self.entries if not self.is_fresh(key)]
+        if prefetch:
+            prefetch([source for key in stale if self.entries[key][2] for source in self.entries[key][0]])
+
+        for key in stale:
+            start = perf_counter()
+            self.built[key] = self.entries[key][1]()
+            self.timings[key] = perf_counter() - start
+            self.rebuilt.append(key)
+        if self.rebuilt or self.touched or set(self.index) != set(self.entries):
+            # the rewritten pack is mapped in place of the old one
+            self.write()
+            self.read()
+            self.built.clear()
@@ -0,0 +1,249 @@
+import gc
+from math import inf
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+from settings import *
+from game_tables import *
+from battle_state import BattleState, Fighter, random_action, strongest_action
+
+
+class Profile():
+    """What the search needs of a fighter that stays fixed during a battle."""
+
+    __slots__ = ('fighter', 'stats', 'entity', 'max_health', 'max_energy', 'defense', 'speed', 'regen', 'element', 'abilities', 'min_cost')
+
+    def __init__(self, fighter: Fighter):
+        monster = fighter.monster
+        self.fighter = fighter
+        self.stats = monster.stats
+        self.entity = fighter.entity
+        self.max_health, self.max_energy, _, self.defense, recovery, self.speed = monster.stats
+        self.regen = recovery * 0.009
+        self.element = SPECIES_ELEMENTS[monster.species]
+
+        # (name, cost, base damage, element id, targets own side) per unlocked ability
+        self.abilities = tuple(
+            (ability, cost, monster.get_base_damage(ability), ATTACK_ELEMENTS[ATTACK_IDS[ability]], ATTACK_TARGETS[ATTACK_IDS[ability]] == 'player')
+            for ability, cost in monster.unlocked
+        )
+        self.min_cost = min((ability[1] for ability in self.abilities),default=inf)
+
+
+class SimFighter():
+    """The changing numbers of one fighter; a copy is four floats and a profile reference."""
+
+    __slots__ = ('profile', 'health', 'energy', 'initiative', 'defending')
+
+    def __init__(self, profile: Profile, health: float, energy: float, initiative: float, defending: bool):
+        self.profile = profile
+        self.health, self.energy, self.initiative, self.defending = health, energy, initiative, defending
+
+    def copy(self) -> 'SimFighter':
+        return SimFighter(self.profile,self.health,self.energy,self.initiative,self.defending)
+
+    def turn_wait(self) -> float:
+        # seconds until its turn, TurnQueue.turn_frame() without the per-frame rounding
+        profile = self.profile
+        if profile.speed <= 0 or profile.min_cost == inf:
+            return inf
+        wait = (100 - self.initiative) / profile.speed
+        if profile.min_cost >= self.energy:
+            if profile.regen <= 0 or profile.min_cost >= profile.max_energy:
+                return inf
+            wait = max(wait,(profile.min_cost - self.energy) / profile.regen)
+        return wait
+
+
+class SimState():
+    """Cheap copy of the fighters on the field, stepped turn by turn with the BattleState formulas.
+
+    Only running time is modelled: the opponent delay, attack animations and
+    kill delays pause everyone in BattleState, so they do not change the turn
+    order. Monsters on the bench and xp are left out.
+    """
+
+    __slots__ = ('fighters',)
+
+    def __init__(self, fighters: list[SimFighter]):
+        self.fighters = fighters
+
+    @classmethod
+    def from_battle(cls, state: BattleState, profiles: dict[Fighter, Profile]) -> 'SimState':
+        # profiles are reused until a level up or evolution gives the monster other stats
+        state.sync()
+        fighters = []
+        for fighter in state.fighters['player'] + state.fighters['opponent']:
+            if fighter.kill_time is None:
+                if fighter not in profiles or profiles[fighter].stats is not fighter.monster.stats:
+                    profiles[fighter] = Profile(fighter)
+                monster = fighter.monster
+                fighters.append(SimFighter(profiles[fighter],monster.health,monster.energy,monster.initiative,monster.defending))
+        return cls(fighters)
+
+    def copy(self) -> 'SimState':
+        return SimState([fighter.copy() for fighter in self.fighters])
+
+    def next_turn(self) -> Optional[SimFighter]:
+        waits = [fighter.turn_wait() for fighter in self.fighters]
+        wait = min(waits,default=inf)
+        if wait == inf:
+            return None
+        for fighter in self.fighters:
+            profile = fighter.profile
+            fighter.initiative += profile.speed * wait
+            fighter.energy = min(fighter.energy + profile.regen * wait,profile.max_energy)
+        actor = self.fighters[waits.index(wait)]
+        actor.initiative, actor.defending = 0, False
+        return actor
+
+    def damage(self, target: SimFighter, amount: float, element: int) -> float:
+        # BattleState.damage
+        amount *= ELEMENT_MATRIX[element][target.profile.element]
+        target_defense = 1 - (target.profile.defense / 2000)
+        if target.defending:
+            target_defense -= 0.2
+        return amount * max(0,min(1,target_defense))
+
+    def actions(self, actor: SimFighter, every_target: bool) -> list[tuple[int, int]]:
+        # (ability slot, target position), slot -1 defends; below the root only the target an ability hits best is kept
+        actions = [(-1, -1)]
+        for slot, (_, cost, amount, element, own_side) in enumerate(actor.profile.abilities):
+            if cost >= actor.energy:
+                continue
+            targets = [position for position, fighter in enumerate(self.fighters) if (fighter.profile.entity == actor.profile.entity) == own_side]
+            if every_target:
+                actions.extend((slot, position) for position in targets)
+            elif targets:
+                actions.append((slot, max(targets,key=lambda position: self.gain(actor,self.fighters[position],amount,element))))
+        return actions
+
+    def gain(self, actor: SimFighter, target: SimFighter, amount: float, element: int) -> float:
+        # health taken from an enemy or given back to a teammate, as strongest_action scores it
+        amount = self.damage(target,amount,element)
+        if target.profile.entity == actor.profile.entity:
+            return min(-amount,target.profile.max_health - target.health)
+        return min(amount,target.health)
+
+    def apply(self, actor: SimFighter, action: tuple[int, int]):
+        slot, position = action
+        if slot < 0:
+            actor.defending = True
+            return
+        _, cost, amount, element, _ = actor.profile.abilities[slot]
+        actor.energy -= cost
+        target = self.fighters[position]
+        target.health = max(0,min(round(target.health - self.damage(target,amount,element),2),target.profile.max_health))
+        if target.health <= 0:
+            del self.fighters[position]
+
+    def evaluate(self, entity: str) -> float:
+        # health share of every fighter standing, plus half a point for standing at all
+        score = 0.0
+        for fighter in self.fighters:
+            value = fighter.health / fighter.profile.max_health + 0.5
+            score += value if fighter.profile.entity == entity else -value
+        return score
+
+
+class TimeUp(Exception):
+    pass
+
+
+class LookaheadAI():
+    """Opponent policy that searches the next turns with expectimax.
+
+    Turns of its own side are max nodes and turns of the other side are
+    chance nodes over that side's actions, all equally likely. The search
+    deepens one turn at a time and keeps the answer of the deepest level that
+    finished before its deadline. `budget` is the hard limit of a decision in
+    ms. The clock starts before the state is copied and every node checks
+    it against a deadline BATTLE_AI_MARGIN ms before the budget, which
+    leaves room for the last node and unwinding; the garbage collector is
+    held off until the decision is made. `mistakes` is the share of turns
+    played with random_action instead.
+    """
+
+    def __init__(self, depth: int, budget: float, mistakes: float):
+        self.depth = depth
+        self.budget = budget
+        self.mistakes = mistakes
+        self.deadline = 0.0
+        self.battle: BattleState | None = None
+        self.profiles: dict[Fighter, Profile] = {}
+        self.nodes = 0
+        self.reached = 0
+
+    def __call__(self, state: BattleState, fighter: Fighter) -> tuple[str, Any]:
+        if state.rng.random() < self.mistakes:
+            return random_action(state,fighter)
+
+        self.deadline = perf_counter() + (self.budget - BATTLE_AI_MARGIN) / 1000
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            return self.search(state,fighter)
+        finally:
+            if collecting:
+                gc.enable()
+
+    def search(self, state: BattleState, fighter: Fighter) -> tuple[str, Any]:
+        self.nodes, self.reached = 0, 0
+        if state is not self.battle:
+            self.battle, self.profiles = state, {}
+        root = SimState.from_battle(state,self.profiles)
+        actor = next((sim for sim in root.fighters if sim.profile.fighter is fighter),None)
+        if actor is None:
+            return strongest_action(state,fighter)
+
+        best: Optional[tuple[int, int]] = None
+        try:
+            for depth in range(1,self.depth + 1):
+                best = self.best_action(root,actor,depth)
+                self.reached = depth
+        except TimeUp:
+            pass
+        if best is None:
+            return strongest_action(state,fighter)
+
+        slot, position = best
+        if slot < 0:
+            return 'defend', None
+        return actor.profile.abilities[slot][0], root.fighters[position].profile.fighter
+
+    def best_action(self, root: SimState, actor: SimFighter, depth: int) -> tuple[int, int]:
+        best, best_value = None, -inf
+        for action in root.actions(actor,every_target=True):
+            if perf_counter() > self.deadline:
+                raise TimeUp
+            child = root.copy()
+            child.apply(child.fighters[root.fighters.index(actor)],action)
+            value = self.value(child,depth - 1,actor.profile.entity)
+            if value > best_value:
+                best, best_value = action, value
+        return best
+
+    def value(self, state: SimState, depth: int, entity: str) -> float:
+        self.nodes += 1
+        if perf_counter() > self.deadline:
+            raise TimeUp
+        if depth == 0 or len({fighter.profile.entity for fighter in state.fighters}) < 2:
+            return state.evaluate(entity)
+        actor = state.next_turn()
+        if actor is None:
+            return state.evaluate(entity)
+
+        position = state.fighters.index(actor)
+        values = []
+        for action in state.actions(actor,every_target=False):
+            child = state.copy()
+            child.apply(child.fighters[position],action)
+            values.append(self.value(child,depth - 1,entity))
+        return max(values) if actor.profile.entity == entity else sum(values) / len(values)
+
+
+def trainer_policy(character_data: dict) -> Callable[[BattleState, Fighter], tuple[str, Any]]:
+    # trainers without a difficulty keep the original random opponent
+    if 'difficulty' not in character_data:
+        return random_action
+    return LookaheadAI(**BATTLE_AI[character_data['difficulty']])
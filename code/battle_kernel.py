@@ -0,0 +1,237 @@
+import numpy as np
+
+from settings import *
+import game_tables
+from game_tables import SPECIES
+from battle_state import accumulation
+
+
+# game_tables as arrays
+SPECIES_STATS = np.array([game_tables.STAT_CURVES[species][1] for species in range(len(SPECIES))],dtype=np.float64)
+SPECIES_ELEMENTS = np.array(game_tables.SPECIES_ELEMENTS,dtype=np.int8)
+ELEMENT_MULTIPLIERS = np.array(game_tables.ELEMENT_MATRIX)
+
+ATTACK_AMOUNTS = np.array(game_tables.ATTACK_AMOUNTS,dtype=np.float64)
+ATTACK_COSTS = np.array(game_tables.ATTACK_COSTS,dtype=np.float64)
+ATTACK_ELEMENTS = np.array(game_tables.ATTACK_ELEMENTS)
+ATTACK_OWN_SIDE = np.array([target == 'player' for target in game_tables.ATTACK_TARGETS])
+
+# abilities in get_abilities order, padded with attack 0 unlocking at an unreachable level
+ABILITY_SLOTS = max(len(unlocks) for unlocks in game_tables.SPECIES_UNLOCKS)
+SPECIES_ABILITIES = np.zeros((len(SPECIES),ABILITY_SLOTS),dtype=np.int8)
+SPECIES_UNLOCKS = np.full((len(SPECIES),ABILITY_SLOTS),np.iinfo(np.int64).max)
+for species, unlocks in enumerate(game_tables.SPECIES_UNLOCKS):
+    for slot, (level, attack) in enumerate(unlocks):
+        SPECIES_ABILITIES[species,slot] = attack
+        SPECIES_UNLOCKS[species,slot] = level
+
+
+# state arrays are side major, row 0 the player and row 1 the opponent; a bool side array picks one row per battle
+SIDES = np.array([[False],[True]])
+
+def side_of(values: np.ndarray, side: np.ndarray) -> np.ndarray:
+    # values[side[battle], battle], cheaper than fancy indexing
+    return np.where(side.reshape(-1,*[1] * (values.ndim - 2)),values[1],values[0])
+
+def set_side(values: np.ndarray, side: np.ndarray, mask: np.ndarray, new: np.ndarray | bool):
+    np.copyto(values,new,where=mask & (side == SIDES))
+
+
+def delay_frames(duration: int, dt: float) -> int:
+    # frames until BattleState.expired() fires a timer of `duration` ms
+    elapsed, frames = 0.0, 0
+    while elapsed < duration - 1e-6:
+        elapsed += dt * 1000
+        frames += 1
+    return frames
+
+def hit_frames(dt: float) -> int:
+    # frames from activating an attack until its last animation frame lands the hit
+    frame_index, frames = 0.0, 0
+    while int(frame_index) % MONSTER_ATTACK_FRAMES != MONSTER_ATTACK_FRAMES - 1:
+        frame_index += ANIMATION_SPEED * dt
+        frames += 1
+    return frames
+
+
+class BattleKernel():
+    """Lockstep NumPy simulation of many independent one-on-one battles.
+
+    Follows the rules of BattleState with a random policy on both sides, but
+    instead of stepping frames it moves every battle straight to its next turn:
+    the turn frame follows from initiative (speed) and, if no ability is
+    affordable yet, energy regeneration (recovery * 0.009). The chosen action
+    is then resolved with the frame counts of the opponent delay, the attack
+    animation and the kill delay. Each iteration of `run` settles at most one
+    turn of every battle still going. Stats, costs and abilities live in small
+    tables per (species, level) profile; abilities are sorted by cost so the
+    affordable ones are the first slots, which leaves the draw uniform over the
+    same set as get_abilities. Initiative is kept as the frames a side has
+    run since its last turn, and the frames its float sum needs to reach 100
+    come from the same Accumulation as in TurnQueue; energy uses the closed
+    form, which only misses a frame when a sum lands within rounding of a
+    cost. Fighters after the attacker in field order start on the frame of
+    its hit and the player on the next, as in BattleState. Only the random
+    draws differ, and the two engines agree in distribution.
+
+    Results are per battle: `winner` (0 player, 1 opponent, -1 unresolved),
+    `length` in seconds, and `turns`, `damage` and `hits` up to the knockout;
+    what the survivor does during the kill delay is not counted.
+    """
+
+    def __init__(
+            self,
+            player: tuple[np.ndarray, np.ndarray],
+            opponent: tuple[np.ndarray, np.ndarray],
+            seed: int = 0,
+            stats: np.ndarray = SPECIES_STATS,
+            dt: float = 1 / 60,
+            time_limit: float = 3_600_000
+        ):
+        # (species ids, levels) per side, one entry per battle; `stats` can replace SPECIES_STATS for sweeps
+        species = np.stack([player[0],opponent[0]])
+        levels = np.stack([player[1],opponent[1]]).astype(np.float64)
+        self.size = species.shape[1]
+        self.rng = np.random.default_rng(seed)
+        self.dt = dt
+        self.frame_limit = time_limit / (dt * 1000)
+        self.opponent_delay = delay_frames(BATTLE_DELAYS['opponent'],dt)
+        self.kill_delay = delay_frames(BATTLE_DELAYS['kill'],dt)
+        self.hit_delay = hit_frames(dt)
+
+        # what only depends on species and level is kept once per profile, the battles hold a profile id per side
+        level_count = int(levels.max()) + 1
+        profile_keys, self.profile = np.unique(species * level_count + levels.astype(np.int64),return_inverse=True)
+        self.profile = self.profile.reshape(species.shape)
+        profile_species, profile_levels = np.divmod(profile_keys,level_count)
+        profile_stats = stats[profile_species] * profile_levels[:,None]
+        self.profile_max_health, self.profile_attack, self.profile_defense = profile_stats[:,0], profile_stats[:,2], profile_stats[:,3]
+        self.profile_element = SPECIES_ELEMENTS[profile_species]
+        # abilities sorted by cost, locked ones last, so the affordable ones are always the first slots
+        abilities = SPECIES_ABILITIES[profile_species]
+        costs = np.where(SPECIES_UNLOCKS[profile_species] <= profile_levels[:,None],ATTACK_COSTS[abilities],np.inf)
+        order = np.argsort(costs,axis=1,kind='stable')
+        self.profile_abilities = np.take_along_axis(abilities,order,axis=1)
+        self.slot_costs = np.ascontiguousarray(np.take_along_axis(costs,order,axis=1).T)
+
+        # state of the battles still running
+        self.rows = np.arange(self.size)
+        self.max_energy = profile_stats[:,1][self.profile]
+        self.min_cost = self.slot_costs[0][self.profile]
+
+        # turn_frames() terms that only depend on the stats: frames from 0 to a full initiative bar, energy per frame
+        turn_initiative = np.array([accumulation(0.0,float(speed) * dt).reach(100) for speed in profile_stats[:,5]])
+        self.turn_initiative = turn_initiative[self.profile]
+        regen = profile_stats[:,4][self.profile] * 0.009
+        self.energy_step = regen * dt
+        self.energy_never = (regen <= 0) | (self.min_cost >= self.max_energy)
+
+        # `frame` is the last frame before the latest resume, `late` the frames a side starts after it
+        self.health = self.profile_max_health[self.profile]
+        self.energy = self.max_energy.copy()
+        self.initiative = np.zeros((2,self.size))
+        self.defending = np.zeros((2,self.size),dtype=bool)
+        self.frame = np.zeros(self.size)
+        self.late = np.zeros((2,self.size))
+
+        # results, indexed by battle and side; turns, damage and hits are counted on the running battles and written back once each is dropped
+        self.winner = np.full(self.size,-1,dtype=np.int8)
+        self.length = np.zeros(self.size)
+        self.turns = np.zeros(self.size,dtype=np.int64)
+        self.damage = np.zeros((self.size,2))
+        self.hits = np.zeros((self.size,2),dtype=np.int64)
+        self.running_turns = np.zeros(self.size,dtype=np.int64)
+        self.running_damage = np.zeros((2,self.size))
+        self.running_hits = np.zeros((2,self.size),dtype=np.int64)
+
+    def write_back(self, rows: np.ndarray):
+        battles = self.rows[rows]
+        self.turns[battles] = self.running_turns[rows]
+        self.damage[battles] = self.running_damage[:,rows].T
+        self.hits[battles] = self.running_hits[:,rows].T
+
+    def keep(self, running: np.ndarray):
+        # drop finished battles so the steps after it work on fewer columns
+        self.write_back(np.flatnonzero(~running))
+        rows = np.flatnonzero(running)
+        self.rows, self.frame, self.running_turns = self.rows[rows], self.frame[rows], self.running_turns[rows]
+        for name in ('profile', 'max_energy', 'min_cost', 'turn_initiative', 'energy_step', 'energy_never',
+                     'health', 'energy', 'initiative', 'defending', 'late', 'running_damage', 'running_hits'):
+            setattr(self,name,getattr(self,name)[:,rows])
+
+    def turn_frames(self) -> np.ndarray:
+        # frames after `frame` until each side's turn, as TurnQueue.turn_frame() places it; a fighter that is
+        # already due still waits for the check at the end of the next frame
+        frames = np.maximum(self.turn_initiative - self.initiative,0)
+        missing = self.min_cost - self.energy
+        with np.errstate(divide='ignore',invalid='ignore'):
+            energy = np.where(self.energy_never,np.inf,np.floor(missing / self.energy_step) + 1)
+        frames = np.where(missing >= 0,np.maximum(frames,energy),frames)
+        return np.maximum(self.late + frames,1)
+
+    def run(self):
+        running = np.ones(self.size,dtype=bool)
+        while running.any():
+            # compacting is a full copy, so finished battles are only masked out until a quarter of them are done
+            if running.sum() < len(running) * 0.75:
+                self.keep(running)
+                running = running[running]
+
+            # jump to the next turn
+            waits = self.turn_frames()
+            frames = np.minimum(waits[0],waits[1])
+            stalled = running & (~np.isfinite(frames) | (self.frame + frames > self.frame_limit))
+            self.length[self.rows[stalled]] = self.frame_limit * self.dt
+            running &= ~stalled
+            frames = np.where(running,frames,0)
+            ran = np.maximum(frames - self.late,0)
+            self.initiative += ran
+            self.energy = np.minimum(self.max_energy,self.energy + self.energy_step * ran)
+            self.frame += frames
+
+            turn = running & (waits <= frames)
+            self.running_turns += turn.sum(axis=0)
+            self.initiative[turn] = 0
+            self.defending &= ~turn
+            actor = turn[1]
+            acting = turn[0] | actor
+
+            # the opponent alone waits out its delay, on a tie it acts right away through the player's policy
+            delayed = actor & ~turn[0]
+            act_frame = self.frame + np.where(delayed,self.opponent_delay,1)
+            # random action among defend and the affordable abilities, which are the first slots
+            energy = side_of(self.energy,actor)
+            actor_profile = side_of(self.profile,actor)
+            affordable = np.zeros(len(actor),dtype=np.int64)
+            for costs in self.slot_costs:
+                affordable += costs[actor_profile] < energy
+            choice = np.floor(self.rng.random(len(actor)) * (affordable + 1)).astype(np.int64)
+            slot = np.maximum(choice - 1,0)
+            defend = acting & (choice == 0)
+            hit = acting & (choice > 0)
+            set_side(self.defending,actor,defend,True)
+
+            # attacks are resolved on the frame of the hit
+            attack = self.profile_abilities[actor_profile,slot]
+            set_side(self.energy,actor,hit,energy - ATTACK_COSTS[attack])
+            target = actor == ATTACK_OWN_SIDE[attack]
+            target_profile = side_of(self.profile,target)
+            defense = np.clip(1 - self.profile_defense[target_profile] / 2000 - 0.2 * side_of(self.defending,target),0,1)
+            damage = self.profile_attack[actor_profile] * ATTACK_AMOUNTS[attack] * ELEMENT_MULTIPLIERS[ATTACK_ELEMENTS[attack],self.profile_element[target_profile]] * defense
+            health = np.minimum(np.round(side_of(self.health,target) - damage,2),self.profile_max_health[target_profile])
+            set_side(self.health,target,hit,health)
+            scored = hit & (actor == SIDES)
+            self.running_damage += np.where(scored,np.maximum(damage,0),0)
+            self.running_hits += scored
+            # everyone resumes on the frame of the hit or the defend; the player is updated before the
+            # opponent, so after the opponent's hit it only starts on the next frame
+            hit_frame = act_frame + self.hit_delay - 1
+            self.frame = np.where(hit,hit_frame,np.where(defend,act_frame,self.frame + 1)) - 1
+            self.late[0] = hit & actor
+            dead = hit & (health <= 0)
+
+            self.winner[self.rows[dead]] = np.where(target[dead],0,1)
+            self.length[self.rows[dead]] = (hit_frame[dead] + self.kill_delay) * self.dt
+            running &= ~dead
+        self.write_back(np.arange(len(self.rows)))
+        return self
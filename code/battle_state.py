@@ -0,0 +1,615 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from itertools import count
+from math import ceil, frexp, inf, ldexp, nextafter
+from random import Random
+from typing import Any, Callable, Literal, Optional
+
+from settings import *
+from game_tables import *
+from monster import *
+
+
+class Fighter():
+    """A monster on the battlefield, with its slot and the timers running on it."""
+
+    def __init__(self, monster: Monster, index: int, pos_index: int, entity: Literal['player','opponent']):
+        self.monster = monster
+        self.index = index
+        self.pos_index = pos_index
+        self.entity = entity
+        self.on_field = True
+
+        # attack animation, the hit lands on its last frame
+        self.state: Literal['idle','attack'] = 'idle'
+        self.frame_index = 0
+        self.target: Optional['Fighter'] = None
+        self.attack: Optional[Literal['burn','heal','battlecry','spark','scratch','splash','fire','explosion','annihilate','ice']] = None
+
+        # delayed removal and the monster replacing it
+        self.kill_time: float | None = None
+        self.next_monster_data: Optional[tuple[Monster,int,int,Literal['player','opponent']]] = None
+
+    def __repr__(self):
+        return f"Fighter: {self.monster.name}, {self.entity} {self.pos_index}"
+
+
+def rounded_run(value: float, step: float) -> tuple[float, float]:
+    """What `value += step` adds after rounding, and for how many frames in a row it adds exactly that."""
+    exponent = frexp(value)[1]
+    top, spacing = ldexp(1.0,exponent), ldexp(1.0,exponent - 53)
+    increment = value + step - value
+    if not increment:
+        return increment, inf
+    if value > 0 and value + step < top and not (step / spacing % 1 == 0.5 and value / spacing % 2):
+        return increment, max(1,(int((top - value) / spacing) - 1) // int(increment / spacing))
+    return increment, 1
+
+
+class Accumulation():
+    """Every value a per-frame `value += step` passes through, without stepping each frame.
+
+    Between two powers of two every float is a multiple of the same spacing,
+    so each addition there adds `step` rounded to that spacing: the values
+    form runs with one increment, and any frame is found by a bisect and one
+    exact multiplication. Runs are worked out as far as they are asked for.
+    The addition that crosses a power of two, or one that is a tie broken to
+    the even neighbour, is taken on its own.
+    """
+
+    __slots__ = ('step', 'frames', 'values', 'increments', 'reached')
+
+    def __init__(self, value: float, step: float):
+        self.step = step
+        self.frames: list[float] = [0]
+        self.values = [value]
+        self.increments: list[float] = []
+        self.reached: dict[float, float] = {}
+
+    def extend(self):
+        value = self.values[-1]
+        increment, run = rounded_run(value,self.step)
+        self.frames.append(self.frames[-1] + run)
+        self.values.append(value + self.step if run == 1 else value + run * increment if run < inf else value)
+        self.increments.append(increment)
+
+    def value(self, frames: int) -> float:
+        while self.frames[-1] <= frames:
+            self.extend()
+        index = bisect_right(self.frames,frames) - 1
+        return self.values[index] + (frames - self.frames[index]) * self.increments[index] if frames > self.frames[index] else self.values[index]
+
+    def reach(self, target: float) -> float:
+        # the first frame whose value is at least `target`, inf if it never gets there
+        if target not in self.reached:
+            self.reached[target] = self.first_reaching(target)
+        return self.reached[target]
+
+    def first_reaching(self, target: float) -> float:
+        while self.values[-1] < target:
+            if self.frames[-1] == inf:
+                return inf
+            self.extend()
+        index = bisect_left(self.values,target)
+        if index == 0:
+            return 0
+        start, base, increment = self.frames[index - 1], self.values[index - 1], self.increments[index - 1]
+        frames = min(self.frames[index],start + max(1,ceil((target - base) / increment)))
+        while frames > start + 1 and base + (frames - 1 - start) * increment >= target:
+            frames -= 1
+        while frames < self.frames[index] and base + (frames - start) * increment < target:
+            frames += 1
+        return frames
+
+@lru_cache(maxsize=4096)
+def accumulation(value: float, step: float) -> Accumulation:
+    # initiative restarts from 0 every turn, so most fighters keep reusing the same one
+    return Accumulation(value,step)
+
+def accumulate(value: float, step: float, frames: int) -> float:
+    # Accumulation.value() for a value only needed once
+    while frames > 0:
+        increment, run = rounded_run(value,step)
+        if run == inf:
+            break
+        if run == 1:
+            value += step
+            frames -= 1
+        else:
+            run = min(run,frames)
+            value += run * increment
+            frames -= run
+    return value
+
+
+class TurnQueue():
+    """Upcoming turns, worked out from speed instead of counted up every frame.
+
+    A running monster gains `speed * dt` initiative and `recovery * 0.009 * dt`
+    energy every frame, added and rounded one frame at a time as the monsters
+    used to count them up. Pausing does not change that sum, so each fighter
+    keeps the Accumulation since its values were last set from outside (a
+    turn, an attack, a level up) and how many frames of it it has run; the
+    heap holds the frame its turn is due: initiative reaching 100, or later
+    if energy still has to pass its cheapest ability. Pausing bumps a
+    fighter's version, which turns its heap entry stale. Frames are
+    BattleState frames; the frame passed for a fighter is the first one it
+    has not been updated in yet.
+    """
+
+    def __init__(self):
+        # fighter: [initiative, frames, energy, frames, stats, last initiative, last energy]
+        self.records: dict[Fighter, list] = {}
+        self.anchors: dict[Fighter, int] = {}
+        self.versions: dict[Fighter, int] = {}
+        self.heap: list[tuple[float, int, int, Fighter]] = []
+        self.order = count()
+        self.dt = 1 / 60
+
+    def anchor(self, fighter: Fighter, first: int):
+        monster, record = fighter.monster, self.records.get(fighter)
+        if record is None or record[4] is not monster.stats:
+            record = self.records[fighter] = [None,0,None,0,monster.stats,None,None]
+        if monster.initiative != record[5]:
+            record[0], record[1], record[5] = accumulation(monster.initiative,monster.stats[SPEED] * self.dt), 0, monster.initiative
+        if monster.energy != record[6]:
+            record[2], record[3], record[6] = accumulation(monster.energy,monster.stats[RECOVERY] * 0.009 * self.dt), 0, monster.energy
+        self.anchors[fighter] = first
+
+    def add(self, fighter: Fighter, first: int):
+        self.versions[fighter] = 0
+        self.anchor(fighter,first)
+        self.schedule(fighter)
+
+    def remove(self, fighter: Fighter, frame: int):
+        # the monster leaves with the values it has, which it keeps on the bench
+        self.sync(fighter,frame)
+        self.anchors.pop(fighter,None)
+        self.records.pop(fighter,None)
+        del self.versions[fighter]
+
+    def values(self, fighter: Fighter, frame: int) -> tuple[float, float]:
+        # initiative and energy of a running fighter before its update in `frame`
+        initiative, initiative_frames, energy, energy_frames = self.records[fighter][:4]
+        frames = frame - self.anchors[fighter]
+        return initiative.value(initiative_frames + frames), min(energy.value(energy_frames + frames),fighter.monster.stats[MAX_ENERGY])
+
+    def sync(self, fighter: Fighter, frame: int):
+        if fighter in self.anchors:
+            fighter.monster.initiative, fighter.monster.energy = self.values(fighter,frame)
+
+    def stop(self, fighter: Fighter, frame: int):
+        self.sync(fighter,frame)
+        record, frames = self.records[fighter], frame - self.anchors.pop(fighter)
+        record[1] += frames
+        record[3] += frames
+        record[5], record[6] = fighter.monster.initiative, fighter.monster.energy
+
+    def turn_frame(self, fighter: Fighter) -> float:
+        initiative, initiative_frames, energy, energy_frames = self.records[fighter][:4]
+        costs = [cost for ability, cost in fighter.monster.unlocked]
+        if not costs:
+            return inf
+
+        # a full initiative bar still waits until energy passes the cheapest ability
+        frames = initiative.reach(100) - initiative_frames
+        if min(costs) >= fighter.monster.energy:
+            frames = max(frames,energy.reach(nextafter(min(costs),inf)) - energy_frames if min(costs) < fighter.monster.stats[MAX_ENERGY] else inf)
+        # a turn that is already due waits for the next check
+        return self.anchors[fighter] + frames - 1 if frames > 0 else 0
+
+    def schedule(self, fighter: Fighter, frame: float | None = None):
+        self.versions[fighter] += 1
+        frame = self.turn_frame(fighter) if frame is None else frame
+        if frame < inf:
+            heapq.heappush(self.heap,(frame,next(self.order),self.versions[fighter],fighter))
+
+    def pause(self, frame: int, stepped: set[Fighter]):
+        for fighter in list(self.anchors):
+            self.stop(fighter,frame + (fighter in stepped))
+            self.versions[fighter] += 1
+
+    def resume(self, frame: int, stepped: set[Fighter]):
+        # fighters already updated this frame start adding on the next one; everyone is
+        # rescheduled since health, energy, level or stats may have changed
+        for fighter in self.versions:
+            first = frame + (fighter in stepped)
+            if fighter in self.anchors:
+                self.stop(fighter,first)
+            self.anchor(fighter,first)
+            self.schedule(fighter)
+
+    def retime(self, dt: float, frame: int, stepped: set[Fighter]):
+        # a new frame length changes every increment, so the running fighters start over from their current values
+        running = list(self.anchors)
+        for fighter in running:
+            self.stop(fighter,frame + (fighter in stepped))
+        self.records.clear()
+        self.dt = dt
+        for fighter in running:
+            self.anchor(fighter,frame + (fighter in stepped))
+            self.schedule(fighter)
+
+    def next_frame(self) -> float:
+        while self.heap and self.heap[0][2] != self.versions.get(self.heap[0][3]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else inf
+
+    def pop(self) -> Fighter:
+        return heapq.heappop(self.heap)[3]
+
+
+def random_action(state: 'BattleState', fighter: Fighter) -> tuple[str, Any]:
+    """The opponent's original policy: defend or any affordable ability, on a random target."""
+    ability = state.rng.choice(['defend',*fighter.monster.get_abilities(all=False)])
+    if ability == 'defend':
+        return ability, None
+    return ability, state.rng.choice(state.targets(fighter,ATTACK_TARGETS[ATTACK_IDS[ability]]))
+
+def strongest_action(state: 'BattleState', fighter: Fighter) -> tuple[str, Any]:
+    """Auto-resolve policy: the affordable ability and target that take off or heal the most health right now."""
+    best, best_gain = ('defend', None), 0.0
+    for ability in fighter.monster.get_abilities(all=False):
+        for target in state.targets(fighter,ATTACK_TARGETS[ATTACK_IDS[ability]]):
+            amount = state.damage(target,ability,fighter.monster.get_base_damage(ability))
+            if target.entity == fighter.entity:
+                gain = min(-amount,target.monster.stats[MAX_HEALTH] - target.monster.health)
+            else:
+                gain = min(amount,target.monster.health)
+            if gain > best_gain:
+                best, best_gain = (ability, target), gain
+    return best
+
+
+class BattleState():
+    """Display-free battle rules, shared by `Battle` and headless tooling.
+
+    Time only moves through `update(dt)`, so the opponent delay, kill delay and
+    failed catch pause run on simulated milliseconds instead of wall-clock
+    ticks. Everything the presentation layer has to show is appended to
+    `events` as `(kind, fighter, *details)`.
+    """
+
+    def __init__(
+            self,
+            player_monsters: dict[int, Monster],
+            opponent_monsters: dict[int, Monster],
+            end_battle: Callable[[Literal['player','opponent']], None] = lambda winner: None,
+            opponent_policy: Callable[['BattleState', Fighter], tuple[str, Any]] = random_action,
+            rng: Random | None = None,
+            keep_caught: Callable[[Monster], None] | None = None
+        ):
+        self.monster_data = {'player': player_monsters, 'opponent': opponent_monsters}
+        self.available_monsters: dict[int, Monster] = {}
+        self.battle_over = False
+        self.winner: Optional[Literal['player','opponent']] = None
+        self.end_battle = end_battle
+        self.opponent_policy = opponent_policy
+        self.rng = rng or Random()
+        self.keep_caught = keep_caught
+
+        # field, in the order the monsters entered it
+        self.fighters: dict[str, list[Fighter]] = {'player': [], 'opponent': []}
+        self.field: list[Fighter] = []
+
+        # control
+        self.current: Fighter | None = None
+        self.awaiting_player = False
+        self.events: list[tuple] = []
+
+        # timers, in simulated milliseconds, and frames with the fighters already updated in the current one
+        self.time = 0.0
+        self.frame = 0
+        self.stepped: set[Fighter] = set()
+        self.queue = TurnQueue()
+        self.opponent_delay: float | None = None
+        self.resume_times: list[float] = []
+
+        self.setup()
+
+    # battle setup
+    def setup(self):
+        for entity, monsters in self.monster_data.items():
+            for index, monster in { k: v for k, v in monsters.items() if k <= 2}.items():
+                self.create_monster(monster,index,index,entity)
+
+            if entity == 'player':
+                for index, monster in { k: v for k,v in monsters.items() if k > 2 and v.health > 0}.items():
+                    self.available_monsters[index] = monster
+
+            # remove opponent monster data
+            for i in range(len(self.fighters['opponent'])):
+                del self.monster_data['opponent'][i]
+
+    def create_monster(self, monster: Monster, index: int, pos_index: int, entity: Literal['player','opponent']) -> Fighter:
+        fighter = Fighter(monster,index,pos_index,entity)
+        self.fighters[entity].append(fighter)
+        self.field.append(fighter)
+        # a fighter entering during a frame is not part of its update
+        self.stepped.add(fighter)
+        self.queue.add(fighter,self.frame + 1)
+        self.events.append(('enter',fighter))
+        return fighter
+
+    def remove(self, fighter: Fighter):
+        fighter.on_field = False
+        self.fighters[fighter.entity].remove(fighter)
+        self.field.remove(fighter)
+        # one destroyed in its update is still counted up for that frame
+        self.queue.remove(fighter,self.frame + 1)
+        self.events.append(('leave',fighter))
+
+    def delayed_kill(self, fighter: Fighter, new_monster: Optional[tuple[Monster,int,int,Literal['player','opponent']]] = None):
+        if fighter.kill_time is None:
+            fighter.next_monster_data = new_monster
+            fighter.kill_time = self.time
+
+    def destroy(self, fighter: Fighter):
+        fighter.kill_time = None
+        self.remove(fighter)
+        if fighter.next_monster_data:
+            self.create_monster(*fighter.next_monster_data)
+
+    def targets(self, fighter: Fighter, side: Literal['player','opponent']) -> list[Fighter]:
+        # `side` is relative to the attacker: 'player' abilities target its own team
+        if side == 'player':
+            return self.fighters[fighter.entity]
+        return self.fighters['opponent' if fighter.entity == 'player' else 'player']
+
+    def active_monsters(self) -> set[tuple[int, Monster]]:
+        return {(fighter.index,fighter.monster) for fighter in self.fighters['player']}
+
+    def update_available(self):
+        active_monsters = self.active_monsters()
+        self.available_monsters = { index: monster for index, monster in self.monster_data['player'].items() if (index,monster) not in active_monsters and monster.health > 0}
+
+    # actions
+    def attack(self, fighter: Fighter, target: Fighter, attack: Literal['burn','heal','battlecry','spark','scratch','splash','fire','explosion','annihilate','ice']):
+        fighter.state = 'attack'
+        fighter.frame_index = 0
+        fighter.target = target
+        fighter.attack = attack
+        fighter.monster.reduce_energy(attack)
+
+    def defend(self, fighter: Fighter):
+        fighter.monster.defending = True
+        self.events.append(('defend',fighter))
+        self.update_all_monster('resume')
+        self.current = None
+
+    def switch(self, fighter: Fighter, index: int):
+        self.remove(fighter)
+        self.create_monster(self.monster_data['player'][index],index,fighter.pos_index,'player')
+        self.update_all_monster('resume')
+
+    def catch(self, target: Fighter) -> bool:
+        if target.monster.health < target.monster.get_stat('max_health') * 0.2:
+            if self.keep_caught:
+                self.keep_caught(target.monster)
+            else:
+                self.monster_data['player'][len(self.monster_data['player'])] = target.monster
+            self.delayed_kill(target)
+            self.update_all_monster('resume')
+            return True
+        # everyone stays paused while the failed attempt is shown
+        self.resume_times.append(self.time)
+        self.events.append(('miss',target))
+        return False
+
+    def act(self, fighter: Fighter, action: str, target: Any):
+        match action:
+            case 'defend': self.defend(fighter)
+            case 'switch': self.switch(fighter,target)
+            case 'catch': self.catch(target)
+            case _: self.attack(fighter,target,action)
+
+    # battle system
+    def check_active(self):
+        # only fighters whose turn is due this frame are looked at, in field order for ties
+        due = []
+        while self.queue.next_frame() <= self.frame:
+            due.append(self.queue.pop())
+        for fighter in [fighter for fighter in self.fighters['player'] + self.fighters['opponent'] if fighter in due]:
+            self.queue.sync(fighter,self.frame + 1)
+            if fighter.monster.health <= 0:
+                continue
+            fighter.monster.defending = False
+            self.update_all_monster('pause')
+            fighter.monster.initiative = 0
+            self.current = fighter
+            self.events.append(('turn',fighter))
+            if fighter.entity == 'player':
+                self.awaiting_player = True
+            else:
+                self.opponent_delay = self.time
+
+    def update_all_monster(self, option: Literal['pause','resume']):
+        if option == 'pause':
+            self.queue.pause(self.frame,self.stepped)
+        else:
+            self.queue.resume(self.frame,self.stepped)
+
+    def damage(
+            self,
+            target: Fighter,
+            attack: Literal['burn','heal','battlecry','spark','scratch','splash','fire','explosion','annihilate','ice'],
+            amount: float
+        ) -> float:
+        # get correct attack damage amount (defense, element)
+        amount *= ELEMENT_MATRIX[ATTACK_ELEMENTS[ATTACK_IDS[attack]]][SPECIES_ELEMENTS[target.monster.species]]
+
+        target_defense = 1 - (target.monster.stats[DEFENSE]/2000)
+        if target.monster.defending:
+            target_defense -= 0.2
+        target_defense = max(0,min(1,target_defense))
+        return amount * target_defense
+
+    def apply_attack(
+            self,
+            target: Fighter,
+            attack: Literal['burn','heal','battlecry','spark','scratch','splash','fire','explosion','annihilate','ice'],
+            amount: float,
+            attacker: Fighter | None = None
+        ):
+        # update the monster health
+        amount = self.damage(target,attack,amount)
+        self.events.append(('hit',target,attack,amount,attacker))
+        target.monster.health -= amount
+        target.monster.health = round(target.monster.health,2)
+        target.monster.stat_limiter()
+        self.check_death()
+
+        # resume
+        self.update_all_monster('resume')
+
+    def check_death(self):
+        new_monster_data: Optional[tuple[Monster,int,int,Literal['player','opponent']]] = None
+        for fighter in self.fighters['opponent'] + self.fighters['player']:
+            if fighter.monster.health <= 0:
+                if fighter.entity == 'player':
+                    active_monsters = self.active_monsters()
+                    available_monsters: list[tuple[int, Monster]] = [ (index, monster) for index, monster in self.monster_data['player'].items() if monster.health > 0 and (index,monster) not in active_monsters]
+                    if available_monsters:
+                        new_monster_data = [(monster,index,fighter.pos_index,'player') for index, monster in available_monsters][0]
+                else:
+                    new_monster_data = (list(self.monster_data['opponent'].values())[0], fighter.index, fighter.pos_index, 'opponent') if self.monster_data['opponent'] else None
+                    if self.monster_data['opponent']:
+                        del self.monster_data['opponent'][min(self.monster_data['opponent'])]
+
+                    # xp
+                    xp_amount = fighter.monster.level * 100 / len(self.fighters['player'])
+                    for player in self.fighters['player']:
+                        player.monster.update_xp(xp_amount)
+
+                self.delayed_kill(fighter,new_monster_data)
+
+    def opponent_attack(self):
+        if self.current:
+            self.act(self.current,*self.opponent_policy(self,self.current))
+
+    def check_end_battle(self):
+        # opponent have been defeated
+        if len(self.fighters['opponent']) == 0 and not self.battle_over:
+            self.battle_over = True
+            self.winner = 'player'
+            self.update_all_monster('pause')
+            self.end_battle('player')
+            for monster in self.monster_data['player'].values():
+                monster.initiative = 0
+
+        # player have been defeated
+        if len(self.fighters['player']) == 0:
+            self.winner = 'opponent'
+            self.update_all_monster('pause')
+            self.end_battle('opponent')
+
+    def sync(self):
+        # write the running monsters' initiative and energy for the HUD
+        for fighter in self.field:
+            self.queue.sync(fighter,self.frame + (fighter in self.stepped))
+
+    # time
+    def remaining(self, end: float) -> float:
+        # summed float frame times fall just short of whole milliseconds (60 * 1000/60 < 1000)
+        return end - 1e-6 - self.time
+
+    def expired(self, start: float, duration: int) -> bool:
+        return self.remaining(start + duration) <= 0
+
+    def update_timers(self):
+        if self.opponent_delay is not None and self.expired(self.opponent_delay,BATTLE_DELAYS['opponent']):
+            self.opponent_delay = None
+            self.opponent_attack()
+
+        for start in [start for start in self.resume_times if self.expired(start,BATTLE_DELAYS['catch'])]:
+            self.resume_times.remove(start)
+            self.update_all_monster('resume')
+
+    def update_fighter(self, fighter: Fighter, dt: float):
+        if fighter.kill_time is not None and self.expired(fighter.kill_time,BATTLE_DELAYS['kill']):
+            self.destroy(fighter)
+
+        fighter.frame_index += ANIMATION_SPEED * dt
+        if fighter.state == 'attack' and int(fighter.frame_index) % MONSTER_ATTACK_FRAMES == MONSTER_ATTACK_FRAMES - 1:
+            self.apply_attack(fighter.target,fighter.attack,fighter.monster.get_base_damage(fighter.attack),fighter)
+            fighter.state = 'idle'
+        # initiative and energy are added here, so a resume from a hit reaches the fighters after the attacker this frame
+        self.stepped.add(fighter)
+
+    def update(self, dt: float):
+        self.time += dt * 1000
+        self.frame += 1
+        self.stepped.clear()
+        if dt != self.queue.dt:
+            self.queue.retime(dt,self.frame,self.stepped)
+        self.update_timers()
+        for fighter in self.field.copy():
+            self.update_fighter(fighter,dt)
+        self.check_active()
+
+    # headless
+    def skip(self, dt: float, frames: int):
+        # quiet frames: initiative and energy follow from the frame count, so only the clock and animations move
+        if dt != self.queue.dt:
+            self.queue.retime(dt,self.frame,self.stepped)
+        self.time = accumulate(self.time,dt * 1000,frames)
+        self.frame += frames
+        for fighter in self.field:
+            if fighter.state == 'attack':
+                # the hit lands when the summed index reaches the last frame, so it is summed as update() does
+                for _ in range(frames):
+                    fighter.frame_index += ANIMATION_SPEED * dt
+            else:
+                fighter.frame_index += ANIMATION_SPEED * dt * frames
+
+    def next_event(self) -> float:
+        """Seconds until the earliest timer, attack hit or turn can fire."""
+        waits = [(self.queue.next_frame() - self.frame) * self.queue.dt]
+        if self.opponent_delay is not None:
+            waits.append(self.remaining(self.opponent_delay + BATTLE_DELAYS['opponent']) / 1000)
+        waits.extend(self.remaining(start + BATTLE_DELAYS['catch']) / 1000 for start in self.resume_times)
+
+        for fighter in self.field:
+            if fighter.kill_time is not None:
+                waits.append(self.remaining(fighter.kill_time + BATTLE_DELAYS['kill']) / 1000)
+            if fighter.state == 'attack':
+                waits.append((MONSTER_ATTACK_FRAMES - 1 - fighter.frame_index) / ANIMATION_SPEED)
+        return min(waits)
+
+    def resolve(
+            self,
+            player_policy: Callable[['BattleState', Fighter], tuple[str, Any]] = random_action,
+            dt: float = 1 / 60,
+            time_limit: float = 3_600_000,
+            observe: Callable[[list[tuple]], None] = lambda events: None
+        ) -> Optional[Literal['player','opponent']]:
+        """Play the battle out with `player_policy` choosing the player's moves.
+
+        Steps in whole frames of `dt` like the game loop does, but jumps over
+        the frames in which nothing can happen. `observe` sees the events of
+        every step. Returns the winning side, or None if neither side can act
+        any more or `time_limit` ms ran out.
+        """
+        while self.time < time_limit:
+            self.check_end_battle()
+            if self.winner:
+                break
+            if self.awaiting_player and self.current:
+                self.awaiting_player = False
+                action, target = player_policy(self,self.current)
+                self.act(self.current,action,target)
+                if action not in ('catch','switch'):
+                    self.current = None
+
+            wait = self.next_event()
+            if wait == inf:
+                break
+            # nothing fires in the skipped frames, the frame with the event runs on its own
+            skipped = max(1,ceil(wait / dt - 1e-9)) - 1
+            if skipped:
+                self.skip(dt,skipped)
+            self.update(dt)
+            observe(self.events)
+            self.events.clear()
+        return self.winner
@@ -0,0 +1,91 @@
+from typing import Callable, Literal, NamedTuple, Optional
+
+from settings import *
+from support import *
+from custom_timer import *
+
+
+class MemberReport(NamedTuple):
+    name: str
+    evolution: str | None
+    start_level: int
+    level: int
+    xp: float
+    health: float
+    max_health: float
+
+
+def gained_xp(start_level: int, start_xp: float, level: int, xp: float) -> float:
+    # every level passed on the way filled a bar of level * 150
+    return sum(passed * 150 for passed in range(start_level,level)) - start_xp + xp
+
+
+class BattleSummary():
+    """Outcome of an auto-resolved wild battle, shown over the world until space is pressed."""
+
+    def __init__(
+            self,
+            winner: Optional[Literal['player','opponent']],
+            opponents: list[str],
+            length: float,
+            members: list[MemberReport],
+            fonts: dict[str, pygame.Font],
+            icon_frames: dict[str, pygame.Surface],
+            end_summary: Callable[[],None]
+        ):
+        self.display_surface = pygame.display.get_surface()
+        self.winner, self.length, self.members = winner, length, members
+        self.end_summary = end_summary
+        self.input_timer = Timer(300, autostart=True)
+
+        # tint
+        self.tint_surf = pygame.Surface((WINDOW_WIDTH,WINDOW_HEIGHT))
+        self.tint_surf.set_alpha(200)
+
+        # the content never changes, so the panel is drawn once
+        self.item_height = 70
+        self.surf = pygame.Surface((WINDOW_WIDTH * 0.5,120 + len(members) * self.item_height),pygame.SRCALPHA)
+        self.rect = self.surf.get_frect(center = (WINDOW_WIDTH/2,WINDOW_HEIGHT/2))
+        self.draw_panel(winner,opponents,length,members,fonts,icon_frames)
+
+    def draw_panel(self, winner: Optional[str], opponents: list[str], length: float, members: list[MemberReport], fonts: dict[str, pygame.Font], icon_frames: dict[str, pygame.Surface]):
+        width = self.surf.get_width()
+        pygame.draw.rect(self.surf,COLORS['white'],self.surf.get_frect(topleft = (0,0)),0,12)
+
+        # title
+        match winner:
+            case 'player': title = f"Defeated wild {', '.join(opponents)}"
+            case 'opponent': title = f"Lost to wild {', '.join(opponents)}"
+            case _: title = f"Neither side could win against wild {', '.join(opponents)}"
+        title_surf = render_text(fonts['bold'],title,False,COLORS['black'])
+        self.surf.blit(title_surf,title_surf.get_frect(midtop = (width/2,20)))
+        info_surf = render_text(fonts['small'],f'auto-resolved, {length:.1f} s of battle',False,COLORS['gray'])
+        self.surf.blit(info_surf,info_surf.get_frect(midtop = (width/2,52)))
+
+        # party
+        for index, member in enumerate(members):
+            top = 90 + index * self.item_height
+            icon_surf = icon_frames[member.evolution or member.name]
+            self.surf.blit(icon_surf,icon_surf.get_frect(midleft = (20,top + self.item_height/2)))
+
+            name = f'{member.name} evolved into {member.evolution}' if member.evolution else member.name
+            name_surf = render_text(fonts['regular'],name,False,COLORS['black'])
+            self.surf.blit(name_surf,name_surf.get_frect(topleft = (100,top + 8)))
+
+            level = f'Lvl {member.start_level} -> {member.level}' if member.level != member.start_level else f'Lvl {member.level}'
+            progress_surf = render_text(fonts['small'],f'{level}   +{member.xp:.0f} xp',False,COLORS['gray'])
+            self.surf.blit(progress_surf,progress_surf.get_frect(topleft = (100,top + 34)))
+
+            bar_rect = pygame.FRect((0,0),(120,8)).move_to(midright = (width - 20,top + self.item_height/2))
+            draw_bar(self.surf,bar_rect,member.health,member.max_health,COLORS['red'],COLORS['black'])
+
+    def input(self):
+        keys = pygame.key.get_just_pressed()
+        if keys[pygame.K_SPACE] and not self.input_timer.active:
+            self.end_summary()
+
+    def update(self):
+        self.input_timer.update()
+        self.input()
+        self.display_surface.blit(self.tint_surf,(0,0))
+        self.display_surface.blit(self.surf,self.rect)
@@ -0,0 +1,126 @@
+import os
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import json
+import sys
+from argparse import ArgumentParser
+from os.path import join
+from random import Random
+from typing import Any, Callable
+
+from settings import *
+from game_tables import SPECIES
+from monster import Monster
+from battle_state import BattleState, Fighter, random_action, strongest_action
+
+
+# seeded battles as the rules played them when BattleState took them over from Battle: winners, lengths and event
+# sequences kept in TRACE_PATH. Any change to the rules shows up as a diff; re-record only in a commit that changes them on purpose
+TRACE_PATH = join(BASE_DIR,'data','battle_traces.json')
+POLICIES: dict[str, Callable[[BattleState, Fighter], tuple[str, Any]]] = {'random': random_action, 'strongest': strongest_action}
+DT = 1 / 60
+AFTER_FRAMES = 10
+
+
+def parties(seed: int) -> tuple[dict[int, Monster], dict[int, Monster]]:
+    rng = Random(seed)
+    player = { index: Monster(name,rng.randint(3,15)) for index, name in enumerate(rng.sample(SPECIES,rng.randint(1,5))) }
+    opponent = { index: Monster(name,rng.randint(3,15)) for index, name in enumerate(rng.sample(SPECIES,rng.randint(1,5))) }
+    return player, opponent
+
+def describe(event: tuple) -> list:
+    return [f'{item.entity}:{item.monster.name}' if isinstance(item,Fighter) else round(item,3) if isinstance(item,float) else item for item in event]
+
+def play(seed: int, policy: str, stepped: bool) -> dict[str, Any]:
+    """One battle, either through resolve() or frame by frame as the game loop runs it."""
+    player, opponent = parties(seed)
+    ended: list[str] = []
+    state = BattleState(player,opponent,ended.append,rng=Random(seed))
+    events: list[list] = []
+
+    def observe(step_events: list[tuple]):
+        events.extend(describe(event) for event in step_events)
+
+    if stepped:
+        while state.time < 3_600_000:
+            state.check_end_battle()
+            if state.winner:
+                break
+            if state.awaiting_player and state.current:
+                state.awaiting_player = False
+                action, target = POLICIES[policy](state,state.current)
+                state.act(state.current,action,target)
+                if action not in ('catch','switch'):
+                    state.current = None
+            state.update(DT)
+            observe(state.events)
+            state.events.clear()
+    else:
+        state.resolve(POLICIES[policy],DT,observe=observe)
+
+    # the calls of end_battle in the frames after the end, a lost battle keeps calling it
+    length = state.time
+    for _ in range(AFTER_FRAMES):
+        state.update(DT)
+        state.check_end_battle()
+    state.events.clear()
+
+    return {
+        'seed': seed,
+        'policy': policy,
+        'winner': state.winner,
+        'length': round(length,3),
+        'end_calls': len(ended),
+        'health': [round(monster.health,3) for monster in player.values()],
+        'events': events,
+    }
+
+def battles(seeds: int) -> list[dict[str, Any]]:
+    return [play(seed,policy,stepped=False) for seed in range(seeds) for policy in POLICIES]
+
+def differences(expected: dict[str, Any], actual: dict[str, Any]) -> list[str]:
+    name = f"seed {expected['seed']} ({expected['policy']})"
+    lines = [f'{name}: {key} {expected[key]!r} -> {actual[key]!r}' for key in ('winner', 'length', 'end_calls', 'health') if expected[key] != actual[key]]
+    for index, (before, after) in enumerate(zip(expected['events'],actual['events'])):
+        if before != after:
+            lines.append(f'{name}: event {index} {before!r} -> {after!r}')
+            break
+    else:
+        if len(expected['events']) != len(actual['events']):
+            lines.append(f"{name}: {len(expected['events'])} events -> {len(actual['events'])}")
+    return lines
+
+def check() -> list[str]:
+    with open(TRACE_PATH) as file:
+        traces = json.load(file)
+    problems = []
+    for expected in traces:
+        resolved = play(expected['seed'],expected['policy'],stepped=False)
+        stepped = play(expected['seed'],expected['policy'],stepped=True)
+        problems.extend(differences(expected,resolved))
+        problems.extend(line.replace(':',' frame by frame:',1) for line in differences(resolved,stepped))
+    return problems
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Regression check of the battle rules against recorded seeded battles')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('check', help='replay the recorded battles, headless and frame by frame, and report every difference')
+    record_parser = commands.add_parser('record', help='write the current outcomes as the new expectation (only after an intended rule change)')
+    record_parser.add_argument('--seeds', type=int, default=24)
+
+    args = parser.parse_args()
+    match args.command:
+        case 'check':
+            problems = check()
+            for line in problems:
+                print(line,file=sys.stderr)
+            if problems:
+                sys.exit(f'{len(problems)} differences from {TRACE_PATH}')
+            print('battle rules match the recorded traces')
+        case 'record':
+            traces = battles(args.seeds)
+            with open(TRACE_PATH,'w') as file:
+                json.dump(traces,file,separators=(',',':'))
+                file.write('\n')
+            print(f'{len(traces)} battles recorded to {TRACE_PATH}')
@@ -0,0 +1,430 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import json
+import subprocess
+import sys
+from argparse import ArgumentParser
+from os.path import join
+from statistics import median
+from time import perf_counter, thread_time
+
+
+def launch():
+    start = perf_counter()
+    from main import Game
+    Game()
+    print(perf_counter() - start)
+
+def import_timings(workers: int):
+    import settings
+    settings.ASSET_WORKERS = workers
+    from main import Game
+    game = Game()
+    print(json.dumps({**game.import_timings, **{f'images/{key}': value for key, value in game.asset_pack.timings.items()}}))
+
+def timed_launch() -> float:
+    result = subprocess.run([sys.executable, __file__, 'launch'], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def startup(runs: int):
+    from settings import CACHE_DIR
+
+    cold, warm = [], []
+    for _ in range(runs):
+        pack_path = join(CACHE_DIR, 'assets.pack')
+        if os.path.exists(pack_path):
+            os.remove(pack_path)
+        cold.append(timed_launch())
+        warm.append(timed_launch())
+
+    print(f'cold launch: {median(cold) * 1000:.1f} ms (median of {runs})')
+    print(f'warm launch: {median(warm) * 1000:.1f} ms (median of {runs})')
+
+def assets(workers: list[int]):
+    from settings import CACHE_DIR
+
+    for worker_count in workers:
+        pack_path = join(CACHE_DIR, 'assets.pack')
+        if os.path.exists(pack_path):
+            os.remove(pack_path)
+        result = subprocess.run([sys.executable, __file__, 'import-timings', str(worker_count)], capture_output=True, text=True, check=True)
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f'{worker_count} workers (cold pack)')
+        for category, seconds in timings.items():
+            print(f'  {category:<24} {seconds * 1000:8.1f} ms')
+
+def maps(runs: int):
+    import pygame
+    from pytmx.util_pygame import load_pygame
+    import map_compiler
+    from settings import BASE_DIR
+
+    pygame.display.set_mode((1, 1))
+    tmx_path = join(BASE_DIR, 'data', 'maps', 'world.tmx')
+    compiled_path = map_compiler.write_compiled_map(tmx_path)
+
+    def best(func) -> float:
+        times = []
+        for _ in range(runs):
+            map_compiler.tileset_images.clear()
+            start = perf_counter()
+            func()
+            times.append(perf_counter() - start)
+        return min(times) * 1000
+
+    def compiled_with_tiles():
+        map_compiler.load_tilesets()
+        tmx_map = map_compiler.read_compiled_map(compiled_path)
+        for gid in tmx_map.tile_table:
+            tmx_map.image(gid)
+
+    print(f'pytmx load_pygame(world.tmx):       {best(lambda: load_pygame(tmx_path)):8.2f} ms')
+    print(f'compile world.tmx:                  {best(lambda: map_compiler.compile_map(tmx_path)):8.2f} ms')
+    print(f'read compiled world:                {best(lambda: map_compiler.read_compiled_map(compiled_path)):8.2f} ms')
+    print(f'read compiled world + tile images:  {best(compiled_with_tiles):8.2f} ms')
+
+def level(frames: int):
+    from main import Game
+
+    game = Game()
+    game.levels.discard('world')
+    start = perf_counter()
+    game.setup('world', 'house')
+    setup_time = perf_counter() - start
+    game.setup('house', 'world')
+    start = perf_counter()
+    game.setup('world', 'house')
+    reentry_time = perf_counter() - start
+
+    blits = 0
+    start = perf_counter()
+    for _ in range(frames):
+        game.all_sprites.update(1 / 60)
+        game.all_sprites.draw(game.player)
+        blits += game.all_sprites.blit_count
+    frame_time = (perf_counter() - start) / frames
+
+    print(f'world sprites: {len(game.all_sprites)}')
+    print(f'world setup:   {setup_time * 1000:8.2f} ms')
+    print(f'world re-entry:{reentry_time * 1000:8.2f} ms (cached level)')
+    print(f'frame time:    {frame_time * 1000:8.2f} ms (update + draw, mean of {frames})')
+    print(f'blits/frame:   {blits / frames:8.1f}')
+
+def collision(colliders: int, queries: int):
+    import random
+    import pygame
+    from sprites import BorderSprite
+    from spatial import SpatialHash
+
+    random.seed(0)
+    side = int((colliders ** 0.5) * 128)
+    group, grid = pygame.sprite.Group(), SpatialHash()
+    for _ in range(colliders):
+        BorderSprite((random.uniform(0,side),random.uniform(0,side)),pygame.Surface((random.randint(16,128),random.randint(16,128))),(group,grid))
+    start = perf_counter()
+    grid.build()
+    build_time = perf_counter() - start
+    hitboxes = [pygame.FRect(random.uniform(0,side),random.uniform(0,side),64,68) for _ in range(queries)]
+
+    def linear(hitbox: pygame.FRect):
+        return [sprite for sprite in group if sprite.hitbox.colliderect(hitbox)]
+
+    def hashed(hitbox: pygame.FRect):
+        return list(grid.collide(hitbox))
+
+    assert all(linear(hitbox) == hashed(hitbox) for hitbox in hitboxes[:100])
+    for name, func in [('linear scan', linear), ('spatial hash', hashed)]:
+        start = perf_counter()
+        for hitbox in hitboxes:
+            func(hitbox)
+        print(f'{name + ":":<14} {(perf_counter() - start) / queries * 1e6:10.2f} us per collision check')
+    print(f'hash build:    {build_time * 1000:10.2f} ms for {colliders} colliders')
+
+def fill_box(game, count: int):
+    from random import Random
+    from monster import Monster
+    from game_tables import SPECIES
+
+    rng = Random(0)
+    for _ in range(count):
+        game.monster_store.add(Monster(rng.choice(SPECIES), rng.randint(1, 40)))
+
+def battle(frames: int, box: int):
+    from main import Game
+    from battle import Battle
+    from monster import Monster
+
+    game = Game()
+    fill_box(game, box)
+    opponents = { index: Monster(name, 8) for index, name in enumerate(['Sparchu', 'Cleaf', 'Jacana']) }
+    fight = Battle(game.player_monsters, opponents, game.monster_frames, game.bg_frames['forest'], game.fonts, lambda character: None, None, game.audios, game.monster_store.add)
+    on_field = len(fight.player_sprites) + len(fight.opponent_sprites)
+
+    start = perf_counter()
+    for _ in range(frames):
+        fight.update(1 / 60)
+    frame_time = (perf_counter() - start) / frames
+    print(f'battle frame:  {frame_time * 1000:8.2f} ms ({on_field} monsters on the field, {len(game.monster_store)} owned, mean of {frames})')
+
+def index(frames: int, box: int):
+    from main import Game
+    from text_cache import text_cache
+
+    game = Game()
+    fill_box(game, box)
+    store, monster_index = game.monster_store, game.monster_index
+    start = perf_counter()
+    for frame in range(frames):
+        monster_index.update(1 / 60)
+    frame_time = (perf_counter() - start) / frames
+    print(f'index frame:   {frame_time * 1000:8.2f} ms ({len(store)} monsters, mean of {frames})')
+
+    # the list alone while the cursor walks down a row every fourth frame, so the window is always easing
+    times = []
+    for frame in range(frames):
+        if frame % 4 == 0:
+            monster_index.index = (monster_index.index + 1) % len(store)
+        start = perf_counter()
+        monster_index.display_list(1 / 60)
+        times.append(perf_counter() - start)
+    times.sort()
+    print(f'list scrolling:{median(times) * 1000:8.2f} ms median, {times[int(len(times) * 0.99)] * 1000:.2f} ms p99, {len(monster_index.row_surfs)} rows cached')
+
+    # a view is built once per change of the box, then every frame reads it from the cache
+    for key, element in [('level', None), ('health', None), ('name', None), (None, 'fire'), ('level', 'water')]:
+        store.heal_box()
+        start = perf_counter()
+        store.view(key, element)
+        built = perf_counter() - start
+        start = perf_counter()
+        store.view(key, element)
+        cached = perf_counter() - start
+        print(f'view {key or "-"}/{element or "-"}:'.ljust(22) + f'{built * 1000:8.2f} ms to build, {cached * 1e6:6.2f} us cached')
+    # a party monster taking damage keeps the sorted box and only merges the party back in
+    store.view('health', None, True)
+    store.party[0].health -= 1
+    start = perf_counter()
+    store.view('health', None, True)
+    print(f'view after party hit: {(perf_counter() - start) * 1000:8.2f} ms')
+    print(f'text cache:    {text_cache.hits} hits, {text_cache.misses} misses, {text_cache.nbytes / 1024:.1f} KiB')
+
+def tables(calls: int):
+    from timeit import timeit
+    from monster import Monster
+    from game_data import MONSTER_DATA, ATTACK_DATA
+    from game_tables import element_rule, element_multiplier
+
+    # each accessor against the dict lookups it replaced
+    monster = Monster('Cindrill', 20)
+    base_stats, abilities = MONSTER_DATA[monster.name]['stats'], MONSTER_DATA[monster.name]['abilities']
+    cases = [
+        ('get_stat', lambda: base_stats['speed'] * monster.level, lambda: monster.get_stat('speed')),
+        ('get_stats', lambda: {stat: base_stats[f'max_{stat}' if stat in ('health', 'energy') else stat] * monster.level for stat in ('health', 'energy', 'attack', 'defense', 'speed', 'recovery')}, monster.get_stats),
+        ('get_abilities', lambda: [ability for level, ability in abilities.items() if monster.level >= level and ATTACK_DATA[ability]['cost'] < monster.energy], lambda: monster.get_abilities(all=False)),
+        ('get_base_damage', lambda: base_stats['attack'] * monster.level * ATTACK_DATA['fire']['amount'], lambda: monster.get_base_damage('fire')),
+        ('element', lambda: element_rule('water', 'plant'), lambda: element_multiplier('water', 'plant')),
+    ]
+    for name, before, after in cases:
+        assert before() == after()
+        before_time = timeit(before, number=calls) / calls * 1e9
+        after_time = timeit(after, number=calls) / calls * 1e9
+        print(f'{name + ":":<16} {before_time:7.1f} ns from game_data, {after_time:7.1f} ns from game_tables ({before_time / after_time:.1f}x)')
+
+def headless(battles: int):
+    from random import Random
+    from battle_state import BattleState
+    from monster import Monster
+    from game_data import MONSTER_DATA
+
+    def play(seed: int) -> BattleState:
+        rng = Random(seed)
+        player = { index: Monster(name, rng.randint(5, 15)) for index, name in enumerate(rng.sample(list(MONSTER_DATA), 4)) }
+        opponent = { index: Monster(name, rng.randint(5, 15)) for index, name in enumerate(rng.sample(list(MONSTER_DATA), 4)) }
+        state = BattleState(player, opponent, rng=rng)
+        state.resolve()
+        return state
+
+    start = perf_counter()
+    states = [play(seed) for seed in range(battles)]
+    elapsed = perf_counter() - start
+    simulated = sum(state.time for state in states) / 1000
+    print(f'headless:      {battles / elapsed:8.0f} battles/s ({simulated / elapsed:.0f}x real time, {battles} battles of 4 vs 4)')
+
+def wild(encounters: int):
+    from main import Game
+
+    game = Game()
+    patches = game.tmx_map.monsters
+    wins, simulated, elapsed = 0, 0.0, 0.0
+    for encounter in range(encounters):
+        # a healed party each time, so every encounter is a full battle
+        for monster in game.player_monsters.values():
+            monster.health, monster.energy = monster.get_stat('max_health'), monster.get_stat('max_energy')
+        start = perf_counter()
+        game.auto_encounter(patches[encounter % len(patches)])
+        elapsed += perf_counter() - start
+        wins += game.summary.winner == 'player'
+        simulated += game.summary.length
+        game.end_summary()
+
+    levels = ', '.join(f'{monster.name} {monster.level}' for monster in game.player_monsters.values())
+    print(f'auto-resolve:  {elapsed / encounters * 1000:8.2f} ms per wild battle ({simulated / elapsed:.0f}x real time, {wins} of {encounters} won)')
+    print(f'party:         {levels}')
+
+def ai(battles: int, trainer: str):
+    from random import Random
+    from battle_state import BattleState, random_action
+    from battle_ai import LookaheadAI
+    from monster import Monster
+    from game_data import TRAINER_DATA
+    from settings import BATTLE_AI
+
+    roster = TRAINER_DATA[trainer]['monsters']
+    party = [('Pluma', 30), ('Charmadillo', 30), ('Gulfin', 28), ('Finiette', 28)]
+
+    # a spinning loop is only interrupted by the host, so its gaps show how often any decision can be held up from outside
+    stalls, last = [], perf_counter()
+    end = last + 1
+    while last < end:
+        now = perf_counter()
+        if now - last > 0.0005:
+            stalls.append(now - last)
+        last = now
+    print(f'host:     {len(stalls)} stalls over 0.5 ms in 1 s of spinning, {sum(stall > 0.002 for stall in stalls)} over 2 ms')
+    for difficulty, options in BATTLE_AI.items():
+        policy = LookaheadAI(**options)
+        times, cpu_times, depths, wins = [], [], [], 0
+
+        def timed(state, fighter):
+            start, cpu_start = perf_counter(), thread_time()
+            action = policy(state, fighter)
+            cpu_times.append(thread_time() - cpu_start)
+            times.append(perf_counter() - start)
+            depths.append(policy.reached)
+            return action
+
+        for seed in range(battles):
+            player = { index: Monster(name, level) for index, (name, level) in enumerate(party) }
+            opponent = { index: Monster(*roster[index]) for index in sorted(roster) }
+            state = BattleState(player, opponent, opponent_policy=timed, rng=Random(seed))
+            wins += state.resolve(player_policy=random_action) == 'opponent'
+        times.sort()
+        searched = [depth for depth in depths if depth]
+        # wall time includes the process being descheduled, which thread time leaves out
+        over = sum(time * 1000 > policy.budget for time in times)
+        cpu_over = sum(time * 1000 > policy.budget for time in cpu_times)
+        print(f'{difficulty + ":":<8} {times[len(times) // 2] * 1000:6.3f} ms median, {times[int(len(times) * 0.99)] * 1000:6.3f} ms p99 per decision, '
+              f'{over} of {len(times)} over {policy.budget} ms ({cpu_over} in thread time, max {max(cpu_times) * 1000:.3f} ms), depth {sum(searched) / max(len(searched), 1):.1f}, trainer wins {wins / battles:.0%} against a random player')
+
+# the kernel fails the check when any matchup is this far from the scalar engine, or the matchups are on average this spread
+# out (mean z squared is about 1 without a drift) or this biased to one side (mean z is about 0 with a spread of 1 / sqrt(matchups))
+KERNEL_MAX_Z = 4.5
+KERNEL_MEAN_Z_SQUARED = 2.0
+KERNEL_MEAN_Z = 0.5
+
+def kernel(battles: int, matchups: int, level: int, seed: int):
+    import numpy as np
+    from battle_kernel import BattleKernel, SPECIES
+    from simulator import play, species_matchups
+
+    chosen = species_matchups([level])[:matchups]
+    start = perf_counter()
+    scalar = [[play(matchup, f'kernel:{matchup.name}:{battle}') for battle in range(battles)] for matchup in chosen]
+    scalar_rate = len(chosen) * battles / (perf_counter() - start)
+
+    # the kernel gets 20x the battles so its own sampling error is small
+    size = battles * 20
+    player = np.repeat([SPECIES.index(matchup.player[0][0]) for matchup in chosen], size)
+    opponent = np.repeat([SPECIES.index(matchup.opponent[0][0]) for matchup in chosen], size)
+    levels = np.full(len(player), level)
+    start = perf_counter()
+    vectorized = BattleKernel((player, levels), (opponent, levels), seed=seed).run()
+    kernel_rate = len(player) / (perf_counter() - start)
+
+    # per matchup z scores of scalar minus kernel means, with the kernel's large sample as the reference spread
+    scores = {'win rate': [], 'length': [], 'damage': []}
+    for number, results in enumerate(scalar):
+        rows = slice(number * size, (number + 1) * size)
+        samples = {
+            'win rate': ([result.winner == 'player' for result in results], vectorized.winner[rows] == 0),
+            'length': ([result.length for result in results], vectorized.length[rows]),
+            'damage': ([sum(hit for hit in result.hits['player'] if hit > 0) for result in results], vectorized.damage[rows, 0]),
+        }
+        for name, (values, vector) in samples.items():
+            values = np.asarray(values, dtype=np.float64)
+            error = vector.std() * np.sqrt(1 / len(values) + 1 / len(vector))
+            scores[name].append((values.mean() - vector.mean()) / error if error else 0.0)
+
+    print(f'scalar:        {scalar_rate:8.0f} battles/s ({len(chosen)} matchups x {battles}, level {level})')
+    print(f'kernel:        {kernel_rate:8.0f} battles/s ({len(player)} battles, {kernel_rate / scalar_rate:.0f}x)')
+    failures = []
+    for name, values in scores.items():
+        values = np.asarray(values)
+        worst = np.abs(values).argmax()
+        print(f'{name + ":":<14} max |z| {abs(values[worst]):5.2f} (worst: {chosen[worst].name}), mean z {values.mean():5.2f}, mean z^2 {(values ** 2).mean():5.2f}')
+        if abs(values[worst]) > KERNEL_MAX_Z:
+            failures.append(f'{name}: |z| {abs(values[worst]):.2f} > {KERNEL_MAX_Z} for {chosen[worst].name}')
+        if (values ** 2).mean() > KERNEL_MEAN_Z_SQUARED:
+            failures.append(f'{name}: mean z^2 {(values ** 2).mean():.2f} > {KERNEL_MEAN_Z_SQUARED}')
+        if abs(values.mean()) > KERNEL_MEAN_Z:
+            failures.append(f'{name}: mean z {values.mean():.2f} outside +-{KERNEL_MEAN_Z}')
+    if failures:
+        sys.exit('kernel drifts from the scalar engine:\n' + '\n'.join(failures))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Tamelure performance benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('launch', help='construct the game once and print the elapsed seconds')
+    startup_parser = commands.add_parser('startup', help='compare cold and warm launches of the asset pack')
+    startup_parser.add_argument('--runs', type=int, default=5)
+    timings_parser = commands.add_parser('import-timings', help='construct the game once and print import timings as JSON')
+    timings_parser.add_argument('workers', type=int)
+    assets_parser = commands.add_parser('assets', help='wall time per asset category for several decode pool sizes')
+    assets_parser.add_argument('--workers', type=lambda value: [int(count) for count in value.split(',')], default=[1, 4, 16])
+    maps_parser = commands.add_parser('maps', help='compare pytmx and compiled map load time for world.tmx')
+    maps_parser.add_argument('--runs', type=int, default=10)
+    level_parser = commands.add_parser('level', help='sprite count, setup time and frame time of the world map')
+    level_parser.add_argument('--frames', type=int, default=300)
+    collision_parser = commands.add_parser('collision', help='linear scan vs spatial hash collision checks on a synthetic map')
+    collision_parser.add_argument('--colliders', type=int, default=10000)
+    collision_parser.add_argument('--queries', type=int, default=2000)
+    battle_parser = commands.add_parser('battle', help='battle frame time with six monsters on the field')
+    battle_parser.add_argument('--frames', type=int, default=600)
+    battle_parser.add_argument('--box', type=int, default=0, help='random monsters caught beyond the party')
+    index_parser = commands.add_parser('index', help='monster index frame time and text cache counters')
+    index_parser.add_argument('--frames', type=int, default=600)
+    index_parser.add_argument('--box', type=int, default=0, help='random monsters caught beyond the party')
+    tables_parser = commands.add_parser('tables', help='monster stat, ability and element accessors: game_data dicts against compiled tables')
+    tables_parser.add_argument('--calls', type=int, default=200000)
+    headless_parser = commands.add_parser('headless', help='battles per second resolved by the display-free battle state')
+    headless_parser.add_argument('--battles', type=int, default=500)
+    wild_parser = commands.add_parser('wild', help='auto-resolved wild encounters on the world map, healing the party in between')
+    wild_parser.add_argument('--encounters', type=int, default=200)
+    ai_parser = commands.add_parser('ai', help='decision time, search depth and strength of the trainer AI per difficulty')
+    ai_parser.add_argument('--battles', type=int, default=50)
+    ai_parser.add_argument('--trainer', default='o4')
+    kernel_parser = commands.add_parser('kernel', help='vectorized battle kernel against the scalar engine: speed, and z scores per matchup that fail the run on a drift')
+    kernel_parser.add_argument('--battles', type=int, default=150, help='scalar battles per matchup')
+    kernel_parser.add_argument('--matchups', type=int, default=64)
+    kernel_parser.add_argument('--level', type=int, default=10)
+    kernel_parser.add_argument('--seed', type=int, default=0, help='kernel seed, the scalar battles are seeded per matchup and battle')
+
+    args = parser.parse_args()
+    match args.command:
+        case 'launch': launch()
+        case 'startup': startup(args.runs)
+        case 'import-timings': import_timings(args.workers)
+        case 'assets': assets(args.workers)
+        case 'maps': maps(args.runs)
+        case 'level': level(args.frames)
+        case 'collision': collision(args.colliders, args.queries)
+        case 'battle': battle(args.frames, args.box)
+        case 'index': index(args.frames, args.box)
+        case 'tables': tables(args.calls)
+        case 'headless': headless(args.battles)
+        case 'wild': wild(args.encounters)
+        case 'ai': ai(args.battles, args.trainer)
+        case 'kernel': kernel(args.battles, args.matchups, args.level, args.seed)
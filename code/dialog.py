@@ -51,7 +51,7 @@ class DialogSprite(pygame.sprite.Sprite):
 
         # text
         padding = 5
-        text_surf = font.render(message,False,COLORS['black'])
+        text_surf = render_text(font,message,False,COLORS['black'])
         width = max(30,(text_surf.get_width() + padding * 2))
         height = text_surf.get_height() + padding * 2
 
@@ -5,6 +5,7 @@ from settings import *
 from sprites import *
 from game_data import *
 from custom_timer import *
+from spatial import *
 
 
 class Entity(pygame.sprite.Sprite):
@@ -49,6 +50,16 @@ class Entity(pygame.sprite.Sprite):
     def unblock(self):
         self.blocked = False
 
+    def respawn(self, pos: tuple[float,float], facing_direction: str):
+        self.facing_direction = facing_direction
+        self.frame_index = 0
+        self.direction = vector(0,0)
+        self.blocked = False
+        self.image = self.frames[self.facing_direction][self.frame_index]
+        self.rect.center = pos
+        self.hitbox.center = pos
+        self.y_sort = self.rect.centery
+
     def change_facing_direction(self, target_pos: tuple[float,float]):
         relation = vector(target_pos) - vector(self.rect.center)
         if abs(relation.y) < 30:
@@ -69,13 +80,18 @@ class Player(Entity):
             facing_direction: str,
             frames: dict[str,list[Surface]],
             groups: tuple[pygame.sprite.Group],
-            collision_sprites: pygame.sprite.Group
+            collision_sprites: SpatialHash
         ):
         super().__init__(pos, facing_direction, frames, groups)
         self.collision_sprites = collision_sprites
         self.noticed = False
         self.character_approaching = False
 
+    def respawn(self, pos: tuple[float,float], facing_direction: str):
+        super().respawn(pos,facing_direction)
+        self.noticed = False
+        self.character_approaching = False
+
     def input(self):
         keys = pygame.key.get_pressed()
         self.direction.x = int(keys[pygame.K_d] or keys[pygame.K_RIGHT]) - int(keys[pygame.K_a] or keys[pygame.K_LEFT])
@@ -91,16 +107,15 @@ class Player(Entity):
         self.collision('vertical')
 
     def collision(self, axis: str):
-        for sprite in self.collision_sprites:
-            if sprite.hitbox.colliderect(self.hitbox):
-                if axis == 'horizontal':
-                    if self.direction.x > 0 : self.hitbox.right = sprite.hitbox.left
-                    if self.direction.x < 0 : self.hitbox.left = sprite.hitbox.right
-                    self.rect.centerx = self.hitbox.centerx
-                if axis == 'vertical':
-                    if self.direction.y > 0 : self.hitbox.bottom = sprite.hitbox.top
-                    if self.direction.y < 0 : self.hitbox.top = sprite.hitbox.bottom
-                    self.rect.centery = self.hitbox.centery
+        for sprite in self.collision_sprites.collide(self.hitbox):
+            if axis == 'horizontal':
+                if self.direction.x > 0 : self.hitbox.right = sprite.hitbox.left
+                if self.direction.x < 0 : self.hitbox.left = sprite.hitbox.right
+                self.rect.centerx = self.hitbox.centerx
+            if axis == 'vertical':
+                if self.direction.y > 0 : self.hitbox.bottom = sprite.hitbox.top
+                if self.direction.y < 0 : self.hitbox.top = sprite.hitbox.bottom
+                self.rect.centery = self.hitbox.centery
 
     def update(self, dt: float, *args, **kwargs):
         super().update(*args, **kwargs)
@@ -121,7 +136,8 @@ class Character(Entity):
             character_data: dict,
             player: Player,
             create_dialog: Callable[['Character'],None],
-            collision_sprites: pygame.sprite.Group,
+            collision_sprites: SpatialHash,
+            sight_blockers: OccupancyGrid,
             radius: float,
             nurse: bool,
             notice_sound: pygame.Sound
@@ -130,22 +146,31 @@ class Character(Entity):
         self.character_data = character_data
         self.player = player
         self.create_dialog = create_dialog
-        self.collsion_rects: list[pygame.FRect] = [sprite.rect for sprite in collision_sprites if sprite is not self]
+        self.collision_sprites = collision_sprites
+        self.sight_blockers = sight_blockers
         self.nurse = nurse
-        self.monsters: None | dict[int, Monster] = { index: Monster(name,level) for index, (name, level) in self.character_data['monsters'].items()} if 'monsters'in self.character_data else None
+        self.spawn = (pos, facing_direction)
 
         # movement
+        self.radius = radius
+        self.view_directions = character_data['directions']
+        self.notice_sound = notice_sound
+        self.reset()
+
+    def reset(self):
+        # back to the state a freshly built map starts in; trainer data such as 'defeated' lives in TRAINER_DATA
+        self.respawn(*self.spawn)
+        self.monsters: None | dict[int, Monster] = { index: Monster(name,level) for index, (name, level) in self.character_data['monsters'].items()} if 'monsters'in self.character_data else None
         self.has_moved = False
         self.can_rotate = True
         self.has_noticed = False
-        self.radius = radius
-        self.view_directions = character_data['directions']
 
         self.timers: dict[str, Timer] = {
             'look_around': Timer(1500,True,True,self.random_view_direction),
             'notice': Timer(500,func=self.start_move)
         }
-        self.notice_sound = notice_sound
+        self.collision_sprites.move(self)
+        self.sight_blockers.move(self)
 
     def random_view_direction(self):
         if self.can_rotate:
@@ -169,8 +194,7 @@ class Character(Entity):
 
     def has_los(self):
         if vector(self.rect.center).distance_to(self.player.rect.center) < self.radius:
-            collisions = [ bool(rects.clipline(self.rect.center,self.player.rect.center )) for rects in self.collsion_rects ]
-            return not any(collisions)
+            return not self.sight_blockers.raycast(self.rect.center,self.player.rect.center,self)
 
     def start_move(self):
         relation = (vector(self.player.rect.center) - vector(self.rect.center)).normalize()
@@ -181,6 +205,8 @@ class Character(Entity):
             if not self.hitbox.inflate(10,10).colliderect(self.player.hitbox):
                 self.rect.center += (self.direction * self.speed * dt)
                 self.hitbox.center = self.rect.center
+                self.collision_sprites.move(self)
+                self.sight_blockers.move(self)
             else:
                 self.has_moved = True
                 self.direction = vector(0,0)
@@ -1,7 +1,9 @@
-from typing import Literal, Callable
+from typing import Callable
 
 from settings import *
+from game_tables import *
 from custom_timer import *
+from transform_cache import *
 
 
 class Evolution():
@@ -9,20 +11,22 @@ class Evolution():
     def __init__(
             self,
             frames:  dict[str, dict[str, list[pygame.Surface]]],
-            start_monster: Literal['Plumette', 'Ivieron', 'Sparchu', 'Cindrill', 'Finsta', 'Gulfin', 'Larvea'],
-            end_monster: Literal['Ivieron', 'Pluma', 'Cindrill', 'Charmadillo', 'Gulfin', 'Finiette', 'Cleaf'],
+            start_monster: str,
             font: pygame.Font,
             end_evolution: Callable[[],None],
             star_frames: list[pygame.Surface]
         ):
 
-        # star frames
+        # the species it turns into comes from the evolution table
+        end_monster = SPECIES_EVOLUTIONS[SPECIES_IDS[start_monster]][0]
+
+        # star frames, full screen and too big for the transform cache, so scaled once here and dropped with the evolution
         self.star_frames = [ pygame.transform.scale2x(frame) for frame in star_frames]
         self.frame_index = 0
 
         self.display_surface = pygame.display.get_surface()
-        self.start_monster_surf: pygame.Surface = pygame.transform.scale2x(frames[start_monster]['idle'][0])
-        self.end_monster_surf: pygame.Surface = pygame.transform.scale2x(frames[end_monster]['idle'][0])
+        self.start_monster_surf: pygame.Surface = scale2x(frames[start_monster]['idle'][0])
+        self.end_monster_surf: pygame.Surface = scale2x(frames[end_monster]['idle'][0])
         self.timers: dict[str, Timer] = {
             'start': Timer(800, autostart=True),
             'end': Timer(1800, func = end_evolution)
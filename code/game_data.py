@@ -7,7 +7,8 @@ TRAINER_DATA = {
 		'directions': ['down'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'forest'
+		'biome': 'forest',
+		'difficulty': 'easy'
 		},
 	'o2': {
 		'monsters': {0: ('Atrox', 14), 1: ('Pouch', 15), 2: ('Draem', 13), 3: ('Cindrill', 13)},
@@ -17,7 +18,8 @@ TRAINER_DATA = {
 		'directions': ['left', 'down'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'sand'
+		'biome': 'sand',
+		'difficulty': 'easy'
 		},
 	'o3': {
 		'monsters': {0: ('Atrox', 14), 1: ('Pouch', 15), 2: ('Draem', 13), 3: ('Cindrill', 13)},
@@ -27,7 +29,8 @@ TRAINER_DATA = {
 		'directions': ['left', 'right', 'up', 'down'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'sand'
+		'biome': 'sand',
+		'difficulty': 'easy'
 		},
 	'o4': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Atrox',24), 3: ('Finiette', 30)},
@@ -37,7 +40,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'forest'
+		'biome': 'forest',
+		'difficulty': 'normal'
 		},
 	'o5': {
 		'monsters': {0: ('Plumette', 20), 1: ('Ivieron', 22), 2: ('Atrox',24), 3: ('Pouch', 19)},
@@ -47,7 +51,8 @@ TRAINER_DATA = {
 		'directions': ['up', 'right'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'forest'
+		'biome': 'forest',
+		'difficulty': 'normal'
 		},
 	'o6': {
 		'monsters': {0: ('Finsta', 15), 1: ('Finsta', 15), 2: ('Finsta', 15)},
@@ -57,7 +62,8 @@ TRAINER_DATA = {
 		'directions': ['down'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'ice'
+		'biome': 'ice',
+		'difficulty': 'normal'
 		},
 	'o7': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Atrox',24), 3: ('Finiette', 30)},
@@ -67,7 +73,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'ice'
+		'biome': 'ice',
+		'difficulty': 'normal'
 		},
 	'p1': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Atrox',24), 3: ('Finiette', 30)},
@@ -77,7 +84,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'forest'
+		'biome': 'forest',
+		'difficulty': 'normal'
 		},
 	'p2': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Atrox',24), 3: ('Finiette', 30)},
@@ -87,7 +95,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'forest'
+		'biome': 'forest',
+		'difficulty': 'normal'
 		},
 	'p3': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Atrox',24), 3: ('Finiette', 30)},
@@ -97,7 +106,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'forest'
+		'biome': 'forest',
+		'difficulty': 'normal'
 		},
 	'p4': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Atrox',24), 3: ('Finiette', 30)},
@@ -107,7 +117,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'forest'
+		'biome': 'forest',
+		'difficulty': 'normal'
 		},
 	'px': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Atrox',24), 3: ('Finiette', 30)},
@@ -117,7 +128,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'forest'
+		'biome': 'forest',
+		'difficulty': 'hard'
 		},
 	'w1': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Draem',24), 3: ('Finiette', 30)},
@@ -127,7 +139,8 @@ TRAINER_DATA = {
 		'directions': ['left'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'ice'
+		'biome': 'ice',
+		'difficulty': 'normal'
 		},
 	'w2': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Draem',24), 3: ('Finiette', 30)},
@@ -137,7 +150,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'ice'
+		'biome': 'ice',
+		'difficulty': 'normal'
 		},
 	'w3': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Draem',24), 3: ('Finiette', 30)},
@@ -147,7 +161,8 @@ TRAINER_DATA = {
 		'directions': ['left'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'ice'
+		'biome': 'ice',
+		'difficulty': 'normal'
 		},
 	'w4': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Draem',24), 3: ('Finiette', 30)},
@@ -157,7 +172,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'ice'
+		'biome': 'ice',
+		'difficulty': 'normal'
 		},
 	'w5': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Draem',24), 3: ('Finiette', 30)},
@@ -167,7 +183,8 @@ TRAINER_DATA = {
 		'directions': ['left'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'ice'
+		'biome': 'ice',
+		'difficulty': 'normal'
 		},
 	'wx': {
 		'monsters': {0: ('Friolera', 25), 1: ('Gulfin', 20), 2: ('Draem',24), 3: ('Finiette', 30)},
@@ -177,7 +194,8 @@ TRAINER_DATA = {
 		'directions': ['down'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'ice'
+		'biome': 'ice',
+		'difficulty': 'hard'
 		},
 	'f1': {
 		'monsters': {0: ('Cindrill', 15), 1: ('Jacana', 20), 2: ('Draem',24), 3: ('Atrox', 30)},
@@ -187,7 +205,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'sand'
+		'biome': 'sand',
+		'difficulty': 'normal'
 		},
 	'f2': {
 		'monsters': {0: ('Cindrill', 15), 1: ('Jacana', 20), 2: ('Draem',24), 3: ('Atrox', 30)},
@@ -197,7 +216,8 @@ TRAINER_DATA = {
 		'directions': ['right', 'left'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'sand'
+		'biome': 'sand',
+		'difficulty': 'normal'
 		},
 	'f3': {
 		'monsters': {0: ('Cindrill', 15), 1: ('Jacana', 20), 2: ('Draem',24), 3: ('Atrox', 30)},
@@ -207,7 +227,8 @@ TRAINER_DATA = {
 		'directions': ['right', 'left'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'sand'
+		'biome': 'sand',
+		'difficulty': 'normal'
 		},
 	'f4': {
 		'monsters': {0: ('Cindrill', 15), 1: ('Jacana', 20), 2: ('Draem',24), 3: ('Atrox', 30)},
@@ -217,7 +238,8 @@ TRAINER_DATA = {
 		'directions': ['up', 'right'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'sand'
+		'biome': 'sand',
+		'difficulty': 'normal'
 		},
 	'f5': {
 		'monsters': {0: ('Cindrill', 15), 1: ('Jacana', 20), 2: ('Draem',24), 3: ('Atrox', 30)},
@@ -227,7 +249,8 @@ TRAINER_DATA = {
 		'directions': ['left'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'sand'
+		'biome': 'sand',
+		'difficulty': 'normal'
 		},
 	'f6': {
 		'monsters': {0: ('Cindrill', 15), 1: ('Jacana', 20), 2: ('Draem',24), 3: ('Atrox', 30)},
@@ -237,7 +260,8 @@ TRAINER_DATA = {
 		'directions': ['right'],
 		'look_around': True,
 		'defeated': False,
-		'biome': 'sand'
+		'biome': 'sand',
+		'difficulty': 'normal'
 		},
 	'fx': {
 		'monsters': {0: ('Cindrill', 15), 1: ('Jacana', 20), 2: ('Draem',24), 3: ('Atrox', 30)},
@@ -247,7 +271,8 @@ TRAINER_DATA = {
 		'directions': ['down'],
 		'look_around': False,
 		'defeated': False,
-		'biome': 'sand'
+		'biome': 'sand',
+		'difficulty': 'hard'
 		},
 	'Nurse': {
 		'direction': 'down',
@@ -0,0 +1,104 @@
+from settings import *
+from game_data import *
+
+
+# game_data.py compiled at import: names become integer ids and everything derived from a species and level is looked up
+MAX_LEVEL = 100
+
+SPECIES: tuple[str, ...] = tuple(MONSTER_DATA)
+ATTACKS: tuple[str, ...] = tuple(ATTACK_DATA)
+ELEMENTS: tuple[str, ...] = ('normal', 'fire', 'water', 'plant')
+STATS: tuple[str, ...] = ('max_health', 'max_energy', 'attack', 'defense', 'recovery', 'speed')
+
+SPECIES_IDS = { name: index for index, name in enumerate(SPECIES) }
+ATTACK_IDS = { name: index for index, name in enumerate(ATTACKS) }
+ELEMENT_IDS = { name: index for index, name in enumerate(ELEMENTS) }
+STAT_IDS = { name: index for index, name in enumerate(STATS) }
+MAX_HEALTH, MAX_ENERGY, ATTACK, DEFENSE, RECOVERY, SPEED = range(len(STATS))
+
+
+def validate():
+    for name, data in MONSTER_DATA.items():
+        stats = data['stats']
+        if stats.get('element') not in ELEMENT_IDS:
+            raise ValueError(f'{name}: unknown element {stats.get("element")!r}')
+        for stat in STATS:
+            if not isinstance(stats.get(stat),(int, float)) or stats[stat] < 0:
+                raise ValueError(f'{name}: {stat} must be a number >= 0, got {stats.get(stat)!r}')
+        for level, ability in data['abilities'].items():
+            if ability not in ATTACK_IDS:
+                raise ValueError(f'{name}: unknown ability {ability!r} at level {level}')
+        if data['evolve'] and (data['evolve'][0] not in SPECIES_IDS or not 0 < data['evolve'][1] <= MAX_LEVEL):
+            raise ValueError(f'{name}: bad evolution {data["evolve"]!r}')
+
+    for name, data in ATTACK_DATA.items():
+        if data['element'] not in ELEMENT_IDS:
+            raise ValueError(f'{name}: unknown element {data["element"]!r}')
+        if data['target'] not in ('player', 'opponent'):
+            raise ValueError(f'{name}: unknown target {data["target"]!r}')
+        if data['cost'] < 0:
+            raise ValueError(f'{name}: cost must be >= 0, got {data["cost"]!r}')
+
+    for trainer, data in TRAINER_DATA.items():
+        for name, level in data.get('monsters',{}).values():
+            if name not in SPECIES_IDS:
+                raise ValueError(f'{trainer}: unknown monster {name!r}')
+
+validate()
+
+
+# attacks, by attack id
+ATTACK_COSTS: tuple[float, ...] = tuple(ATTACK_DATA[attack]['cost'] for attack in ATTACKS)
+ATTACK_AMOUNTS: tuple[float, ...] = tuple(ATTACK_DATA[attack]['amount'] for attack in ATTACKS)
+ATTACK_ELEMENTS: tuple[int, ...] = tuple(ELEMENT_IDS[ATTACK_DATA[attack]['element']] for attack in ATTACKS)
+ATTACK_TARGETS: tuple[str, ...] = tuple(ATTACK_DATA[attack]['target'] for attack in ATTACKS)
+ATTACK_ANIMATIONS: tuple[str, ...] = tuple(ATTACK_DATA[attack]['animation'] for attack in ATTACKS)
+
+# elements, [attack element][target element]
+def element_rule(attack_element: str, target_element: str) -> float:
+    amount = 1.0
+
+    # double attack
+    if attack_element == 'fire' and target_element == 'plant' or\
+       attack_element == 'water' and target_element == 'fire' or\
+       attack_element == 'plant' and target_element == 'water':
+        amount *= 2
+
+    # half attack
+    if attack_element == 'water' and target_element == 'fire' or\
+       attack_element == 'water' and target_element == 'plant' or\
+       attack_element == 'plant' and target_element == 'fire':
+        amount *= 0.5
+    return amount
+
+ELEMENT_MATRIX: tuple[tuple[float, ...], ...] = tuple(tuple(element_rule(attack, target) for target in ELEMENTS) for attack in ELEMENTS)
+
+def element_multiplier(attack_element: str, target_element: str) -> float:
+    return ELEMENT_MATRIX[ELEMENT_IDS[attack_element]][ELEMENT_IDS[target_element]]
+
+# species, by species id
+SPECIES_ELEMENTS: tuple[int, ...] = tuple(ELEMENT_IDS[MONSTER_DATA[name]['stats']['element']] for name in SPECIES)
+SPECIES_EVOLUTIONS: tuple[tuple[str, int] | None, ...] = tuple(MONSTER_DATA[name]['evolve'] for name in SPECIES)
+SPECIES_UNLOCKS: tuple[tuple[tuple[int, int], ...], ...] = tuple(
+    tuple((level, ATTACK_IDS[ability]) for level, ability in MONSTER_DATA[name]['abilities'].items()) for name in SPECIES
+)
+
+# [species][level] -> stats in STATS order, the base stat times the level as Monster.get_stat always worked it out
+def stat_row(species: int, level: int) -> tuple[float, ...]:
+    stats = MONSTER_DATA[SPECIES[species]]['stats']
+    return tuple(stats[stat] * level for stat in STATS)
+
+STAT_CURVES: tuple[tuple[tuple[float, ...], ...], ...] = tuple(tuple(stat_row(species, level) for level in range(MAX_LEVEL + 1)) for species in range(len(SPECIES)))
+
+# [species][level] -> (name, cost) of the unlocked abilities, in get_abilities order
+def ability_row(species: int, level: int) -> tuple[tuple[str, float], ...]:
+    return tuple((ATTACKS[attack], ATTACK_COSTS[attack]) for unlock, attack in SPECIES_UNLOCKS[species] if level >= unlock)
+
+ABILITY_TABLE: tuple[tuple[tuple[tuple[str, float], ...], ...], ...] = tuple(tuple(ability_row(species, level) for level in range(MAX_LEVEL + 1)) for species in range(len(SPECIES)))
+
+def stats_at(species: int, level: int) -> tuple[float, ...]:
+    # levels past the table are worked out on the spot
+    return STAT_CURVES[species][level] if 0 <= level <= MAX_LEVEL else stat_row(species,level)
+
+def abilities_at(species: int, level: int) -> tuple[tuple[str, float], ...]:
+    return ABILITY_TABLE[species][level] if 0 <= level <= MAX_LEVEL else ability_row(species,level)
@@ -1,3 +1,6 @@
+from bisect import bisect_left, insort
+from heapq import merge
+from operator import itemgetter
 from typing import Any, Literal, Optional
 
 from settings import *
@@ -6,39 +9,185 @@ from entities import *
 from sprites import *
 
 
+class RenderList():
+    """Sprites kept in draw order by a key computed when they are inserted.
+
+    Keys end with the sprite's insertion number, so ties keep insertion order
+    and entries never compare the sprites themselves.
+    """
+
+    def __init__(self):
+        self.entries: list[tuple[tuple, pygame.sprite.Sprite]] = []
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def insert(self, key: tuple, sprite: pygame.sprite.Sprite):
+        insort(self.entries,(key,sprite))
+
+    def remove(self, key: tuple):
+        del self.entries[bisect_left(self.entries,(key,))]
+
+
 class AllSprites(pygame.sprite.Group):
+    """World sprites drawn relative to the player, culled against the camera.
+
+    Sprites other than entities never move once placed, so the first time they
+    are drawn they go into per-layer render lists of the coarse
+    SPRITE_BUCKET_SIZE buckets they overlap. Entities live in their own render
+    lists and are only re-inserted when their y_sort changes. Drawing merges the
+    lists of the buckets under the camera, which keeps the y-sort of the main
+    layer without sorting anything per frame.
+    """
 
     def __init__(self, *sprites):
+        self.buckets: dict[tuple[int,int], tuple[RenderList, RenderList, RenderList]] = {}
+        self.sprite_cells: dict[pygame.sprite.Sprite, list[tuple[int,int]]] = {}
+        self.unindexed: list[pygame.sprite.Sprite] = []
+        self.entities: list[Entity] = []
+        self.entity_lists = (RenderList(), RenderList(), RenderList())
+        self.entity_keys: dict[Entity, tuple[int, tuple]] = {}
+        self.order: dict[pygame.sprite.Sprite, int] = {}
+        self.sequence = 0
+        self.blit_count = 0
         super().__init__(*sprites)
         self.display_surface = pygame.display.get_surface()
         self.offset = vector()
+        self.animation_clock = AnimationClock()
         self.shadow_surf = import_image('graphics','other','shadow')
         self.notice_surf = import_image('graphics','ui','notice')
 
+    # index
+    def add_internal(self, sprite: pygame.sprite.Sprite, layer: Any = None):
+        super().add_internal(sprite,layer)
+        self.order[sprite] = self.sequence
+        self.sequence += 1
+        # rects and sort keys are assigned after the sprite joins its groups, so indexing waits for the next draw
+        if isinstance(sprite,Entity):
+            self.entities.append(sprite)
+        else:
+            self.unindexed.append(sprite)
+
+    def remove_internal(self, sprite: pygame.sprite.Sprite):
+        super().remove_internal(sprite)
+        if isinstance(sprite,Entity):
+            self.entities.remove(sprite)
+            if sprite in self.entity_keys:
+                layer, key = self.entity_keys.pop(sprite)
+                self.entity_lists[layer].remove(key)
+        elif sprite in self.sprite_cells:
+            layer, key = self.layer(sprite), self.sort_key(sprite)
+            for cell in self.sprite_cells.pop(sprite):
+                self.buckets[cell][layer].remove(key)
+        else:
+            self.unindexed.remove(sprite)
+        del self.order[sprite]
+
+    def layer(self, sprite: pygame.sprite.Sprite) -> int:
+        if sprite.z_index < WORLD_LAYERS['main']:
+            return 0
+        return 1 if sprite.z_index == WORLD_LAYERS['main'] else 2
+
+    def sort_key(self, sprite: pygame.sprite.Sprite) -> tuple:
+        if sprite.z_index == WORLD_LAYERS['main']:
+            return (sprite.y_sort, self.order[sprite])
+        return (self.order[sprite],)
+
+    def cells(self, rect: pygame.FRect) -> list[tuple[int,int]]:
+        left, top = int(rect.left // SPRITE_BUCKET_SIZE), int(rect.top // SPRITE_BUCKET_SIZE)
+        right, bottom = int(rect.right // SPRITE_BUCKET_SIZE), int(rect.bottom // SPRITE_BUCKET_SIZE)
+        return [(col,row) for col in range(left,right + 1) for row in range(top,bottom + 1)]
+
+    def index(self):
+        for sprite in self.unindexed:
+            layer, key = self.layer(sprite), self.sort_key(sprite)
+            self.sprite_cells[sprite] = self.cells(sprite.rect)
+            for cell in self.sprite_cells[sprite]:
+                if cell not in self.buckets:
+                    self.buckets[cell] = (RenderList(), RenderList(), RenderList())
+                self.buckets[cell][layer].insert(key,sprite)
+        self.unindexed.clear()
+
+        for entity in self.entities:
+            entry = (self.layer(entity), self.sort_key(entity))
+            if self.entity_keys.get(entity) != entry:
+                if entity in self.entity_keys:
+                    layer, key = self.entity_keys[entity]
+                    self.entity_lists[layer].remove(key)
+                self.entity_keys[entity] = entry
+                self.entity_lists[entry[0]].insert(entry[1],entity)
+
+    def update(self, dt: float, *args, **kwargs):
+        self.animation_clock.update(dt)
+        super().update(dt,*args,**kwargs)
+
+    def blit(self, surf: pygame.Surface, pos: vector):
+        # positions are floored so baked terrain chunks and single sprites snap to the same pixel grid
+        self.display_surface.blit(surf,(pos + self.offset) // 1)
+        self.blit_count += 1
+
     def draw(self,  player: Player):
         self.offset.x = -(player.rect.centerx - (WINDOW_WIDTH/2))
         self.offset.y = -(player.rect.centery - (WINDOW_HEIGHT/2))
+        self.blit_count = 0
 
-        bg_sprites = [ sprite for sprite in self.sprites() if sprite.z_index < WORLD_LAYERS['main']]
-        main_sprites = sorted([ sprite for sprite in self.sprites() if sprite.z_index == WORLD_LAYERS['main']], key=lambda sprite: sprite.y_sort)
-        fg_sprites = [ sprite for sprite in self.sprites() if sprite.z_index > WORLD_LAYERS['main']]
+        self.index()
+        camera = pygame.FRect(-self.offset.x,-self.offset.y,WINDOW_WIDTH,WINDOW_HEIGHT)
+        # entities also draw a shadow below and a notice bubble above their rect
+        entity_camera = camera.inflate(0,2 * self.notice_surf.height)
+        buckets = [self.buckets[cell] for cell in self.cells(camera) if cell in self.buckets]
 
-        for layer in [bg_sprites, main_sprites, fg_sprites]:
-            for sprite in layer:
+        for layer in range(3):
+            previous = None
+            # a sprite spanning several buckets comes out of the merge once per bucket, back to back
+            for _, sprite in merge(*(bucket[layer] for bucket in buckets), self.entity_lists[layer], key=itemgetter(0)):
+                if sprite is previous:
+                    continue
+                previous = sprite
                 if isinstance(sprite,Entity):
-                    self.display_surface.blit(self.shadow_surf,sprite.rect.topleft + self.offset + vector(40,110))
-                self.display_surface.blit(sprite.image,sprite.rect.topleft + self.offset)
+                    if not sprite.rect.colliderect(entity_camera):
+                        continue
+                    self.blit(self.shadow_surf,sprite.rect.topleft + vector(40,110))
+                elif not sprite.rect.colliderect(camera):
+                    continue
+                self.blit(sprite.image,vector(sprite.rect.topleft))
                 if sprite == player and player.noticed:
                     rect = self.notice_surf.get_frect(midbottom = player.rect.midtop)
-                    self.display_surface.blit(self.notice_surf,rect.topleft + self.offset)
+                    self.blit(self.notice_surf,vector(rect.topleft))
 
 
 class BattleSprites(pygame.sprite.Group):
 
     def __init__(self, *sprites):
+        self.render_list = RenderList()
+        self.unsorted: list[pygame.sprite.Sprite] = []
+        self.keys: dict[pygame.sprite.Sprite, tuple[int, int]] = {}
+        self.sequence = 0
         super().__init__(*sprites)
         self.display_surface = pygame.display.get_surface()
 
+    def add_internal(self, sprite: pygame.sprite.Sprite, layer: Any = None):
+        super().add_internal(sprite,layer)
+        # z_index is assigned after the sprite joins its groups
+        self.unsorted.append(sprite)
+
+    def remove_internal(self, sprite: pygame.sprite.Sprite):
+        super().remove_internal(sprite)
+        if sprite in self.keys:
+            self.render_list.remove(self.keys.pop(sprite))
+        else:
+            self.unsorted.remove(sprite)
+
+    def sort(self):
+        for sprite in self.unsorted:
+            self.keys[sprite] = (sprite.z_index, self.sequence)
+            self.render_list.insert(self.keys[sprite],sprite)
+            self.sequence += 1
+        self.unsorted.clear()
+
     def draw(
             self,
             current_monster_sprite: MonsterSprite,
@@ -53,7 +202,8 @@ class BattleSprites(pygame.sprite.Group):
         sprites: dict[int,MonsterSprite] = {sprite.pos_index: sprite for sprite in sprite_group}
         monster_sprite = sprites[list(sprites.keys())[target_index]] if sprites else None
 
-        for sprite in sorted(self.sprites(), key = lambda sprite: sprite.z_index):
+        self.sort()
+        for _, sprite in self.render_list:
             if sprite.z_index == BATTLE_LAYERS['outline']:
                 if sprite.monster_sprite == current_monster_sprite and not (mode == 'target' and side == 'player') or\
                    sprite.monster_sprite == monster_sprite and sprite.monster_sprite.entity == side and mode and mode == 'target':
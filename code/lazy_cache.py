@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from settings import *
+
+
+class LazyCache():
+    """Loads entries on first access and keeps recently used ones under a byte budget.
+
+    Each name maps to the source its loader is called with. Entries likely to
+    be needed soon (such as neighbouring maps) can be prefetched on a
+    background thread, so the loader must not touch the display; `finish`
+    turns its result into the stored entry on the main thread. Entries in
+    `pinned` and the most recently used one are never evicted.
+    """
+
+    def __init__(
+            self,
+            paths: dict[str, Any],
+            loader: Callable[[Any], Any],
+            size_of: Callable[[Any], int],
+            neighbours: Callable[[Any], list[str]] = lambda entry: [],
+            budget: int = MAP_CACHE_BUDGET,
+            pinned: tuple[str, ...] = ('world',),
+            finish: Callable[[Any], Any] = lambda entry: entry
+        ):
+        self.paths = paths
+        self.loader = loader
+        self.size_of = size_of
+        self.neighbours_of = neighbours
+        self.budget = budget
+        self.pinned = set(pinned)
+        self.finish = finish
+
+        self.entries: OrderedDict[str, Any] = OrderedDict()
+        self.sizes: dict[str, int] = {}
+        self.loading: dict[str, Future] = {}
+        self.pool = ThreadPoolExecutor(1)
+
+    def __contains__(self, name: str):
+        return name in self.paths
+
+    def __getitem__(self, name: str):
+        if name not in self.entries:
+            future = self.loading.pop(name,None)
+            self.store(name,future.result() if future else self.loader(self.paths[name]))
+        self.entries.move_to_end(name)
+        return self.entries[name]
+
+    def store(self, name: str, entry: Any, recent = True):
+        entry = self.finish(entry)
+        self.entries[name] = entry
+        self.sizes[name] = self.size_of(entry)
+        if not recent:
+            self.entries.move_to_end(name,last=False)
+        self.evict()
+
+    def discard(self, name: str):
+        self.entries.pop(name,None)
+        self.sizes.pop(name,None)
+
+    def collect(self):
+        for name, future in list(self.loading.items()):
+            if future.done():
+                del self.loading[name]
+                self.store(name,future.result(),False)
+
+    def evict(self):
+        for name in list(self.entries):
+            if sum(self.sizes.values()) <= self.budget:
+                break
+            if name not in self.pinned and name != next(reversed(self.entries)):
+                del self.entries[name]
+                del self.sizes[name]
+
+    def neighbours(self, name: str) -> list[str]:
+        return [target for target in self.neighbours_of(self[name]) if target in self.paths and target != name]
+
+    def prefetch(self, names: list[str]):
+        self.collect()
+        estimate = max(self.sizes.values(),default=0)
+        for name in names:
+            if name in self.entries or name in self.loading:
+                continue
+            if sum(self.sizes.values()) + estimate * (len(self.loading) + 1) > self.budget:
+                break
+            self.loading[name] = self.pool.submit(self.loader,self.paths[name])
+
+
+class CacheView():
+    """One part of every entry of a LazyCache, looked up by the same names."""
+
+    def __init__(self, cache: LazyCache, part: str):
+        self.cache = cache
+        self.part = part
+
+    def __getitem__(self, name: str):
+        return self.cache[name][self.part]
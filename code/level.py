@@ -0,0 +1,32 @@
+from settings import *
+from entities import *
+from groups import *
+from spatial import *
+from map_compiler import CompiledMap
+
+
+class Level():
+    """Sprites, groups and characters built for one map.
+
+    Built levels are cached by the game, so walking back into a recently
+    visited map swaps its groups back in instead of rebuilding them.
+    """
+
+    def __init__(self, name: str, tmx_map: CompiledMap):
+        self.name = name
+        self.tmx_map = tmx_map
+        self.all_sprites = AllSprites()
+        self.collision_sprites = SpatialHash()
+        self.sight_blockers = OccupancyGrid()
+        self.character_sprites = pygame.sprite.Group()
+        self.player: Player | None = None
+
+        # water frames tiled to each region size, freed with the level
+        self.tiled_frames: dict[tuple[int, int, int], list[pygame.Surface]] = {}
+
+    @property
+    def nbytes(self) -> int:
+        # the animation frames of its water and coast regions; the map and its baked chunks are borrowed
+        # from the map cache, which already counts them
+        region_frames = { id(surf): surf for sprite in self.all_sprites if isinstance(sprite,RegionSprite) for surf in sprite.frames }
+        return sum(surf.width * surf.height * 4 for surf in region_frames.values())
@@ -9,9 +9,16 @@ from support import *
 from dialog import *
 from monster import *
 from monster_index import *
+from monster_store import MonsterStore
 from battle import *
 from custom_timer import *
 from evolution import *
+from battle_summary import *
+from asset_cache import *
+from spatial import *
+from map_compiler import MonsterRecord, TransitionRecord
+from lazy_cache import LazyCache, CacheView
+from level import *
 
 
 class Game():
@@ -31,13 +38,8 @@ class Game():
             1: Monster("Sparchu", 6),
             2: Monster("Finsta", 7),
         }
-
-        # groups
-        self.all_sprites = AllSprites()
-        self.collision_sprites = pygame.sprite.Group()
-        self.character_sprites = pygame.sprite.Group()
-        self.transition_sprites = pygame.sprite.Group()
-        self.monster_patch_sprites = pygame.sprite.Group()
+        # the party above plus every monster caught past it
+        self.monster_store = MonsterStore(self.player_monsters)
 
         # transition / tint
         self.transition_target: tuple[str, str] | Battle | str |None = None
@@ -48,112 +50,171 @@ class Game():
         self.tint_speed = 600
 
         self.import_assets()
-        self.setup(self.tmx_maps['world'],'house')
+        self.levels = LazyCache({ name: name for name in self.tmx_maps.paths },self.build_level,lambda level: level.nbytes,budget=LEVEL_CACHE_BUDGET)
+        self.setup('world','house')
         self.audios['overworld'].play(-1)
+        self.prefetch_species([monster.name for monster in self.player_monsters.values()])
 
         # overlays
         self.dialog_tree: DialogTree | None = None
-        self.monster_index = MonsterIndex(self.player_monsters,self.fonts,self.monster_frames)
+        self.monster_index = MonsterIndex(self.monster_store,self.fonts,self.monster_frames)
         self.index_open = False
         self.battle: Battle | None = None
         self.evolution: Evolution | None = None
+        self.summary: BattleSummary | None = None
 
-    def import_assets(self):
-        self.tmx_maps = tmx_importer('data','maps')
-
-        self.overworld_frames = {
-            'water': import_folder('graphics','tilesets','water'),
-            'coast': coast_importer(24,12,'graphics','tilesets','coast'),
-            'characters': all_characters_import('graphics','characters'),
-        }
-
-        self.monster_frames = {
-            'icons': import_folder_dict('graphics','icons'),
-            'monsters': all_monsters_importer('graphics','monsters'),
-            'ui': import_folder_dict('graphics','ui'),
-            'attacks': attack_importer('graphics','attacks')
-        }
-
-        self.monster_frames['outlines'] = outline_creator(self.monster_frames['monsters'],4)
-
-        self.fonts = {
-            'dialog': pygame.font.Font(join(BASE_DIR,'graphics','fonts','PixeloidSans.ttf'),30),
-            'regular': pygame.font.Font(join(BASE_DIR,'graphics','fonts','PixeloidSans.ttf'),18),
-            'small': pygame.font.Font(join(BASE_DIR,'graphics','fonts','PixeloidSans.ttf'),14),
-            'bold': pygame.font.Font(join(BASE_DIR,'graphics','fonts','dogicapixelbold.otf'),20),
-        }
+        # wild battles settled in one frame, toggled with tab
+        self.auto_resolve = AUTO_RESOLVE_WILD
 
-        self.bg_frames = import_folder_dict('graphics','backgrounds')
-        self.star_animation_frames = import_folder('graphics','other','star animation')
-
-        self.audios = audio_importer('audio')
-
-    def setup(self, tmx_map: TiledMap, player_start_pos: str):
-        # clear the map
-        for group in [self.all_sprites,self.collision_sprites,self.transition_sprites,self.character_sprites]:
-            group.empty()
+    def import_assets(self):
+        self.import_timings: dict[str, float] = {}
+        prefetch('audio')
+
+        with timed(self.import_timings,'maps'):
+            self.tmx_maps = tmx_importer('data','maps')
+
+        self.asset_pack = AssetPack(join(CACHE_DIR,'assets.pack'))
+        self.asset_pack.register('water',source_files('graphics','tilesets','water'),lambda: import_folder('graphics','tilesets','water'))
+        self.asset_pack.register('coast',source_files('graphics','tilesets','coast.png'),lambda: coast_importer(24,12,'graphics','tilesets','coast'))
+        self.asset_pack.register('characters',source_files('graphics','characters'),lambda: all_characters_import('graphics','characters'))
+        self.asset_pack.register('icons',source_files('graphics','icons'),lambda: import_folder_dict('graphics','icons'))
+        self.asset_pack.register('ui',source_files('graphics','ui'),lambda: import_folder_dict('graphics','ui'))
+        self.asset_pack.register('attacks',source_files('graphics','attacks'),lambda: attack_importer('graphics','attacks'))
+        self.asset_pack.register('backgrounds',source_files('graphics','backgrounds'),lambda: import_folder_dict('graphics','backgrounds'))
+        self.asset_pack.register('star animation',source_files('graphics','other','star animation'),lambda: import_folder('graphics','other','star animation'))
+        with timed(self.import_timings,'images'):
+            self.asset_pack.load(prefetch_files)
+
+            self.overworld_frames = {
+                'water': self.asset_pack['water'],
+                'coast': self.asset_pack['coast'],
+                'characters': self.asset_pack['characters'],
+            }
+
+            self.species_frames = monster_cache(BATTLE_OUTLINE_WIDTH,'graphics','monsters')
+            self.monster_frames = {
+                'icons': self.asset_pack['icons'],
+                'monsters': CacheView(self.species_frames,'frames'),
+                'ui': self.asset_pack['ui'],
+                'attacks': self.asset_pack['attacks'],
+                'outlines': CacheView(self.species_frames,'outlines'),
+            }
+
+            self.bg_frames = self.asset_pack['backgrounds']
+            self.star_animation_frames = self.asset_pack['star animation']
+
+        with timed(self.import_timings,'fonts'):
+            self.fonts = {
+                'dialog': pygame.font.Font(join(BASE_DIR,'graphics','fonts','PixeloidSans.ttf'),30),
+                'regular': pygame.font.Font(join(BASE_DIR,'graphics','fonts','PixeloidSans.ttf'),18),
+                'small': pygame.font.Font(join(BASE_DIR,'graphics','fonts','PixeloidSans.ttf'),14),
+                'bold': pygame.font.Font(join(BASE_DIR,'graphics','fonts','dogicapixelbold.otf'),20),
+            }
+
+        with timed(self.import_timings,'audio'):
+            self.audios = audio_importer('audio')
+
+    def prefetch_species(self, names: list[str]):
+        # frames and outlines of monsters about to appear are prepared off the main thread
+        self.species_frames.prefetch(list(dict.fromkeys(names)))
+
+    def build_level(self, map_name: str) -> Level:
+        tmx_map = self.tmx_maps[map_name]
+        level = Level(map_name,tmx_map)
 
         # terrain and terrain top
-        for layer in ['Terrain', 'Terrain Top']:
-            for x, y, surf in tmx_map.get_layer_by_name(layer).tiles():
-                BaseSprite((x*TILE_SIZE,y*TILE_SIZE),surf,(self.all_sprites,),WORLD_LAYERS['bg'])
-
-        # water
-        for obj in tmx_map.get_layer_by_name('Water'):
-            for x in range(int(obj.x),int(obj.x + obj.width),TILE_SIZE):
-                for y in range(int(obj.y),int(obj.y + obj.height),TILE_SIZE):
-                    AnimatedSprite((x,y),self.overworld_frames['water'],(self.all_sprites,),WORLD_LAYERS['water'])
-
-        # coast
-        for obj in tmx_map.get_layer_by_name('Coast'):
-            frames = self.overworld_frames['coast'][obj.properties['terrain']][obj.properties['side']]
-            AnimatedSprite((obj.x,obj.y),frames,(self.all_sprites,),WORLD_LAYERS['bg'])
+        for pos, surf in tmx_map.chunks['bg']:
+            BaseSprite(pos,surf,(level.all_sprites,),WORLD_LAYERS['bg'])
+
+        # water and coast, drawn as pre-tiled regions animated by one clock
+        for obj in tmx_map.water:
+            columns = range(int(obj.x),int(obj.x + obj.width),TILE_SIZE)
+            rows = range(int(obj.y),int(obj.y + obj.height),TILE_SIZE)
+            for col in range(0,len(columns),WATER_REGION_SIZE):
+                for row in range(0,len(rows),WATER_REGION_SIZE):
+                    size = (len(columns[col:col + WATER_REGION_SIZE]) * TILE_SIZE,len(rows[row:row + WATER_REGION_SIZE]) * TILE_SIZE)
+                    frames = tiled_frames(self.overworld_frames['water'],size,level.tiled_frames)
+                    RegionSprite((columns[col],rows[row]),frames,level.all_sprites.animation_clock,(level.all_sprites,),WORLD_LAYERS['water'])
+
+        coast_regions: dict[tuple[int, int], list[tuple[tuple[float, float], list[pygame.Surface]]]] = {}
+        for obj in tmx_map.coast:
+            region = (int(obj.x // (COAST_REGION_SIZE * TILE_SIZE)),int(obj.y // (COAST_REGION_SIZE * TILE_SIZE)))
+            coast_regions.setdefault(region,[]).append(((obj.x,obj.y),self.overworld_frames['coast'][obj.terrain][obj.side]))
+        for tiles in coast_regions.values():
+            pos, frames = composite_frames(tiles)
+            RegionSprite(pos,frames,level.all_sprites.animation_clock,(level.all_sprites,),WORLD_LAYERS['bg'])
 
         # Objects
-        for obj in tmx_map.get_layer_by_name('Objects'):
-            if obj.name == 'top':
-                BaseSprite((obj.x,obj.y),obj.image,(self.all_sprites,),WORLD_LAYERS['top'])
-            else:
-                CollidableSprite((obj.x,obj.y),obj.image,(self.all_sprites,self.collision_sprites))
-
-        # transition objects
-        for obj in tmx_map.get_layer_by_name('Transition'):
-            TransitionSprite((obj.x,obj.y),(obj.width,obj.height),(obj.properties['target'],obj.properties['pos']),(self.transition_sprites,))
+        for pos, surf in tmx_map.chunks['top']:
+            BaseSprite(pos,surf,(level.all_sprites,),WORLD_LAYERS['top'])
+        for obj in tmx_map.objects:
+            if obj.name != 'top':
+                CollidableSprite((obj.x,obj.y),tmx_map.image(obj.gid),(level.all_sprites,level.collision_sprites,level.sight_blockers))
 
         # collision objects
-        for obj in tmx_map.get_layer_by_name('Collisions'):
-            BorderSprite((obj.x,obj.y),Surface((obj.width,obj.height)),(self.collision_sprites,))
+        for obj in tmx_map.collisions:
+            BorderSprite((obj.x,obj.y),Surface((obj.width,obj.height)),(level.collision_sprites,level.sight_blockers))
 
         # monster patch
-        for obj in tmx_map.get_layer_by_name('Monsters'):
-            MonsterPatchSprite((obj.x,obj.y),obj.image,(self.all_sprites,self.monster_patch_sprites),obj.properties['biome'],obj.properties['level'],obj.properties['monsters'])
+        for obj in tmx_map.monsters:
+            MonsterPatchSprite((obj.x,obj.y),tmx_map.image(obj.gid),(level.all_sprites,),obj.biome,obj.level,obj.monsters)
 
         # Entities
-        for obj in tmx_map.get_layer_by_name('Entities'):
-            if obj.name == 'Player' and obj.properties['pos'] == player_start_pos:
-                self.player = Player(
+        for obj in tmx_map.entities:
+            if obj.name == 'Player' and not level.player:
+                level.player = Player(
                     (obj.x,obj.y),
-                    obj.properties['direction'],
+                    obj.direction,
                     self.overworld_frames['characters']['player'],
-                    (self.all_sprites,),
-                    self.collision_sprites)
+                    (level.all_sprites,),
+                    level.collision_sprites)
             if obj.name == 'Character':
                 Character(
                     (obj.x,obj.y),
-                    obj.properties['direction'],
-                    self.overworld_frames['characters'][obj.properties['graphic']],
-                    (self.all_sprites,self.collision_sprites,self.character_sprites),
-                    TRAINER_DATA[obj.properties['character_id']],
-                    self.player,
+                    obj.direction,
+                    self.overworld_frames['characters'][obj.graphic],
+                    (level.all_sprites,level.collision_sprites,level.character_sprites,level.sight_blockers),
+                    TRAINER_DATA[obj.character_id],
+                    level.player,
                     self.create_dialog,
-                    self.collision_sprites,
-                    float(obj.properties['radius']),
-                    obj.properties['character_id']=='Nurse',
+                    level.collision_sprites,
+                    level.sight_blockers,
+                    obj.radius,
+                    obj.character_id=='Nurse',
                     self.audios['notice'])
 
+        level.collision_sprites.build()
+        level.sight_blockers.build()
+        return level
+
+    def setup(self, map_name: str, player_start_pos: str):
+        # levels borrow their map's chunks, so a level goes once the map cache has let its map go
+        for name in list(self.levels.entries):
+            if name not in self.tmx_maps.entries:
+                self.levels.discard(name)
+        level = self.levels[map_name]
+        # transitions and monster patches are looked up in the map's trigger grids
+        self.tmx_map = self.tmx_maps[map_name]
+        self.all_sprites = level.all_sprites
+        self.collision_sprites = level.collision_sprites
+        self.sight_blockers = level.sight_blockers
+        self.character_sprites = level.character_sprites
+        self.player = level.player
+
+        # a cached level is put back the way a fresh build would start
+        for obj in self.tmx_map.entities:
+            if obj.name == 'Player' and obj.pos == player_start_pos:
+                self.player.respawn((obj.x,obj.y),obj.direction)
+        for character in self.character_sprites:
+            character.reset()
+        self.all_sprites.animation_clock.reset()
+
+        # neighbouring maps
+        self.tmx_maps.prefetch(self.tmx_maps.neighbours(map_name))
+
     # dialog system
     def input(self):
-        if not self.dialog_tree and not self.player.character_approaching and not self.battle and not self.evolution:
+        if not self.dialog_tree and not self.player.character_approaching and not self.battle and not self.evolution and not self.summary:
             keys = pygame.key.get_just_pressed()
             character_list: list[Character] = self.character_sprites.sprites()
             if keys[pygame.K_SPACE] and not self.index_open:
@@ -168,11 +229,16 @@ class Game():
                     self.index_open = not self.index_open
                     self.player.block() if self.index_open else self.player.unblock()
 
+            if keys[pygame.K_TAB]:
+                self.auto_resolve = not self.auto_resolve
+
     def create_dialog(self, character: Character, battle_happend: bool = False):
         if not self.dialog_tree:
             healty_player_monsters = [ monster for monster in self.player_monsters.values() if monster.health > 10 ]
             is_healing_required = True if not healty_player_monsters and not character.nurse else False
             self.dialog_tree = DialogTree(character,self.player,(self.all_sprites,),self.fonts['dialog'],is_healing_required,battle_happend,self.end_dialog)
+            if character.monsters and not character.character_data['defeated']:
+                self.prefetch_species([monster.name for monster in character.monsters.values()])
 
     def end_dialog(self, character: Character, is_healing_reqired: bool, battle_happend: bool):
         self.dialog_tree = None
@@ -180,6 +246,7 @@ class Game():
             for monster in self.player_monsters.values():
                 monster.health = monster.get_stat('max_health')
                 monster.health = monster.get_stat('max_energy')
+            self.monster_store.heal_box()
             self.player.unblock()
         elif not is_healing_reqired and not character.character_data['defeated']:
             self.audios['overworld'].stop()
@@ -192,7 +259,8 @@ class Game():
                 self.fonts,
                 self.end_battle,
                 character,
-                self.audios)
+                self.audios,
+                self.monster_store.add)
             self.tint_mode = 'tint'
         elif is_healing_reqired:
             self.player.unblock()
@@ -202,10 +270,10 @@ class Game():
 
     # transition system
     def transition_check(self):
-        sprites: list[TransitionSprite] = [sprite for sprite in self.transition_sprites if sprite.rect.colliderect(self.player.hitbox)]
-        if sprites:
+        transitions: list[TransitionRecord] = self.tmx_map.transition_grid.query(self.player.hitbox)
+        if transitions:
             self.player.block()
-            self.transition_target = sprites[0].target
+            self.transition_target = (transitions[0].target,transitions[0].pos)
             self.tint_mode = 'tint'
 
     def tint_screen(self, dt: float):
@@ -220,7 +288,7 @@ class Game():
                 elif type(self.transition_target) == str and self.transition_target == 'level':
                     self.battle = None
                 else:
-                    self.setup(self.tmx_maps[self.transition_target[0]],self.transition_target[1])
+                    self.setup(*self.transition_target)
                 self.tint_mode = 'untint'
                 self.transition_target = None
 
@@ -239,21 +307,27 @@ class Game():
             self.player.unblock()
             self.check_evolution()
 
-    def check_evolution(self):
+    def apply_evolutions(self) -> dict[int, tuple[str, str]]:
+        # replace every monster that reached its evolution level, returns the names before and after
+        evolved = {}
         for index, monster in self.player_monsters.items():
             if monster.evolution:
                 if monster.level == monster.evolution[1]:
-                    self.audios['evolution'].play()
-                    self.player.block()
-                    self.evolution = Evolution(
-                        self.monster_frames['monsters'],
-                        monster.name,
-                        monster.evolution[0],
-                        self.fonts['bold'],
-                        self.end_evolution,
-                        self.star_animation_frames
-                    )
                     self.player_monsters[index] = Monster(monster.evolution[0],monster.evolution[1])
+                    evolved[index] = (monster.name,monster.evolution[0])
+        return evolved
+
+    def check_evolution(self):
+        for start_monster, _ in self.apply_evolutions().values():
+            self.audios['evolution'].play()
+            self.player.block()
+            self.evolution = Evolution(
+                self.monster_frames['monsters'],
+                start_monster,
+                self.fonts['bold'],
+                self.end_evolution,
+                self.star_animation_frames
+            )
         if not self.evolution:
             self.audios['overworld'].play(-1)
 
@@ -266,31 +340,57 @@ class Game():
     # monster encounters
     def check_monster(self):
         healthy_player_monster: list[Monster] = [ monster for monster in self.player_monsters.values() if monster.health > 10 ]
-        monster_patches: list[MonsterPatchSprite] = self.monster_patch_sprites.sprites()
-        if [patch for patch in monster_patches if patch.rect.colliderect(self.player.hitbox)] and not self.battle and self.player.direction and healthy_player_monster:
+        monster_patches: list[MonsterRecord] = self.tmx_map.patch_grid.query(self.player.hitbox)
+        if monster_patches and not self.battle and self.player.direction and healthy_player_monster:
             if not self.encounter_timer.active:
                 self.encounter_timer.activate()
+                self.prefetch_species(monster_patches[0].monsters)
 
     def monster_encounter(self):
         self.reorder_player_monster()
-        monster_patches: list[MonsterPatchSprite] = [ patch for patch in self.monster_patch_sprites.sprites() if patch.rect.colliderect(self.player.hitbox)]
+        monster_patches: list[MonsterRecord] = self.tmx_map.patch_grid.query(self.player.hitbox)
         if monster_patches and self.player.direction:
             self.encounter_timer.duration = randint(800, 2500)
             self.player.block()
-            self.audios['overworld'].stop()
-            self.audios['battle'].play(-1)
-            self.transition_target = Battle(
-                self.player_monsters,
-                { index: Monster(name,monster_patches[0].level) for index, name in enumerate(monster_patches[0].monsters) },
-                self.monster_frames,
-                self.bg_frames[monster_patches[0].biome],
-                self.fonts,
-                self.end_battle,
-                None,
-                self.audios)
-            self.tint_mode = 'tint'
+            if self.auto_resolve:
+                self.auto_encounter(monster_patches[0])
+            else:
+                self.audios['overworld'].stop()
+                self.audios['battle'].play(-1)
+                self.transition_target = Battle(
+                    self.player_monsters,
+                    { index: Monster(name,monster_patches[0].level) for index, name in enumerate(monster_patches[0].monsters) },
+                    self.monster_frames,
+                    self.bg_frames[monster_patches[0].biome],
+                    self.fonts,
+                    self.end_battle,
+                    None,
+                    self.audios,
+                    self.monster_store.add)
+                self.tint_mode = 'tint'
         self.encounter_timer.deactivate()
 
+    def auto_encounter(self, patch: MonsterRecord):
+        # the battle is played out headless on the party itself, so health, energy and xp end up as in a shown battle
+        opponents = { index: Monster(name,patch.level) for index, name in enumerate(patch.monsters) }
+        start = { index: (monster,monster.level,monster.xp) for index, monster in self.player_monsters.items() }
+        state = BattleState(self.player_monsters,opponents)
+        winner = state.resolve(player_policy=strongest_action)
+
+        # what end_battle would do next, with the evolutions applied without their animation
+        evolved = self.apply_evolutions()
+        members = []
+        for index, (fighter, start_level, start_xp) in start.items():
+            monster = self.player_monsters[index]
+            evolution = evolved[index][1] if index in evolved else None
+            xp = gained_xp(start_level,start_xp,fighter.level,fighter.xp)
+            members.append(MemberReport(fighter.name,evolution,start_level,fighter.level,xp,monster.health,monster.get_stat('max_health')))
+        self.summary = BattleSummary(winner,list(patch.monsters),state.time / 1000,members,self.fonts,self.monster_frames['icons'],self.end_summary)
+
+    def end_summary(self):
+        self.summary = None
+        self.player.unblock()
+
     def reorder_player_monster(self):
         index_monster_list = [ (index,monster) for index, monster in self.player_monsters.items()]
         is_reorder_required = False
@@ -333,6 +433,7 @@ class Game():
             if self.index_open: self.monster_index.update(dt)
             if self.battle: self.battle.update(dt)
             if self.evolution: self.evolution.update(dt)
+            if self.summary: self.summary.update()
 
             self.tint_screen(dt)
             pygame.display.update()
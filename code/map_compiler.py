@@ -0,0 +1,365 @@
+import struct
+import xml.etree.ElementTree as ElementTree
+from array import array
+from os import makedirs, replace, stat, walk
+from os.path import basename, dirname, exists, join, normpath, relpath
+from typing import Iterator, NamedTuple
+
+from settings import *
+from spatial import TriggerGrid
+
+MAGIC = b'TMLMAP01'
+FLIP_MASK = 0x1FFFFFFF
+NO_STRING = 0xFFFFFFFF
+COMPILED_MAP_DIR = join(CACHE_DIR, 'maps')
+
+HEADER = struct.Struct('<8sHHHH')
+COUNT = struct.Struct('<I')
+TILE_ENTRY = struct.Struct('<HIHHHH')
+AREA = struct.Struct('<dddd')
+COAST = struct.Struct('<ddII')
+OBJECT = struct.Struct('<ddddHI')
+TRANSITION = struct.Struct('<ddddII')
+MONSTER = struct.Struct('<ddddHIHH')
+ENTITY = struct.Struct('<ddIIIIId')
+
+
+class AreaRecord(NamedTuple):
+    x: float
+    y: float
+    width: float
+    height: float
+
+class CoastRecord(NamedTuple):
+    x: float
+    y: float
+    terrain: str
+    side: str
+
+class ObjectRecord(NamedTuple):
+    x: float
+    y: float
+    width: float
+    height: float
+    gid: int
+    name: str | None
+
+class TransitionRecord(NamedTuple):
+    x: float
+    y: float
+    width: float
+    height: float
+    target: str
+    pos: str
+
+class MonsterRecord(NamedTuple):
+    x: float
+    y: float
+    width: float
+    height: float
+    gid: int
+    biome: str
+    level: int
+    monsters: tuple[str, ...]
+
+class EntityRecord(NamedTuple):
+    x: float
+    y: float
+    name: str | None
+    direction: str | None
+    pos: str | None
+    graphic: str | None
+    character_id: str | None
+    radius: float
+
+
+# tile images, loaded and converted on the main thread before any map; the map loader thread only reads them
+tileset_images: dict[str, pygame.Surface] = {}
+
+def load_tilesets():
+    tileset_folder = join(BASE_DIR,'data','tilesets')
+    for file_name in next(walk(tileset_folder))[2]:
+        for image_path, _ in parse_tileset(join(tileset_folder,file_name),1).values():
+            if image_path not in tileset_images:
+                tileset_images[image_path] = pygame.image.load(join(BASE_DIR,image_path)).convert_alpha()
+
+def tileset_image(image_path: str) -> pygame.Surface:
+    return tileset_images[image_path]
+
+
+class CompiledMap():
+
+    def __init__(
+            self,
+            name: str,
+            size: tuple[int, int],
+            tile_layers: dict[str, array],
+            tile_table: dict[int, tuple[str, pygame.Rect]],
+            nbytes: int
+        ):
+        self.name = name
+        self.width, self.height = size
+        self.tile_layers = tile_layers
+        self.tile_table = tile_table
+        self.nbytes = nbytes
+        self.images: dict[int, pygame.Surface] = {}
+        self.chunks: dict[str, list[tuple[tuple[int, int], pygame.Surface]]] = {'bg': [], 'top': []}
+
+        self.water: list[AreaRecord] = []
+        self.coast: list[CoastRecord] = []
+        self.objects: list[ObjectRecord] = []
+        self.transitions: list[TransitionRecord] = []
+        self.collisions: list[AreaRecord] = []
+        self.monsters: list[MonsterRecord] = []
+        self.entities: list[EntityRecord] = []
+        self.transition_grid = TriggerGrid()
+        self.patch_grid = TriggerGrid()
+
+    def image(self, gid: int) -> pygame.Surface:
+        if gid not in self.images:
+            image_path, rect = self.tile_table[gid]
+            self.images[gid] = tileset_image(image_path).subsurface(rect)
+        return self.images[gid]
+
+    def tiles(self, layer: str) -> Iterator[tuple[int, int, pygame.Surface]]:
+        if layer in self.tile_layers:
+            for index, gid in enumerate(self.tile_layers[layer]):
+                if gid:
+                    yield index % self.width, index // self.width, self.image(gid)
+
+    def index_triggers(self):
+        for obj in self.transitions:
+            self.transition_grid.add(pygame.FRect(obj.x,obj.y,obj.width,obj.height),obj)
+        for obj in self.monsters:
+            self.patch_grid.add(pygame.FRect(obj.x,obj.y,obj.width,obj.height),obj)
+
+    def bake(self, chunk_tiles: int = TERRAIN_CHUNK_SIZE):
+        chunk_size = chunk_tiles * TILE_SIZE
+        bg_chunks: dict[tuple[int, int], pygame.Surface] = {}
+        for layer in ('Terrain', 'Terrain Top'):
+            for x, y, surf in self.tiles(layer):
+                chunk = (x // chunk_tiles, y // chunk_tiles)
+                if chunk not in bg_chunks:
+                    width = min(chunk_size,self.width * TILE_SIZE - chunk[0] * chunk_size)
+                    height = min(chunk_size,self.height * TILE_SIZE - chunk[1] * chunk_size)
+                    bg_chunks[chunk] = pygame.Surface((width,height),pygame.SRCALPHA)
+                bg_chunks[chunk].blit(surf,((x % chunk_tiles) * TILE_SIZE,(y % chunk_tiles) * TILE_SIZE))
+        for chunk, surf in bg_chunks.items():
+            # chunks the terrain covers completely blit without per-pixel alpha
+            if pygame.mask.from_surface(surf,254).count() == surf.width * surf.height:
+                bg_chunks[chunk] = pygame.Surface(surf.size)
+                bg_chunks[chunk].blit(surf,(0,0))
+        self.chunks['bg'] = [((x * chunk_size, y * chunk_size), surf) for (x, y), surf in sorted(bg_chunks.items(),key=lambda item: item[0][::-1])]
+
+        top_rects: dict[tuple[int, int], list[tuple[pygame.Surface, pygame.FRect]]] = {}
+        for obj in self.objects:
+            if obj.name == 'top':
+                image = self.image(obj.gid)
+                rect = image.get_frect(topleft = (obj.x,obj.y))
+                for chunk_x in range(int(rect.left // chunk_size),int(rect.right // chunk_size) + 1):
+                    for chunk_y in range(int(rect.top // chunk_size),int(rect.bottom // chunk_size) + 1):
+                        top_rects.setdefault((chunk_x,chunk_y),[]).append((image,rect))
+        self.chunks['top'] = []
+        for (chunk_x, chunk_y), images in top_rects.items():
+            chunk_rect = pygame.Rect(chunk_x * chunk_size,chunk_y * chunk_size,chunk_size,chunk_size)
+            area = chunk_rect.clip(images[0][1].unionall([rect for _, rect in images]))
+            surf = pygame.Surface(area.size,pygame.SRCALPHA)
+            for image, rect in images:
+                surf.blit(image,(rect.left - area.left,rect.top - area.top))
+            self.chunks['top'].append((area.topleft,surf))
+
+        self.nbytes += sum(surf.width * surf.height * surf.get_bytesize() for chunks in self.chunks.values() for _, surf in chunks)
+
+
+# compiling
+def parse_tileset(tsx_path: str, firstgid: int) -> dict[int, tuple[str, tuple[int, int, int, int]]]:
+    root = ElementTree.parse(tsx_path).getroot()
+    tile_width, tile_height = int(root.get('tilewidth')), int(root.get('tileheight'))
+    tiles: dict[int, tuple[str, tuple[int, int, int, int]]] = {}
+
+    image = root.find('image')
+    if image is not None:
+        image_path = relpath(normpath(join(dirname(tsx_path),image.get('source'))),BASE_DIR)
+        columns = int(root.get('columns'))
+        margin, spacing = int(root.get('margin',0)), int(root.get('spacing',0))
+        for local_id in range(int(root.get('tilecount'))):
+            x = margin + (local_id % columns) * (tile_width + spacing)
+            y = margin + (local_id // columns) * (tile_height + spacing)
+            tiles[firstgid + local_id] = (image_path, (x, y, tile_width, tile_height))
+
+    for tile in root.findall('tile'):
+        tile_image = tile.find('image')
+        if tile_image is not None:
+            image_path = relpath(normpath(join(dirname(tsx_path),tile_image.get('source'))),BASE_DIR)
+            tiles[firstgid + int(tile.get('id'))] = (image_path, (0, 0, int(tile_image.get('width')), int(tile_image.get('height'))))
+    return tiles
+
+def map_sources(tmx_path: str) -> list[str]:
+    tileset_folder = join(BASE_DIR,'data','tilesets')
+    return [tmx_path] + [join(tileset_folder,file_name) for file_name in next(walk(tileset_folder))[2]]
+
+def compile_map(tmx_path: str) -> bytes:
+    root = ElementTree.parse(tmx_path).getroot()
+    width, height = int(root.get('width')), int(root.get('height'))
+
+    tileset_tiles: dict[int, tuple[str, tuple[int, int, int, int]]] = {}
+    for tileset in root.findall('tileset'):
+        tileset_tiles.update(parse_tileset(normpath(join(dirname(tmx_path),tileset.get('source'))),int(tileset.get('firstgid'))))
+
+    strings: dict[str, int] = {}
+    def string(value: str | None) -> int:
+        if value is None:
+            return NO_STRING
+        return strings.setdefault(value,len(strings))
+
+    used_gids: set[int] = set()
+    tile_layers: list[bytes] = []
+    for layer in root.findall('layer'):
+        gids = array('H',(int(value) & FLIP_MASK for value in layer.find('data').text.replace('\n','').split(',') if value))
+        used_gids.update(gids)
+        tile_layers.append(COUNT.pack(string(layer.get('name'))) + gids.tobytes())
+
+    object_layers: dict[str, list[bytes]] = {}
+    for group in root.findall('objectgroup'):
+        string(group.get('name'))
+        records = object_layers.setdefault(group.get('name'),[])
+        for obj in group.findall('object'):
+            properties = { prop.get('name'): prop.get('value') for prop in obj.iter('property') }
+            x, y = float(obj.get('x')), float(obj.get('y'))
+            obj_width, obj_height = float(obj.get('width',0)), float(obj.get('height',0))
+            gid = int(obj.get('gid',0)) & FLIP_MASK
+            if gid:
+                # tiled anchors tile objects at their bottom left corner
+                y -= obj_height
+                used_gids.add(gid)
+
+            match group.get('name'):
+                case 'Water' | 'Collisions':
+                    records.append(AREA.pack(x,y,obj_width,obj_height))
+                case 'Coast':
+                    records.append(COAST.pack(x,y,string(properties['terrain']),string(properties['side'])))
+                case 'Objects':
+                    records.append(OBJECT.pack(x,y,obj_width,obj_height,gid,string(obj.get('name'))))
+                case 'Transition':
+                    records.append(TRANSITION.pack(x,y,obj_width,obj_height,string(properties['target']),string(properties['pos'])))
+                case 'Monsters':
+                    monsters = properties['monsters'].split(',')
+                    records.append(MONSTER.pack(x,y,obj_width,obj_height,gid,string(properties['biome']),int(properties['level']),len(monsters)) +
+                                   b''.join(COUNT.pack(string(monster)) for monster in monsters))
+                case 'Entities':
+                    records.append(ENTITY.pack(
+                        x,y,
+                        string(obj.get('name')),
+                        string(properties.get('direction')),
+                        string(properties.get('pos')),
+                        string(properties.get('graphic')),
+                        string(properties.get('character_id')),
+                        float(properties.get('radius','nan'))))
+
+    used_gids.discard(0)
+    tile_table = [TILE_ENTRY.pack(gid,string(tileset_tiles[gid][0]),*tileset_tiles[gid][1]) for gid in sorted(used_gids)]
+
+    string_data = [value.encode() for value in strings]
+    data = [HEADER.pack(MAGIC,width,height,len(tile_layers),len(object_layers)), COUNT.pack(len(string_data))]
+    data += [COUNT.pack(len(value)) + value for value in string_data]
+    data += [COUNT.pack(len(tile_table)), *tile_table]
+    data += tile_layers
+    for name, records in object_layers.items():
+        data += [COUNT.pack(strings[name]), COUNT.pack(len(records)), *records]
+    return b''.join(data)
+
+def compiled_path(tmx_path: str) -> str:
+    return join(COMPILED_MAP_DIR,basename(tmx_path).split('.')[0] + '.tmlmap')
+
+def write_compiled_map(tmx_path: str) -> str:
+    path = compiled_path(tmx_path)
+    makedirs(COMPILED_MAP_DIR,exist_ok=True)
+    with open(path + '.tmp','wb') as file:
+        file.write(compile_map(tmx_path))
+    replace(path + '.tmp',path)
+    return path
+
+
+# loading
+def read_compiled_map(path: str) -> CompiledMap:
+    with open(path,'rb') as file:
+        data = file.read()
+    magic, width, height, tile_layer_count, object_layer_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a compiled map')
+    offset = HEADER.size
+
+    strings: list[str] = []
+    string_count, = COUNT.unpack_from(data,offset)
+    offset += COUNT.size
+    for _ in range(string_count):
+        length, = COUNT.unpack_from(data,offset)
+        offset += COUNT.size
+        strings.append(data[offset:offset + length].decode())
+        offset += length
+    string = lambda index: None if index == NO_STRING else strings[index]
+
+    tile_table: dict[int, tuple[str, pygame.Rect]] = {}
+    tile_count, = COUNT.unpack_from(data,offset)
+    offset += COUNT.size
+    for gid, image_index, x, y, tile_width, tile_height in TILE_ENTRY.iter_unpack(data[offset:offset + tile_count * TILE_ENTRY.size]):
+        tile_table[gid] = (strings[image_index], pygame.Rect(x,y,tile_width,tile_height))
+    offset += tile_count * TILE_ENTRY.size
+
+    tile_layers: dict[str, array] = {}
+    for _ in range(tile_layer_count):
+        name_index, = COUNT.unpack_from(data,offset)
+        offset += COUNT.size
+        gids = array('H')
+        gids.frombytes(data[offset:offset + width * height * gids.itemsize])
+        tile_layers[strings[name_index]] = gids
+        offset += width * height * gids.itemsize
+
+    tmx_map = CompiledMap(basename(path).split('.')[0],(width,height),tile_layers,tile_table,len(data))
+    for _ in range(object_layer_count):
+        name_index, record_count = struct.unpack_from('<II',data,offset)
+        offset += 2 * COUNT.size
+        match string(name_index):
+            case 'Water' | 'Collisions' as name:
+                records = [AreaRecord(*values) for values in AREA.iter_unpack(data[offset:offset + record_count * AREA.size])]
+                offset += record_count * AREA.size
+                (tmx_map.water if name == 'Water' else tmx_map.collisions).extend(records)
+            case 'Coast':
+                for x, y, terrain, side in COAST.iter_unpack(data[offset:offset + record_count * COAST.size]):
+                    tmx_map.coast.append(CoastRecord(x,y,strings[terrain],strings[side]))
+                offset += record_count * COAST.size
+            case 'Objects':
+                for x, y, obj_width, obj_height, gid, name in OBJECT.iter_unpack(data[offset:offset + record_count * OBJECT.size]):
+                    tmx_map.objects.append(ObjectRecord(x,y,obj_width,obj_height,gid,string(name)))
+                offset += record_count * OBJECT.size
+            case 'Transition':
+                for x, y, obj_width, obj_height, target, pos in TRANSITION.iter_unpack(data[offset:offset + record_count * TRANSITION.size]):
+                    tmx_map.transitions.append(TransitionRecord(x,y,obj_width,obj_height,strings[target],strings[pos]))
+                offset += record_count * TRANSITION.size
+            case 'Monsters':
+                for _ in range(record_count):
+                    x, y, obj_width, obj_height, gid, biome, level, monster_count = MONSTER.unpack_from(data,offset)
+                    offset += MONSTER.size
+                    monsters = tuple(strings[index] for index in struct.unpack_from(f'<{monster_count}I',data,offset))
+                    offset += monster_count * COUNT.size
+                    tmx_map.monsters.append(MonsterRecord(x,y,obj_width,obj_height,gid,strings[biome],level,monsters))
+            case 'Entities':
+                for x, y, name, direction, pos, graphic, character_id, radius in ENTITY.iter_unpack(data[offset:offset + record_count * ENTITY.size]):
+                    tmx_map.entities.append(EntityRecord(x,y,string(name),string(direction),string(pos),string(graphic),string(character_id),radius))
+                offset += record_count * ENTITY.size
+    return tmx_map
+
+def load_compiled_map(tmx_path: str) -> CompiledMap:
+    path = compiled_path(tmx_path)
+    if not exists(path) or any(stat(source).st_mtime_ns > stat(path).st_mtime_ns for source in map_sources(tmx_path)):
+        write_compiled_map(tmx_path)
+    tmx_map = read_compiled_map(path)
+    tmx_map.bake()
+    tmx_map.index_triggers()
+    return tmx_map
+
+
+if __name__ == '__main__':
+    for folder_path, _, file_names in walk(join(BASE_DIR,'data','maps')):
+        for file_name in file_names:
+            print(f'{file_name} -> {relpath(write_compiled_map(join(folder_path,file_name)),BASE_DIR)}')
@@ -3,61 +3,101 @@ from typing import Literal
 
 from settings import *
 from game_data import *
+from game_tables import *
+
+
+class VersionedStat():
+    """Monster attribute that bumps the monster's `version` whenever its value changes."""
+
+    def __set_name__(self, owner: type, name: str):
+        self.attribute = f'_{name}'
+
+    def __get__(self, monster: 'Monster', owner: type | None = None):
+        if monster is None:
+            return self
+        try:
+            return monster.__dict__[self.attribute]
+        except KeyError:
+            raise AttributeError(f'{type(monster).__name__!r} object has no attribute {self.attribute[1:]!r}') from None
+
+    def __set__(self, monster: 'Monster', value: float):
+        if monster.__dict__.get(self.attribute) != value:
+            monster.__dict__[self.attribute] = value
+            monster.version += 1
+
+
+class LevelStat(VersionedStat):
+    """The level, which also picks the monster's rows of STAT_CURVES and ABILITY_TABLE."""
+
+    def __set__(self, monster: 'Monster', value: int):
+        super().__set__(monster,value)
+        monster.stats = stats_at(monster.species,value)
+        monster.unlocked = abilities_at(monster.species,value)
 
 
 class Monster():
 
+    # stats shown by the battle HUD, which only redraws when `version` moves
+    health = VersionedStat()
+    energy = VersionedStat()
+    level = LevelStat()
+    xp = VersionedStat()
+    level_up = VersionedStat()
+
     def __init__(self, name: str, level: int):
+        self.version = 0
+        self.species = SPECIES_IDS[name]
+        self.stats: tuple[float, ...] = ()
+        self.unlocked: tuple[tuple[str, float], ...] = ()
         self.name, self.level = name, level
-        self.paused = False
 
         # stats
-        self.element: str = MONSTER_DATA[name]['stats']['element']
-        self.base_stats: dict[str, str | float] = MONSTER_DATA[name]['stats']
-        self.health = self.base_stats['max_health'] * self.level
-        self.energy = self.base_stats['max_energy'] * self.level
+        self.element: str = ELEMENTS[SPECIES_ELEMENTS[self.species]]
+        self.health = self.stats[MAX_HEALTH]
+        self.energy = self.stats[MAX_ENERGY]
         self.initiative = 0
-        self.abilities: dict[int, str] = MONSTER_DATA[name]['abilities']
         self.defending = False
 
         # experience
         self.xp = 0
         self.level_up = self.level * 150
-        self.evolution: tuple[str, int] | None = MONSTER_DATA[self.name]['evolve']
+        self.evolution: tuple[str, int] | None = SPECIES_EVOLUTIONS[self.species]
 
     def __repr__(self):
         return f"Monster: {self.name}, Lvl: {self.level}"
 
     def get_stat(self, stat: str):
-        return self.base_stats[stat] * self.level
+        return self.stats[STAT_IDS[stat]]
 
     def get_stats(self):
+        max_health, max_energy, attack, defense, recovery, speed = self.stats
         return {
-            'health': self.get_stat('max_health'),
-            'energy': self.get_stat('max_energy'),
-            'attack': self.get_stat('attack'),
-            'defense': self.get_stat('defense'),
-            'speed': self.get_stat('speed'),
-            'recovery': self.get_stat('recovery')
+            'health': max_health,
+            'energy': max_energy,
+            'attack': attack,
+            'defense': defense,
+            'speed': speed,
+            'recovery': recovery
         }
 
     def get_abilities(self, all: bool = True):
         if all:
-            return [ ability for level, ability in self.abilities.items() if self.level >= level]
-        return [ ability for level, ability in self.abilities.items() if self.level >= level and ATTACK_DATA[ability]['cost'] < self.energy]
+            return [ ability for ability, cost in self.unlocked]
+        energy = self.energy
+        return [ ability for ability, cost in self.unlocked if cost < energy]
 
     def get_info(self):
         return (
-            (self.health,self.get_stat('max_health')),
-            (self.energy,self.get_stat('max_energy')),
+            (self.health,self.stats[MAX_HEALTH]),
+            (self.energy,self.stats[MAX_ENERGY]),
             (self.initiative,100)
         )
 
     def reduce_energy(self, attack: Literal['burn','heal','battlecry','spark','scratch','splash','fire','explosion','annihilate','ice']):
-        self.energy -= ATTACK_DATA[attack]['cost']
+        self.energy -= ATTACK_COSTS[ATTACK_IDS[attack]]
 
     def get_base_damage(self, attack: Literal['burn','heal','battlecry','spark','scratch','splash','fire','explosion','annihilate','ice']):
-        return self.get_stat('attack') * ATTACK_DATA[attack]['amount']
+        return self.stats[ATTACK] * ATTACK_AMOUNTS[ATTACK_IDS[attack]]
 
     def update_xp(self, amount: float):
         if self.level_up - self.xp > amount:
@@ -68,12 +108,8 @@ class Monster():
             self.level_up = self.level * 150
 
     def stat_limiter(self):
-        self.health = max(0, min(self.health, self.get_stat('max_health')))
-        self.energy = max(0, min(self.energy, self.get_stat('max_energy')))
-
-    def update(self, dt: float):
-        self.stat_limiter()
-        if not self.paused:
-            self.initiative += self.get_stat('speed') * dt
-            self.energy += self.get_stat('recovery') * 0.009 * dt
-            self.stat_limiter()
\ No newline at end of file
+        max_health, max_energy = self.stats[MAX_HEALTH], self.stats[MAX_ENERGY]
+        if not 0 <= self.health <= max_health:
+            self.health = max(0, min(self.health, max_health))
+        if not 0 <= self.energy <= max_energy:
+            self.energy = max(0, min(self.energy, max_energy))
\ No newline at end of file
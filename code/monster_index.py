@@ -2,14 +2,15 @@ import pygame.freetype
 from settings import *
 from monster  import *
 from support import *
+from monster_store import MonsterStore
 
 
 class MonsterIndex():
 
-    def __init__(self, monsters: dict[str, Monster], fonts: dict[str, pygame.Font], monster_frames):
+    def __init__(self, store: MonsterStore, fonts: dict[str, pygame.Font], monster_frames):
         self.display_surface = pygame.display.get_surface()
         self.fonts = fonts
-        self.monsters = monsters
+        self.store = store
         self.frame_index = 0
 
         # frames
@@ -31,17 +32,29 @@ class MonsterIndex():
         self.index = 0
         self.selected_index: int | None = None
 
-        # max values
+        # order and filter, cycled with s and f; the rows are store positions
+        self.sort_keys = (None, 'level', 'health', 'name', 'element')
+        self.filters = (None, *ELEMENTS)
+        self.sort_key, self.element_filter = None, None
+
+        # virtual list: rows drawn from `scroll` on, a few past the window, their surfaces cached by store position
+        self.scroll = 0.0
+        self.scroll_speed = 12
+        self.overscan = 2
+        self.row_surfs: dict[int, tuple[str, bool, pygame.Surface]] = {}
+        self.rows_version = 0
+
+        self.shadow_surf = pygame.Surface((4,self.main_rect.height))
+        self.shadow_surf.set_alpha(100)
+
+        # max values, the largest base stat of any species
         self.max_stats = {}
-        for data in MONSTER_DATA.values():
-            for stat, value in data['stats'].items():
-                if stat != 'element':
-                    if stat not in self.max_stats:
-                        self.max_stats[stat] = value
-                    else:
-                        self.max_stats[stat] = max(self.max_stats[stat],value)
-        self.max_stats['health'] = self.max_stats.pop('max_health')
-        self.max_stats['energy'] = self.max_stats.pop('max_energy')
+        for stat, index in STAT_IDS.items():
+            self.max_stats[stat.removeprefix('max_')] = max(STAT_CURVES[species][1][index] for species in range(len(SPECIES)))
+
+    @property
+    def rows(self) -> list[int]:
+        return self.store.view(self.sort_key,self.element_filter,reverse=self.sort_key in ('level','health'))
 
     def input(self):
         keys = pygame.key.get_just_pressed()
@@ -49,67 +62,90 @@ class MonsterIndex():
             self.index -= 1
         if keys[pygame.K_DOWN]:
             self.index += 1
-
-        self.index = self.index % len(self.monsters)
+        if keys[pygame.K_s]:
+            self.sort_key = self.sort_keys[(self.sort_keys.index(self.sort_key) + 1) % len(self.sort_keys)]
+            self.index = 0
+        if keys[pygame.K_f]:
+            self.element_filter = self.filters[(self.filters.index(self.element_filter) + 1) % len(self.filters)]
+            self.index = 0
+
+        rows = self.rows
+        if not rows:
+            return
+        self.index = self.index % len(rows)
 
         if keys[pygame.K_SPACE]:
             if self.selected_index != None :
-                selected_monster = self.monsters[self.selected_index]
-                current_monster = self.monsters[self.index]
-                self.monsters[self.index] = selected_monster
-                self.monsters[self.selected_index] = current_monster
+                self.store.swap(self.selected_index,rows[self.index])
                 self.selected_index = None
             else:
-                self.selected_index = self.index
-
-    def display_list(self):
+                self.selected_index = rows[self.index]
+
+    def row_surf(self, position: int) -> pygame.Surface:
+        # icon and name of one row on a clear background, kept until the store changes or the row is (de)selected
+        name, selected = self.store.name(position), self.selected_index == position
+        if position not in self.row_surfs or self.row_surfs[position][:2] != (name, selected):
+            surf = pygame.Surface((self.list_width,self.item_height),pygame.SRCALPHA)
+            text_surf = render_text(self.fonts['regular'],name,False,COLORS['gold'] if selected else COLORS['white'])
+            surf.blit(text_surf,text_surf.get_frect(midleft = (90,self.item_height/2 + 10)))
+            icon_surf: pygame.Surface = self.icon_frames[name]
+            surf.blit(icon_surf,icon_surf.get_frect(center = (45,self.item_height/2)))
+            self.row_surfs[position] = (name, selected, surf)
+        return self.row_surfs[position][2]
+
+    def display_list(self, dt: float):
         bg_rect = pygame.FRect(self.main_rect.topleft,(self.list_width,self.main_rect.height))
         pygame.draw.rect(self.display_surface,COLORS['gray'],bg_rect,0,0,12,0,12,0)
 
-        line_offset = vector(0,-2)
-        v_offset = 0 if self.index < self.visible_items else -(self.index - self.visible_items  + 1) * self.item_height
-        for index, monster in self.monsters.items():
-            #colors
-            bg_color = COLORS['gray'] if self.index != index else COLORS['light']
-            text_color = COLORS['white'] if self.selected_index != index else COLORS['gold']
-
-
-            top = self.main_rect.top + index * self.item_height + v_offset
+        rows = self.rows
+        if self.store.version != self.rows_version:
+            self.row_surfs.clear()
+            self.rows_version = self.store.version
+
+        # the window eases towards the row that keeps the cursor in view; big jumps (wrapping, sorting) are not animated
+        target = max(0,min(self.index - self.visible_items + 1,len(rows) - self.visible_items))
+        if abs(target - self.scroll) > self.visible_items:
+            self.scroll = target
+        else:
+            self.scroll += (target - self.scroll) * min(1,self.scroll_speed * dt)
+            if abs(target - self.scroll) < 0.01:
+                self.scroll = target
+
+        # only the rows in view plus the overscan are built and drawn
+        first = max(0,int(self.scroll) - self.overscan)
+        last = min(len(rows),int(self.scroll) + self.visible_items + 1 + self.overscan)
+        window = set(rows[first:last])
+        for position in [position for position in self.row_surfs if position not in window]:
+            del self.row_surfs[position]
+
+        self.display_surface.set_clip(bg_rect)
+        for row in range(first,last):
+            top = self.main_rect.top + (row - self.scroll) * self.item_height
             item_rect = pygame.FRect(self.main_rect.left,top,self.list_width,self.item_height)
+            if not item_rect.colliderect(self.main_rect):
+                continue
 
-            text_surf = self.fonts['regular'].render(monster.name,False,text_color)
-            text_rect = text_surf.get_frect(midleft = item_rect.midleft + vector(90,10))
-
-            icon_surf: pygame.Surface = self.icon_frames[monster.name]
-            icon_rect = icon_surf.get_frect(center = item_rect.midleft + vector(45,0))
-
-
-            if item_rect.colliderect(self.main_rect):
+            if self.index == row:
                 if item_rect.collidepoint(self.main_rect.topleft):
-                    pygame.draw.rect(self.display_surface,bg_color,item_rect,0,0,12)
+                    pygame.draw.rect(self.display_surface,COLORS['light'],item_rect,0,0,12)
                 elif item_rect.collidepoint(self.main_rect.bottomleft + vector(1,-1)):
-                    pygame.draw.rect(self.display_surface,bg_color,item_rect,0,0,0,0,12,0)
+                    pygame.draw.rect(self.display_surface,COLORS['light'],item_rect,0,0,0,0,12,0)
                 else:
-                    pygame.draw.rect(self.display_surface,bg_color,item_rect)
-
-                self.display_surface.blit(text_surf,text_rect)
-                self.display_surface.blit(icon_surf,icon_rect)
-
-        # lines
-        for i in range(1,min(self.visible_items,len(self.monsters))):
-            left = self.main_rect.left
-            right = self.main_rect.left + self.list_width
-            y = self.main_rect.top + self.item_height * i
-            pygame.draw.line(self.display_surface,COLORS['light-gray'],(left,y),(right,y))
+                    pygame.draw.rect(self.display_surface,COLORS['light'],item_rect)
+            if row > 0:
+                pygame.draw.line(self.display_surface,COLORS['light-gray'],item_rect.topleft,item_rect.topright)
+            self.display_surface.blit(self.row_surf(rows[row]),item_rect)
+        self.display_surface.set_clip(None)
 
         # shadow
-        shadow_surf = pygame.Surface((4,self.main_rect.height))
-        shadow_surf.set_alpha(100)
-        self.display_surface.blit(shadow_surf,(self.main_rect.left + self.list_width - 4,self.main_rect.top))
+        self.display_surface.blit(self.shadow_surf,(self.main_rect.left + self.list_width - 4,self.main_rect.top))
 
     def display_main(self, dt: float):
         # data
-        monster = self.monsters[self.index]
+        rows = self.rows
+        if not rows:
+            return
+        monster = self.store.monster(rows[self.index % len(rows)])
 
         # main bg
         rect = pygame.FRect(self.main_rect.left + self.list_width,self.main_rect.top,self.main_rect.width - self.list_width,self.main_rect.height)
@@ -127,12 +163,12 @@ class MonsterIndex():
         self.display_surface.blit(monster_surf,monster_rect)
 
         # name
-        name_surf = self.fonts['bold'].render(monster.name,False,COLORS['white'])
+        name_surf = render_text(self.fonts['bold'],monster.name,False,COLORS['white'])
         name_rect = name_surf.get_frect(topleft = top_rect.topleft + vector(10,10))
         self.display_surface.blit(name_surf,name_rect)
 
         # level
-        level_surf = self.fonts['regular'].render(f'Lvl: {monster.level}',False,COLORS['white'])
+        level_surf = render_text(self.fonts['regular'],f'Lvl: {monster.level}',False,COLORS['white'])
         level_rect = level_surf.get_frect(bottomleft = top_rect.bottomleft + vector(10,-16))
         self.display_surface.blit(level_surf,level_rect)
 
@@ -141,7 +177,7 @@ class MonsterIndex():
         draw_bar(self.display_surface,bar_rect,monster.xp,monster.level_up,COLORS['white'],COLORS['dark'])
 
         # element
-        element_surf = self.fonts['regular'].render(monster.element,False,COLORS['white'])
+        element_surf = render_text(self.fonts['regular'],monster.element,False,COLORS['white'])
         element_rect = element_surf.get_frect(bottomright = top_rect.bottomright + vector(-10,-10))
         self.display_surface.blit(element_surf,element_rect)
 
@@ -156,13 +192,13 @@ class MonsterIndex():
 
         healthbar_rect = pygame.FRect((0,0), (bar_data['width'],bar_data['height'])).move_to(midtop = (bar_data['left_side'],bar_data['top']))
         draw_bar(self.display_surface,healthbar_rect,monster.health,monster.get_stat('max_health'),COLORS['red'],COLORS['black'],2)
-        hp_text = self.fonts['regular'].render(f"HP: {int(monster.health)}/{int(monster.get_stat('max_health'))}",False,COLORS['white'])
+        hp_text = render_text(self.fonts['regular'],f"HP: {int(monster.health)}/{int(monster.get_stat('max_health'))}",False,COLORS['white'])
         hp_rect = hp_text.get_frect(midleft = healthbar_rect.midleft + vector(10,0))
         self.display_surface.blit(hp_text,hp_rect)
 
         energybar_rect = pygame.FRect((0,0), (bar_data['width'],bar_data['height'])).move_to(midtop = (bar_data['right_side'],bar_data['top']))
         draw_bar(self.display_surface,energybar_rect,monster.health,monster.get_stat('max_health'),COLORS['blue'],COLORS['black'],2)
-        energy_text = self.fonts['regular'].render(f"ENERGY: {int(monster.energy)}/{int(monster.get_stat('max_energy'))}",False,COLORS['white'])
+        energy_text = render_text(self.fonts['regular'],f"ENERGY: {int(monster.energy)}/{int(monster.get_stat('max_energy'))}",False,COLORS['white'])
         energy_rect = energy_text.get_frect(midleft = energybar_rect.midleft + vector(10,0))
         self.display_surface.blit(energy_text,energy_rect)
 
@@ -172,7 +208,7 @@ class MonsterIndex():
 
         # stats
         stats_rect = pygame.FRect(sides['left'],healthbar_rect.bottom,healthbar_rect.width,info_height).inflate(0,-60).move(0,15)
-        stats_text_surf = self.fonts['regular'].render('Stats',False,COLORS['white'])
+        stats_text_surf = render_text(self.fonts['regular'],'Stats',False,COLORS['white'])
         stats_text_rect = stats_text_surf.get_frect(bottomleft = stats_rect.topleft)
         self.display_surface.blit(stats_text_surf,stats_text_rect)
 
@@ -188,7 +224,7 @@ class MonsterIndex():
             self.display_surface.blit(icon_surf,icon_rect)
 
             # text
-            text_surf = self.fonts['regular'].render(stat,False,COLORS['white'])
+            text_surf = render_text(self.fonts['regular'],stat,False,COLORS['white'])
             text_rect = text_surf.get_frect(topleft = icon_rect.topleft + vector(30,-10))
             self.display_surface.blit(text_surf,text_rect)
 
@@ -198,13 +234,13 @@ class MonsterIndex():
 
         # abilities
         abilities_rect = stats_rect.copy().move_to(left = sides['right'])
-        abilities_text_surf = self.fonts['regular'].render('Abilities',False,COLORS['white'])
+        abilities_text_surf = render_text(self.fonts['regular'],'Abilities',False,COLORS['white'])
         abilities_text_rect = abilities_text_surf.get_frect(bottomleft = abilities_rect.topleft)
         self.display_surface.blit(abilities_text_surf,abilities_text_rect)
 
         for index, ability in enumerate(monster.get_abilities()):
-            ability_element = ATTACK_DATA[ability]['element']
-            ability_text_surf = self.fonts['regular'].render(ability,False,COLORS['black'])
+            ability_element = ELEMENTS[ATTACK_ELEMENTS[ATTACK_IDS[ability]]]
+            ability_text_surf = render_text(self.fonts['regular'],ability,False,COLORS['black'])
             x = abilities_rect.left + (index % 2) * (abilities_rect.width / 2)
             y = 20 + abilities_rect.top + ((index // 2) * (ability_text_surf.get_height() + 20))
             ability_text_rect = ability_text_surf.get_frect(topleft = (x,y))
@@ -214,5 +250,5 @@ class MonsterIndex():
     def update(self, dt: float):
         self.input()
         self.display_surface.blit(self.tint_surf,(0,0))
-        self.display_list()
+        self.display_list(dt)
         self.display_main(dt)
@@ -0,0 +1,159 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Literal, Optional
+
+from settings import *
+from game_tables import *
+from monster import Monster
+
+
+class MonsterStore():
+    """All of the player's monsters: the party as Monster objects and the box as columns.
+
+    The party is the dict battles play with, slots 0 to `party_size - 1`.
+    Boxed monsters never fight, so the box only keeps what rebuilds a Monster,
+    one array per field. Positions past the party go on into the box, so the
+    collection reads like one list. Sorted and filtered views are position
+    lists cached until the store or a party monster changes; the box part of
+    each is kept apart until the box itself changes, and the few party
+    monsters are merged into it.
+    """
+
+    def __init__(self, party: dict[int, Monster], party_size: int = PARTY_SIZE):
+        self.party = party
+        self.party_size = party_size
+
+        # box columns
+        self.species = array('H')
+        self.levels = array('H')
+        self.xp = array('d')
+        self.health = array('d')
+        self.energy = array('d')
+
+        self.version = 0
+        self.box_version = 0
+        self.views: dict[tuple, list[int]] = {}
+        self.views_version: tuple = ()
+        self.box_views: dict[tuple, tuple[list[int], list]] = {}
+        self.box_views_version: tuple = ()
+        self.unpacked: Optional[tuple[int, int, Monster]] = None
+
+    def __len__(self) -> int:
+        return len(self.party) + len(self.species)
+
+    def changed(self):
+        self.version += 1
+
+    # monsters
+    def add(self, monster: Monster):
+        if len(self.party) < self.party_size:
+            self.party[len(self.party)] = monster
+        else:
+            self.pack(len(self.species),monster)
+        self.changed()
+
+    def pack(self, slot: int, monster: Monster):
+        values = (monster.species, monster.level, monster.xp, monster.health, monster.energy)
+        for column, value in zip((self.species, self.levels, self.xp, self.health, self.energy),values):
+            if slot == len(column):
+                column.append(value)
+            else:
+                column[slot] = value
+        self.box_version += 1
+
+    def unpack(self, slot: int) -> Monster:
+        monster = Monster(SPECIES[self.species[slot]],self.levels[slot])
+        monster.xp, monster.health, monster.energy = self.xp[slot], self.health[slot], self.energy[slot]
+        return monster
+
+    def monster(self, position: int) -> Monster:
+        # a boxed monster comes back as a copy, changes to it are only kept through put()
+        if position < len(self.party):
+            return self.party[position]
+        if not self.unpacked or self.unpacked[:2] != (position, self.version):
+            self.unpacked = (position, self.version, self.unpack(position - len(self.party)))
+        return self.unpacked[2]
+
+    def name(self, position: int) -> str:
+        if position < len(self.party):
+            return self.party[position].name
+        return SPECIES[self.species[position - len(self.party)]]
+
+    def put(self, position: int, monster: Monster):
+        if position < len(self.party):
+            self.party[position] = monster
+        else:
+            self.pack(position - len(self.party),monster)
+        self.changed()
+
+    def swap(self, first: int, second: int):
+        first_monster, second_monster = self.monster(first), self.monster(second)
+        self.put(first,second_monster)
+        self.put(second,first_monster)
+
+    def heal_box(self):
+        for slot, (species, level) in enumerate(zip(self.species,self.levels)):
+            stats = stats_at(species,level)
+            self.health[slot], self.energy[slot] = stats[MAX_HEALTH], stats[MAX_ENERGY]
+        self.box_version += 1
+        self.changed()
+
+    # views
+    def column(self, key: Literal['level','health','name','element'], box: bool = False) -> list:
+        if box:
+            match key:
+                case 'level': return self.levels.tolist()
+                case 'health': return self.health.tolist()
+                case 'name': return [SPECIES[species] for species in self.species]
+                case 'element': return [SPECIES_ELEMENTS[species] for species in self.species]
+        party = self.party.values()
+        match key:
+            case 'level': return [monster.level for monster in party]
+            case 'health': return [monster.health for monster in party]
+            case 'name': return [monster.name for monster in party]
+            case 'element': return [SPECIES_ELEMENTS[monster.species] for monster in party]
+
+    def order(self, key: Optional[Literal['level','health','name','element']], element: Optional[str], reverse: bool, box: bool) -> list[int]:
+        # slots of the party or of the box in `key` order, only those of `element` if given
+        slots = range(len(self.species) if box else len(self.party))
+        if element is not None:
+            elements, wanted = self.column('element',box), ELEMENT_IDS[element]
+            slots = [slot for slot in slots if elements[slot] == wanted]
+        if key is not None:
+            slots = sorted(slots,key=self.column(key,box).__getitem__,reverse=reverse)
+        return list(slots)
+
+    def box_view(self, key: Optional[Literal['level','health','name','element']], element: Optional[str], reverse: bool) -> tuple[list[int], list]:
+        # box positions in `key` order and their values ascending, for placing the party among them
+        if (key, element, reverse) not in self.box_views:
+            slots, offset = self.order(key,element,reverse,True), len(self.party)
+            column = self.column(key,True) if key is not None else []
+            values = [column[slot] for slot in slots] if column else []
+            self.box_views[key, element, reverse] = ([slot + offset for slot in slots], values[::-1] if reverse else values)
+        return self.box_views[key, element, reverse]
+
+    def view(self, key: Optional[Literal['level','health','name','element']] = None, element: Optional[str] = None, reverse: bool = False) -> list[int]:
+        # positions in `key` order, only those of `element` if given; party slots can also be swapped or changed directly
+        version = (self.version, *((monster, monster.version) for monster in self.party.values()))
+        if version != self.views_version:
+            self.views.clear()
+            self.views_version = version
+        if (self.box_version, len(self.party)) != self.box_views_version:
+            self.box_views.clear()
+            self.box_views_version = (self.box_version, len(self.party))
+
+        if (key, element, reverse) not in self.views:
+            box, box_values = self.box_view(key,element,reverse)
+            party = self.order(key,element,reverse,False)
+            if key is None:
+                self.views[key, element, reverse] = party + box
+            else:
+                # each party monster goes in ahead of the box monsters it ties with, as one stable sort would put it
+                values, positions, start = self.column(key), [], 0
+                for position in party:
+                    end = len(box) - bisect_right(box_values,values[position]) if reverse else bisect_left(box_values,values[position])
+                    positions += box[start:end]
+                    positions.append(position)
+                    start = end
+                self.views[key, element, reverse] = positions + box[start:]
+        return self.views[key, element, reverse]
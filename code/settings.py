@@ -1,14 +1,29 @@
 import pygame
 from pygame.math import Vector2 as vector
 from sys import exit
-from os import path
+from os import path, cpu_count
 
 WINDOW_WIDTH, WINDOW_HEIGHT = 1280, 720
 TILE_SIZE = 64
 ANIMATION_SPEED = 6
+MONSTER_ATTACK_FRAMES = 4
 BATTLE_OUTLINE_WIDTH = 4
+AUTO_RESOLVE_WILD = False
+PARTY_SIZE = 6
+ASSET_WORKERS = min(16, cpu_count() or 1)
+MAP_CACHE_BUDGET = 192 * 1024 * 1024
+LEVEL_CACHE_BUDGET = 64 * 1024 * 1024
+TEXT_CACHE_BUDGET = 8 * 1024 * 1024
+TRANSFORM_CACHE_BUDGET = 32 * 1024 * 1024
+MONSTER_FRAMES_BUDGET = 32 * 1024 * 1024
+TERRAIN_CHUNK_SIZE = 16
+SPRITE_BUCKET_SIZE = 512
+WATER_REGION_SIZE = 16
+COAST_REGION_SIZE = 4
+COLLISION_CELL_SIZE = 256
 
 BASE_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+CACHE_DIR = path.join(BASE_DIR, 'cache')
 
 COLORS = {
 	'white': '#f4fefa',
@@ -49,6 +64,21 @@ BATTLE_LAYERS =  {
 	'overlay': 4
 }
 
+BATTLE_DELAYS = {
+	'opponent': 1000,
+	'kill': 600,
+	'catch': 1000
+}
+
+# trainer AI per TRAINER_DATA difficulty: search depth in turns, hard time budget of a decision in ms, share of random turns
+BATTLE_AI = {
+	'easy':   {'depth': 1, 'budget': 2, 'mistakes': 0.5},
+	'normal': {'depth': 2, 'budget': 2, 'mistakes': 0.15},
+	'hard':   {'depth': 4, 'budget': 2, 'mistakes': 0},
+}
+# ms the search stops before the budget, room for the last node and unwinding (at most 0.26 ms past the deadline in thread time)
+BATTLE_AI_MARGIN = 0.4
+
 BATTLE_CHOICES = {
 	'full': {
 		'fight':  {'pos' : vector(30, -60), 'icon': 'sword'},
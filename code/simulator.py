@@ -0,0 +1,202 @@
+import os
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import csv
+import json
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from random import Random
+from statistics import fmean, quantiles
+from time import perf_counter
+from typing import Any, Callable, NamedTuple
+
+from settings import *
+from game_data import *
+from monster import Monster
+from battle_state import BattleState, Fighter, random_action
+from battle_ai import LookaheadAI, trainer_policy
+
+
+class Matchup(NamedTuple):
+    name: str
+    player: tuple[tuple[str, int], ...]
+    opponent: tuple[tuple[str, int], ...]
+    # TRAINER_DATA key whose difficulty picks the opponent policy, None for wild monsters
+    trainer: str | None = None
+
+
+class BattleResult(NamedTuple):
+    winner: str | None
+    length: float
+    turns: int
+    hits: dict[str, list[float]]
+
+
+# matchups
+def parse_party(text: str) -> tuple[tuple[str, int], ...]:
+    party = []
+    for member in text.split(','):
+        name, level = member.split(':')
+        if name not in MONSTER_DATA:
+            raise ValueError(f'unknown monster {name!r}')
+        party.append((name,int(level)))
+    return tuple(party)
+
+def trainer_matchups(parties: list[tuple[tuple[str, int], ...]]) -> list[Matchup]:
+    matchups = []
+    for party in parties:
+        party_name = '+'.join(f'{name}:{level}' for name, level in party)
+        for trainer, data in TRAINER_DATA.items():
+            if not data.get('monsters'):
+                continue
+            roster = tuple(data['monsters'][index] for index in sorted(data['monsters']))
+            matchups.append(Matchup(f'{party_name} vs {trainer}',party,roster,trainer))
+    return matchups
+
+def species_matchups(levels: list[int]) -> list[Matchup]:
+    return [
+        Matchup(f'{player}:{level} vs {opponent}:{level}',((player,level),),((opponent,level),))
+        for level in levels for player, opponent in product(MONSTER_DATA,repeat=2)
+    ]
+
+# simulation
+def opponent_policy(matchup: Matchup) -> Callable[[BattleState, Fighter], tuple[str, Any]]:
+    # the policy the game gives this opponent: the trainer's difficulty, or random actions for wild monsters
+    return trainer_policy(TRAINER_DATA[matchup.trainer]) if matchup.trainer else random_action
+
+def play(matchup: Matchup, seed: str, policy: Callable[[BattleState, Fighter], tuple[str, Any]] | None = None) -> BattleResult:
+    player = { index: Monster(name,level) for index, (name, level) in enumerate(matchup.player) }
+    opponent = { index: Monster(name,level) for index, (name, level) in enumerate(matchup.opponent) }
+    state = BattleState(player,opponent,opponent_policy=policy or opponent_policy(matchup),rng=Random(seed))
+    hits: dict[str, list[float]] = {'player': [], 'opponent': []}
+    turns = 0
+
+    def observe(events: list[tuple]):
+        nonlocal turns
+        for event, _, *details in events:
+            if event == 'turn':
+                turns += 1
+            elif event == 'hit':
+                hits[details[2].entity].append(details[1])
+
+    winner = state.resolve(observe=observe)
+    return BattleResult(winner,state.time / 1000,turns,hits)
+
+def play_chunk(task: tuple[Matchup, int, int, int]) -> tuple[str, list[BattleResult]]:
+    # seeds depend only on the matchup and battle number, not on how work is split
+    matchup, seed, start, count = task
+    return matchup.name, [play(matchup,f'{seed}:{matchup.name}:{battle}') for battle in range(start,start + count)]
+
+def spread(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {'mean': 0, 'p10': 0, 'p50': 0, 'p90': 0}
+    deciles = quantiles(values,n=10,method='inclusive') if len(values) > 1 else [values[0]] * 9
+    return {'mean': fmean(values), 'p10': deciles[0], 'p50': deciles[4], 'p90': deciles[8]}
+
+def summarize(matchup: Matchup, results: list[BattleResult]) -> dict[str, float | int | str]:
+    row: dict[str, float | int | str] = {
+        'matchup': matchup.name,
+        'battles': len(results),
+        'player_wins': sum(result.winner == 'player' for result in results),
+        'opponent_wins': sum(result.winner == 'opponent' for result in results),
+        'unresolved': sum(result.winner is None for result in results),
+    }
+    row['win_rate'] = row['player_wins'] / len(results)
+    row['mean_length_s'] = fmean(result.length for result in results)
+    row['mean_turns'] = fmean(result.turns for result in results)
+
+    # damage per hit (heals are negative) and per battle, by the attacking side
+    for side in ('player', 'opponent'):
+        for key, value in spread([hit for result in results for hit in result.hits[side]]).items():
+            row[f'{side}_hit_{key}'] = value
+        row[f'{side}_damage_per_battle'] = fmean(sum(hit for hit in result.hits[side] if hit > 0) for result in results)
+    return row
+
+def simulate(matchups: list[Matchup], battles: int, workers: int, seed: int = 0, chunk: int = 50) -> list[dict[str, float | int | str]]:
+    tasks = [(matchup,seed,start,min(chunk,battles - start)) for matchup in matchups for start in range(0,battles,chunk)]
+    results: dict[str, list[BattleResult]] = { matchup.name: [] for matchup in matchups }
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            for name, chunk_results in pool.map(play_chunk,tasks):
+                results[name].extend(chunk_results)
+    else:
+        for name, chunk_results in map(play_chunk,tasks):
+            results[name].extend(chunk_results)
+    return [summarize(matchup,results[matchup.name]) for matchup in matchups]
+
+def check_policies(matchups: list[Matchup]) -> list[str]:
+    # every trainer battle has to be decided by the AI its TRAINER_DATA difficulty configures
+    problems = []
+    for matchup in matchups:
+        difficulty = TRAINER_DATA[matchup.trainer].get('difficulty') if matchup.trainer else None
+        policy = opponent_policy(matchup)
+        if difficulty is None:
+            if policy is not random_action:
+                problems.append(f'{matchup.name}: {policy!r} instead of random_action')
+            continue
+        if not isinstance(policy,LookaheadAI) or BATTLE_AI[difficulty] != {'depth': policy.depth, 'budget': policy.budget, 'mistakes': policy.mistakes}:
+            problems.append(f'{matchup.name}: {policy!r} instead of the {difficulty} LookaheadAI')
+            continue
+
+        decisions = 0
+        def counted(state: BattleState, fighter: Fighter) -> tuple[str, Any]:
+            nonlocal decisions
+            decisions += 1
+            return policy(state,fighter)
+        play(matchup,f'check:{matchup.name}',counted)
+        if not decisions:
+            problems.append(f'{matchup.name}: the {difficulty} AI made no decision')
+    return problems
+
+# output
+def write_rows(rows: list[dict[str, float | int | str]], format: str, output):
+    if format == 'json':
+        json.dump(rows,output,indent=2)
+        output.write('\n')
+    else:
+        writer = csv.DictWriter(output,fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Monte Carlo battle simulator for balancing MONSTER_DATA and ATTACK_DATA')
+    commands = parser.add_subparsers(dest='command', required=True)
+    trainers_parser = commands.add_parser('trainers', help='every TRAINER_DATA roster against one or more player parties')
+    trainers_parser.add_argument('--party', action='append', type=parse_party, help='name:level,... (repeatable, default: the starting party)')
+    species_parser = commands.add_parser('species', help='every species against every species, one on one')
+    species_parser.add_argument('--levels', type=lambda value: [int(level) for level in value.split(',')], default=[5, 15, 30])
+    check_parser = commands.add_parser('check', help='check that every trainer matchup is played with the AI of its difficulty')
+    check_parser.add_argument('--party', action='append', type=parse_party, help='name:level,... (repeatable, default: the starting party)')
+    for command_parser in (trainers_parser, species_parser):
+        command_parser.add_argument('--battles', type=int, default=200, help='battles per matchup')
+        command_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        command_parser.add_argument('--seed', type=int, default=0)
+        command_parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+        command_parser.add_argument('--output', help='file to write, default stdout')
+
+    args = parser.parse_args()
+    match args.command:
+        case 'trainers': matchups = trainer_matchups(args.party or [parse_party('Plumette:6,Sparchu:6,Finsta:7')])
+        case 'species': matchups = species_matchups(args.levels)
+        case 'check':
+            problems = check_policies(trainer_matchups(args.party or [parse_party('Plumette:6,Sparchu:6,Finsta:7')]))
+            for line in problems:
+                print(line,file=sys.stderr)
+            if problems:
+                sys.exit(f'{len(problems)} trainer matchups without their configured policy')
+            print('every trainer matchup is played with its configured policy')
+            sys.exit()
+
+    start = perf_counter()
+    rows = simulate(matchups,args.battles,args.workers,args.seed)
+    elapsed = perf_counter() - start
+    if args.output:
+        with open(args.output,'w',newline='') as file:
+            write_rows(rows,args.format,file)
+    else:
+        write_rows(rows,args.format,sys.stdout)
+    total = len(matchups) * args.battles
+    print(f'{total} battles in {elapsed:.1f} s ({total / elapsed:.0f} battles/s, {args.workers} workers)',file=sys.stderr)
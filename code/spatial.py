@@ -0,0 +1,178 @@
+from bisect import insort
+from math import inf
+from typing import Any, Iterator
+
+from settings import *
+
+
+def grid_cells(rect: pygame.FRect, cell_size: int) -> list[tuple[int,int]]:
+    left, top = int(rect.left // cell_size), int(rect.top // cell_size)
+    right, bottom = int(rect.right // cell_size), int(rect.bottom // cell_size)
+    return [(col,row) for col in range(left,right + 1) for row in range(top,bottom + 1)]
+
+
+class SpatialHash(pygame.sprite.Group):
+    """Sprite group that buckets hitboxes in a uniform grid.
+
+    Sprites are indexed by the COLLISION_CELL_SIZE cells their hitbox overlaps,
+    so `query` only visits sprites near a rect. Sprites that move have to be
+    re-indexed with `move`. Queries return sprites in the order they were
+    added, like iterating the group would.
+    """
+
+    def __init__(self, *sprites, cell_size = COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int,int], list[pygame.sprite.Sprite]] = {}
+        self.sprite_cells: dict[pygame.sprite.Sprite, list[tuple[int,int]]] = {}
+        self.unindexed: list[pygame.sprite.Sprite] = []
+        self.order: dict[pygame.sprite.Sprite, int] = {}
+        self.sequence = 0
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite: pygame.sprite.Sprite, layer = None):
+        super().add_internal(sprite,layer)
+        self.order[sprite] = self.sequence
+        self.sequence += 1
+        # hitboxes are assigned after the sprite joins its groups
+        self.unindexed.append(sprite)
+
+    def remove_internal(self, sprite: pygame.sprite.Sprite):
+        super().remove_internal(sprite)
+        if sprite in self.sprite_cells:
+            self.unlink(sprite)
+        else:
+            self.unindexed.remove(sprite)
+        del self.order[sprite]
+
+    def bounds(self, sprite: pygame.sprite.Sprite) -> pygame.FRect:
+        return sprite.hitbox
+
+    def cells_of(self, rect: pygame.FRect) -> list[tuple[int,int]]:
+        return grid_cells(rect,self.cell_size)
+
+    def link(self, sprite: pygame.sprite.Sprite):
+        self.sprite_cells[sprite] = self.cells_of(self.bounds(sprite))
+        for cell in self.sprite_cells[sprite]:
+            insort(self.cells.setdefault(cell,[]),sprite,key=self.order.__getitem__)
+
+    def unlink(self, sprite: pygame.sprite.Sprite):
+        for cell in self.sprite_cells.pop(sprite):
+            self.cells[cell].remove(sprite)
+
+    def build(self):
+        for sprite in self.unindexed:
+            self.link(sprite)
+        self.unindexed.clear()
+
+    def move(self, sprite: pygame.sprite.Sprite):
+        if sprite in self.sprite_cells and self.cells_of(self.bounds(sprite)) != self.sprite_cells[sprite]:
+            self.unlink(sprite)
+            self.link(sprite)
+
+    def query(self, rect: pygame.FRect) -> list[pygame.sprite.Sprite]:
+        self.build()
+        cells = self.cells_of(rect)
+        if len(cells) == 1:
+            return self.cells.get(cells[0],[])[:]
+        sprites = { sprite for cell in cells for sprite in self.cells.get(cell,()) }
+        return sorted(sprites,key=self.order.__getitem__)
+
+    def collide(self, rect: pygame.FRect) -> Iterator[pygame.sprite.Sprite]:
+        """Yields the sprites whose hitbox collides with `rect`, in insertion order.
+
+        The caller may move `rect` between steps, as collision resolution does;
+        the remaining sprites are then looked up around its new position.
+        """
+        last = -1
+        while True:
+            query_rect = rect.copy()
+            for sprite in self.query(query_rect):
+                if self.order[sprite] > last and self.bounds(sprite).colliderect(rect):
+                    last = self.order[sprite]
+                    yield sprite
+                    if rect != query_rect:
+                        break
+            else:
+                return
+
+
+class OccupancyGrid(SpatialHash):
+    """Tile grid of the rects that block line of sight.
+
+    `raycast` walks only the cells a segment passes through (DDA) and tests
+    the rects found there exactly with `clipline`.
+    """
+
+    def __init__(self, *sprites, cell_size = TILE_SIZE):
+        super().__init__(*sprites, cell_size=cell_size)
+
+    def bounds(self, sprite: pygame.sprite.Sprite) -> pygame.FRect:
+        return sprite.rect
+
+    def traverse(self, start: tuple[float,float], end: tuple[float,float]) -> Iterator[tuple[int,int]]:
+        col, row = int(start[0] // self.cell_size), int(start[1] // self.cell_size)
+        end_col, end_row = int(end[0] // self.cell_size), int(end[1] // self.cell_size)
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        step_x, step_y = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+        # distance along the segment, as a fraction of it, to the next vertical and horizontal cell border
+        next_x = ((col + (dx > 0)) * self.cell_size - start[0]) / dx if dx else inf
+        next_y = ((row + (dy > 0)) * self.cell_size - start[1]) / dy if dy else inf
+        delta_x = self.cell_size / abs(dx) if dx else inf
+        delta_y = self.cell_size / abs(dy) if dy else inf
+
+        yield col, row
+        remaining = abs(end_col - col) + abs(end_row - row)
+        while remaining > 0:
+            if next_x < next_y:
+                col += step_x
+                next_x += delta_x
+                remaining -= 1
+            elif next_y < next_x:
+                row += step_y
+                next_y += delta_y
+                remaining -= 1
+            else:
+                # the segment passes exactly through a cell corner, so both side cells are touched
+                yield col + step_x, row
+                yield col, row + step_y
+                col, row = col + step_x, row + step_y
+                next_x, next_y = next_x + delta_x, next_y + delta_y
+                remaining -= 2
+            yield col, row
+
+    def raycast(self, start: tuple[float,float], end: tuple[float,float], ignore: pygame.sprite.Sprite | None = None) -> bool:
+        self.build()
+        tested: set[pygame.sprite.Sprite] = set()
+        for cell in self.traverse(start,end):
+            for sprite in self.cells.get(cell,()):
+                if sprite is not ignore and sprite not in tested:
+                    tested.add(sprite)
+                    if sprite.rect.clipline(start,end):
+                        return True
+        return False
+
+
+class TriggerGrid():
+    """Static trigger areas indexed by the tile cells they overlap.
+
+    A query only looks at the cells under the given rect, so its cost does not
+    depend on how many triggers the map has. Matches come back in the order
+    the triggers were added.
+    """
+
+    def __init__(self, cell_size = TILE_SIZE):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int,int], list[tuple[int, pygame.FRect, Any]]] = {}
+        self.sequence = 0
+
+    def __len__(self):
+        return self.sequence
+
+    def add(self, rect: pygame.FRect, trigger: Any):
+        for cell in grid_cells(rect,self.cell_size):
+            self.cells.setdefault(cell,[]).append((self.sequence,rect,trigger))
+        self.sequence += 1
+
+    def query(self, rect: pygame.FRect) -> list[Any]:
+        matches = { index: trigger for cell in grid_cells(rect,self.cell_size) for index, area, trigger in self.cells.get(cell,()) if area.colliderect(rect) }
+        return [matches[index] for index in sorted(matches)]
@@ -4,8 +4,10 @@ from typing import Optional, Literal, Callable
 
 from settings import *
 from monster import *
+from battle_state import Fighter
 from support import *
 from custom_timer import *
+from transform_cache import *
 
 
 # overworld sprites
@@ -35,14 +37,38 @@ class AnimatedSprite(BaseSprite):
         self.animate(dt)
 
 
+class AnimationClock():
+
+    def __init__(self):
+        self.frame_index = 0
+
+    def reset(self):
+        self.frame_index = 0
+
+    def update(self, dt: float):
+        self.frame_index += (ANIMATION_SPEED * dt)
+
+
+class RegionSprite(BaseSprite):
+    """Pre-rendered animated region that takes its frame from a shared clock."""
+
+    def __init__(self, pos: tuple[float, float], frames: list[Surface], clock: AnimationClock, groups: tuple[pygame.sprite.Group], z_index = WORLD_LAYERS['main']):
+        self.frames, self.clock = frames, clock
+        super().__init__(pos, frames[int(clock.frame_index) % len(frames)], groups, z_index)
+
+    def update(self, dt: float, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.image = self.frames[int(self.clock.frame_index) % len(self.frames)]
+
+
 class MonsterPatchSprite(BaseSprite):
 
-    def __init__(self, pos: tuple[float, float], surf: Surface, groups: tuple[pygame.sprite.Group], biome: str, monster_level: int, patch_monsters: str):
+    def __init__(self, pos: tuple[float, float], surf: Surface, groups: tuple[pygame.sprite.Group], biome: str, monster_level: int, patch_monsters: tuple[str, ...]):
         self.biome = biome
         super().__init__(pos, surf, groups, WORLD_LAYERS['main' if self.biome != 'sand' else 'bg'])
         self.y_sort -= 40
         self.level = monster_level
-        self.monsters = patch_monsters.split(',')
+        self.monsters = list(patch_monsters)
 
 
 class BorderSprite(BaseSprite):
@@ -58,101 +84,54 @@ class CollidableSprite(BaseSprite):
         self.hitbox = self.rect.inflate(0,-(self.rect.height * 0.6))
 
 
-class TransitionSprite(BaseSprite):
-
-    def __init__(self, pos: tuple[float, float], size: tuple[float, float], target: tuple[str, str], groups: tuple[pygame.sprite.Group], z_index=WORLD_LAYERS['main']):
-        surf = Surface(size)
-        super().__init__(pos, surf, groups, z_index)
-        self.target = target
-
-
 # battle sprites
 class MonsterSprite(pygame.sprite.Sprite):
 
-    def __init__(
-            self,
-            pos: tuple[float, float],
-            frames: dict[str, list[Surface]],
-            groups: tuple[pygame.sprite.Group],
-            monster: Monster,
-            index: int,
-            pos_index: int,
-            entitiy: str,
-            apply_attack: Callable[['MonsterSprite',Literal['burn','heal','battlecry','spark','scratch','splash','fire','explosion','annihilate','ice'],float],None],
-            create_monster: Callable[[Monster,int,int,Literal['player','opponent']],None]
-        ):
+    def __init__(self, pos: tuple[float, float], frames: dict[str, list[Surface]], groups: tuple[pygame.sprite.Group], fighter: Fighter):
         # data
-        self.index = index
-        self.pos_index = pos_index
-        self.entity = entitiy
-        self.monster = monster
-        self.frame_index, self.frames = 0, frames
-        self.state: Literal['idle', 'attack'] = 'idle'
+        self.fighter = fighter
+        self.index = fighter.index
+        self.pos_index = fighter.pos_index
+        self.entity = fighter.entity
+        self.monster = fighter.monster
+        self.frames = frames
         self.animation_speed = ANIMATION_SPEED + uniform(-1,1)
         self.z_index = BATTLE_LAYERS['monster']
         self.highlight = False
         self.adjusted_frame_index = 0
-        self.target_sprite: Optional['MonsterSprite'] = None
-        self.current_attack: Optional[Literal['burn','heal','battlecry','spark','scratch','splash','fire','explosion','annihilate','ice']] = None
-        self.next_monster_data: Optional[tuple[Monster,int,int,Literal['player','opponent']]] = None
-        self.apply_attack = apply_attack
-        self.create_monster = create_monster
 
         # sprite setup
         super().__init__(*groups)
-        self.image = self.frames[self.state][self.frame_index]
+        self.image = self.frames[self.state][self.adjusted_frame_index]
         self.rect = self.image.get_frect(center = pos)
 
         # timers
         self.timers = {
-            'remove_highlight': Timer(300,func = lambda: self.set_highlight(False)),
-            'kill': Timer(600,func=self.destroy)
+            'remove_highlight': Timer(300,func = lambda: self.set_highlight(False))
         }
 
-    def animate(self, dt: float):
-        self.frame_index += (ANIMATION_SPEED * dt)
+    @property
+    def state(self) -> Literal['idle', 'attack']:
+        return self.fighter.state
 
-        self.adjusted_frame_index = int(self.frame_index) % len(self.frames[self.state])
+    def animate(self):
+        # the animation is advanced by the battle state, the hit lands on its last attack frame
+        self.adjusted_frame_index = int(self.fighter.frame_index) % len(self.frames[self.state])
         self.image = self.frames[self.state][self.adjusted_frame_index]
 
-        if self.state == 'attack' and self.adjusted_frame_index == len(self.frames[self.state]) - 1:
-            # apply attack
-            self.apply_attack(self.target_sprite,self.current_attack,self.monster.get_base_damage(self.current_attack))
-            self.state = 'idle'
-
         if self.highlight:
-            white_surf = pygame.mask.from_surface(self.image).to_surface()
-            white_surf.set_colorkey('black')
-            self.image = white_surf
+            self.image = silhouette(self.image)
 
     def set_highlight(self, value: bool):
         self.highlight = value
         if value:
             self.timers['remove_highlight'].activate()
 
-    def activate_attack(self, target_sprite: 'MonsterSprite', attack: Literal['burn','heal','battlecry','spark','scratch','splash','fire','explosion','annihilate','ice']):
-        self.state = 'attack'
-        self.frame_index = 0
-        self.target_sprite = target_sprite
-        self.current_attack = attack
-        self.monster.reduce_energy(attack)
-
-    def delayed_kill(self, new_monster: Optional[tuple[Monster,int,int,Literal['player','opponent']]] = None):
-        if not self.timers['kill'].active:
-            self.next_monster_data = new_monster
-            self.timers['kill'].activate()
-
-    def destroy(self):
-        self.kill()
-        if self.next_monster_data:
-            self.create_monster(*self.next_monster_data)
-
     def update(self, dt: float, *args, **kwargs):
         super().update(*args, **kwargs)
         for timer in self.timers.values():
             timer.update()
-        self.animate(dt)
-        self.monster.update(dt)
+        self.animate()
 
 
 class MonsterOutlineSprite(pygame.sprite.Sprite):
@@ -181,7 +160,7 @@ class MonsterNameSprite(pygame.sprite.Sprite):
         self.z_index = BATTLE_LAYERS['name']
 
         padding = 10
-        text_surf = font.render(self.monster_sprite.monster.name,False,COLORS['black'])
+        text_surf = render_text(font,self.monster_sprite.monster.name,False,COLORS['black'])
 
         self.image = pygame.Surface((text_surf.width + 2 * padding,text_surf.height + 2 *padding))
         self.image.fill(COLORS['white'])
@@ -205,17 +184,28 @@ class MonsterLevelSprite(pygame.sprite.Sprite):
         self.image = pygame.Surface((60,26))
         self.rect = self.image.get_frect(topleft = anchor) if entity == 'player' else self.image.get_frect(topright = anchor)
         self.xp_rect = pygame.FRect(0,self.rect.height-2,self.rect.width,2)
+        self.version: int | None = None
+        self.shown: tuple | None = None
 
-    def update(self, dt: float, *args, **kwargs):
-        super().update(*args, **kwargs)
+    def redraw(self, monster: Monster):
         self.image.fill(COLORS['white'])
 
-        text_surf = self.font.render(f"Lvl {self.monster_sprite.monster.level}",False,COLORS['black'])
+        text_surf = render_text(self.font,f"Lvl {monster.level}",False,COLORS['black'])
         text_rect = text_surf.get_frect(center = (self.rect.width/2,self.rect.height/2))
 
         self.image.blit(text_surf,text_rect)
 
-        draw_bar(self.image,self.xp_rect,self.monster_sprite.monster.xp,self.monster_sprite.monster.level_up,COLORS['black'],COLORS['white'])
+        draw_bar(self.image,self.xp_rect,monster.xp,monster.level_up,COLORS['black'],COLORS['white'])
+
+    def update(self, dt: float, *args, **kwargs):
+        super().update(*args, **kwargs)
+        monster = self.monster_sprite.monster
+        if monster.version != self.version:
+            self.version = monster.version
+            shown = (monster.level,monster.xp,monster.level_up)
+            if shown != self.shown:
+                self.shown = shown
+                self.redraw(monster)
 
         if not self.monster_sprite.groups():
             self.kill()
@@ -230,23 +220,33 @@ class MonsterStatsSprite(pygame.sprite.Sprite):
         self.rect = self.image.get_frect(midbottom = pos)
         self.font = font
         self.z_index = BATTLE_LAYERS['overlay']
+        self.init_rect = pygame.FRect((0,self.rect.height-2),(self.rect.width,2))
+        self.version: int | None = None
+        self.shown: tuple | None = None
 
-    def update(self, _,*args, **kwargs):
-        super().update(*args, **kwargs)
+    def redraw(self, info: tuple[tuple[float, float], ...]):
         self.image.fill(COLORS['white'])
-
-        for index, (value, max_value) in enumerate(self.monster_sprite.monster.get_info()):
+        for index, (value, max_value) in enumerate(info):
             value = int(value)
-            color = (COLORS['red'],COLORS['blue'],COLORS['gray'])[index]
-            if index <= 1:
-                text_surf = self.font.render(f"{value}/{max_value}",False,COLORS['black'])
-                text_rect = text_surf.get_frect(topleft = (self.rect.width * 0.05,index * (self.rect.height / 2)))
-                bar_rect = pygame.FRect(text_rect.bottomleft + vector(0,-2),(self.rect.width * 0.9,4))
-                self.image.blit(text_surf,text_rect)
-                draw_bar(self.image,bar_rect,value,max_value,color,COLORS['black'],2)
-            else:
-                init_rect = pygame.FRect((0,self.rect.height-2),(self.rect.width,2))
-                draw_bar(self.image,init_rect,value,max_value,color,COLORS['white'],0)
+            color = (COLORS['red'],COLORS['blue'])[index]
+            text_surf = render_text(self.font,f"{value}/{max_value}",False,COLORS['black'])
+            text_rect = text_surf.get_frect(topleft = (self.rect.width * 0.05,index * (self.rect.height / 2)))
+            bar_rect = pygame.FRect(text_rect.bottomleft + vector(0,-2),(self.rect.width * 0.9,4))
+            self.image.blit(text_surf,text_rect)
+            draw_bar(self.image,bar_rect,value,max_value,color,COLORS['black'],2)
+
+    def update(self, _,*args, **kwargs):
+        super().update(*args, **kwargs)
+        monster = self.monster_sprite.monster
+        health, energy, (initiative, max_initiative) = monster.get_info()
+        # health and energy are redrawn when the numbers shown change, the initiative bar every frame
+        if monster.version != self.version:
+            self.version = monster.version
+            shown = ((int(health[0]),health[1]),(int(energy[0]),energy[1]))
+            if shown != self.shown:
+                self.shown = shown
+                self.redraw(shown)
+        draw_bar(self.image,self.init_rect,int(initiative),max_initiative,COLORS['gray'],COLORS['white'],0)
 
         if not self.monster_sprite.groups():
             self.kill()
@@ -268,15 +268,10 @@ class AttackSprite(AnimatedSprite):
 
 class TimedSprite(BaseSprite):
 
-    def __init__(self, pos: tuple[float, float], surf: pygame.Surface, groups: tuple[pygame.sprite.Group], duration: int, update_all_monster: Callable[[Literal['pause', 'resume']], None]):
+    def __init__(self, pos: tuple[float, float], surf: pygame.Surface, groups: tuple[pygame.sprite.Group], duration: int):
         super().__init__(pos, surf, groups, BATTLE_LAYERS['overlay'])
         self.rect.center = pos
-        self.update_all_monster = update_all_monster
-        self.death_timer = Timer(duration,autostart=True,func=self.destroy)
-
-    def destroy(self):
-        self.kill()
-        self.update_all_monster('resume')
+        self.death_timer = Timer(duration,autostart=True,func=self.kill)
 
     def update(self, _, *args, **kwargs):
         super().update(*args, **kwargs)
@@ -287,11 +282,11 @@ class DefendSprite(pygame.sprite.Sprite):
     def __init__(self, monster_sprite: MonsterSprite, image: pygame.Surface, groups: tuple[pygame.sprite.Group]):
         super().__init__(*groups)
         self.monster_sprite = monster_sprite
-        mask = pygame.mask.from_surface(monster_sprite.image)
+        visible_rects = bounding_rects(monster_sprite.image)
         self.image = image
         self.z_index = BATTLE_LAYERS['overlay']
-        if mask.get_bounding_rects():
-            visible_rect = mask.get_bounding_rects()[0]
+        if visible_rects:
+            visible_rect = visible_rects[0]
 
             # Absolute position of the mask's top edge relative to the screen
             visible_top = monster_sprite.rect.top + visible_rect.top
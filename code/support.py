@@ -2,13 +2,52 @@ from settings import *
 from entities import Entity
 from os.path import join
 from os import walk
-from pytmx import TiledMap
-from pytmx.util_pygame import load_pygame
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager
+from time import perf_counter
+from lazy_cache import LazyCache
+from asset_cache import AssetPack, Pixels, source_files, surfaces
+from map_compiler import CompiledMap, load_compiled_map, load_tilesets
+from text_cache import render_text, text_cache
+
+# decoding
+decode_pool: ThreadPoolExecutor | None = None
+decoding: dict[str, Future] = {}
+
+def decode_file(full_path: str):
+	if full_path.endswith(('.ogg', '.mp3', '.wav')):
+		return pygame.mixer.Sound(full_path)
+	return pygame.image.load(full_path)
+
+def prefetch_files(full_paths: list[str]):
+	global decode_pool
+	if decode_pool is None:
+		decode_pool = ThreadPoolExecutor(ASSET_WORKERS)
+	for full_path in full_paths:
+		if full_path not in decoding:
+			decoding[full_path] = decode_pool.submit(decode_file,full_path)
+
+def prefetch(*path):
+	prefetch_files([join(folder_path,file_name) for folder_path, _, file_names in walk(join(BASE_DIR,*path)) for file_name in file_names])
+
+def load_image(full_path: str) -> pygame.Surface:
+	future = decoding.pop(full_path,None)
+	return future.result() if future else pygame.image.load(full_path)
+
+def load_sound(full_path: str) -> pygame.mixer.Sound:
+	future = decoding.pop(full_path,None)
+	return future.result() if future else pygame.mixer.Sound(full_path)
+
+@contextmanager
+def timed(timings: dict[str, float], category: str):
+	start = perf_counter()
+	yield
+	timings[category] = perf_counter() - start
 
 # imports
 def import_image(*path, alpha = True, format = 'png'):
 	full_path = join(BASE_DIR,*path) + f'.{format}'
-	surf = pygame.image.load(full_path).convert_alpha() if alpha else pygame.image.load(full_path).convert()
+	surf = load_image(full_path).convert_alpha() if alpha else load_image(full_path).convert()
 	return surf
 
 def import_folder(*path):
@@ -16,7 +55,7 @@ def import_folder(*path):
 	for folder_path, sub_folders, image_names in walk(join(BASE_DIR,*path)):
 		for image_name in sorted(image_names, key = lambda name: int(name.split('.')[0])):
 			full_path = join(folder_path, image_name)
-			surf = pygame.image.load(full_path).convert_alpha()
+			surf = load_image(full_path).convert_alpha()
 			frames.append(surf)
 	return frames
 
@@ -25,7 +64,7 @@ def import_folder_dict(*path):
 	for folder_path, sub_folders, image_names in walk(join(BASE_DIR,*path)):
 		for image_name in image_names:
 			full_path = join(folder_path, image_name)
-			surf = pygame.image.load(full_path).convert_alpha()
+			surf = load_image(full_path).convert_alpha()
 			frames[image_name.split('.')[0]] = surf
 	return frames
 
@@ -81,48 +120,99 @@ def coast_importer(cols, rows, *path):
 			new_dict[terrain][key] = [frame_dict[(pos[0] + index * 3, pos[1] + row)] for row in range(0, rows, 3)]
 	return new_dict
 
+def tiled_frames(frames: list[pygame.Surface], size: tuple[int, int], cache: dict[tuple[int, int, int], list[pygame.Surface]]):
+	# every region of the same size shows the same pixels, so the tiled frames are shared through the cache of the level
+	key = (id(frames),*size)
+	if key not in cache:
+		cache[key] = []
+		for frame in frames:
+			surf = pygame.Surface(size,pygame.SRCALPHA)
+			for x in range(0,size[0],frame.width):
+				for y in range(0,size[1],frame.height):
+					surf.blit(frame,(x,y))
+			cache[key].append(surf)
+	return cache[key]
+
+def composite_frames(tiles: list[tuple[tuple[float, float], list[pygame.Surface]]]):
+	left = min(pos[0] for pos, _ in tiles)
+	top = min(pos[1] for pos, _ in tiles)
+	right = max(pos[0] + frames[0].width for pos, frames in tiles)
+	bottom = max(pos[1] + frames[0].height for pos, frames in tiles)
+	surfs = [pygame.Surface((right - left,bottom - top),pygame.SRCALPHA) for _ in tiles[0][1]]
+	for pos, frames in tiles:
+		for surf, frame in zip(surfs,frames):
+			surf.blit(frame,(pos[0] - left,pos[1] - top))
+	return (left,top), surfs
+
 def tmx_importer(*path):
-	tmx_dict: dict[str, TiledMap] = {}
+	tmx_paths: dict[str, str] = {}
 	for folder_path, sub_folder, file_names in walk(join(BASE_DIR,*path)):
 		for file in file_names:
 			map_name = file.split('.')[0]
-			full_path = join(folder_path,file)
-			tmx_dict[map_name] = load_pygame(full_path)
-	return tmx_dict
-
-def monster_importer(cols: int, rows: int, *path):
-	monster_dict: dict[str, list[pygame.Surface]] = {}
-	frame_dict = import_tilemap(cols,rows,*path)
+			tmx_paths[map_name] = join(folder_path,file)
+	load_tilesets()
+	return LazyCache(tmx_paths,load_compiled_map,lambda tmx_map: tmx_map.nbytes,transition_targets)
+
+def transition_targets(tmx_map: CompiledMap):
+	return [obj.target for obj in tmx_map.transitions]
+
+def sheet_pixels(*path):
+	# decoded without a display, so it can run on any thread: (height, width, BGRA) array of the image
+	import numpy as np
+	surf = load_image(join(BASE_DIR,*path) + '.png')
+	return np.frombuffer(pygame.image.tobytes(surf,'BGRA'),dtype=np.uint8).reshape(surf.height,surf.width,4)
+
+def monster_pixels(cols: int, rows: int, *path):
+	# the frames import_tilemap cuts: blended onto the green colour key, which convert_alpha() then leaves transparent
+	import numpy as np
+	sheet = sheet_pixels(*path)
+	alpha = sheet[...,3:].astype(np.uint16)
+	key = np.array([0,255,0],dtype=np.uint16)
+	colour = (sheet[...,:3] * alpha + key * (255 - alpha) + 127) // 255
+	sheet = np.where(sheet[...,3:] > 0,np.dstack([colour,np.full_like(alpha,255)]),np.array([0,255,0,0])).astype(np.uint8)
+
+	monster_dict: dict[str, list[Pixels]] = {}
+	height, width = sheet.shape[0] // rows, sheet.shape[1] // cols
 	for row, state in enumerate(['idle','attack']):
 		monster_dict[state] = []
 		for col in range(cols):
-			monster_dict[state].append(frame_dict[(col,row)])
+			frame = sheet[row * height:(row + 1) * height,col * width:(col + 1) * width]
+			monster_dict[state].append(Pixels(frame.tobytes(),(width,height)))
 	return monster_dict
 
-def all_monsters_importer(*path):
-	all_monster_dict: dict[str, dict[str, list[pygame.Surface]]] = {}
-	for folder_path, _ , file_names in walk(join(BASE_DIR,*path)):
-		for file in file_names:
-			name = file.split('.')[0]
-			all_monster_dict[name] = monster_importer(4,2,*path,name)
-	return all_monster_dict
-
-def outline_creator(frame_dict: dict[str, dict[str, list[pygame.Surface]]], width: int):
-	outline_frame_dict: dict[str, dict[str, list[pygame.Surface]]] = {}
-	for monster, monster_frames in frame_dict.items():
-		outline_frame_dict[monster] = {}
-		for state, frames in monster_frames.items():
-			outline_frame_dict[monster][state] = []
-			for frame in frames:
-				new_surf = pygame.Surface(vector(frame.get_size()) + vector(width* 2),pygame.SRCALPHA)
-				new_surf.fill((0,0,0,0))
-				white_frame = pygame.mask.from_surface(frame).to_surface()
-				white_frame.set_colorkey('black')
-
-				for pos in [(0,0), (width,0), (width*2,0), (width*2,width), (width*2,width*2), (width,width*2), (0,width*2), (0,width)]:
-					new_surf.blit(white_frame,pos)
-				outline_frame_dict[monster][state].append(new_surf)
-	return outline_frame_dict
+def outline_pixels(monster_frames: dict[str, list[Pixels]], width: int):
+	# monster_outlines on raw pixels: the mask of each frame (alpha above 127) stamped white at eight offsets
+	import numpy as np
+	outline_frames: dict[str, list[Pixels]] = {}
+	for state, frames in monster_frames.items():
+		outline_frames[state] = []
+		for frame in frames:
+			frame_width, frame_height = frame.size
+			mask = np.frombuffer(frame.data,dtype=np.uint8).reshape(frame_height,frame_width,4)[...,3] > 127
+			outline = np.zeros((frame_height + width * 2,frame_width + width * 2,4),dtype=np.uint8)
+			for x, y in [(0,0), (width,0), (width*2,0), (width*2,width), (width*2,width*2), (width,width*2), (0,width*2), (0,width)]:
+				outline[y:y + frame_height,x:x + frame_width][mask] = 255
+			outline_frames[state].append(Pixels(outline.tobytes(),(outline.shape[1],outline.shape[0])))
+	return outline_frames
+
+def frames_nbytes(species_frames: dict[str, dict[str, list[pygame.Surface]]]):
+	return sum(frame.width * frame.height * frame.get_bytesize() for part in species_frames.values() for frames in part.values() for frame in frames)
+
+def monster_species(*path):
+	return { file.split('.')[0]: file.split('.')[0] for _, _, file_names in walk(join(BASE_DIR,*path)) for file in file_names }
+
+def species_pixels(width: int, name: str, *path):
+	# frames and outlines of one species, baked into a pack of their own; runs on the cache's worker, so pixels only
+	pack = AssetPack(join(CACHE_DIR,'monsters',f'{name}.pack'))
+	sources = source_files(*path,f'{name}.png')
+	pack.register('frames',sources,lambda: monster_pixels(4,2,*path,name))
+	pack.register(f'outlines {width}',sources,lambda: outline_pixels(pack.pixels('frames'),width))
+	pack.load()
+	return {'frames': pack.pixels('frames'), 'outlines': pack.pixels(f'outlines {width}')}
+
+def monster_cache(width: int, *path):
+	# species are restored from their packs on first use, or ahead of time through prefetch; surfaces are made on the main thread
+	return LazyCache(monster_species(*path),lambda name: species_pixels(width,name,*path),frames_nbytes,budget=MONSTER_FRAMES_BUDGET,pinned=(),finish=surfaces)
 
 def attack_importer(*path) -> dict[str, list[pygame.Surface]]:
 	attack_dict: dict[str, list[pygame.Surface]] = {}
@@ -138,7 +228,7 @@ def audio_importer(*path):
 		for file in file_names:
 			name = file.split(".")[0]
 			full_path = join(folder_path,file)
-			audio_dict[name] = pygame.mixer.Sound(full_path)
+			audio_dict[name] = load_sound(full_path)
 	return audio_dict
 
 
@@ -0,0 +1,49 @@
+from collections import OrderedDict
+
+from settings import *
+
+
+class TextCache():
+    """Rendered text surfaces shared by all UI code, least recently used first out.
+
+    Surfaces are keyed by (font, text, antialias, color) and kept while their
+    total size stays under `budget` bytes. Callers must treat the returned
+    surfaces as read-only.
+    """
+
+    def __init__(self, budget: int = TEXT_CACHE_BUDGET):
+        self.budget = budget
+        self.surfaces: OrderedDict[tuple, pygame.Surface] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def render(self, font: pygame.Font, text: str, antialias: bool, color: pygame.typing.ColorLike) -> pygame.Surface:
+        key = (font,text,antialias,tuple(color) if isinstance(color,pygame.Color) else color)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surf
+
+        self.misses += 1
+        surf = font.render(text,antialias,color)
+        self.surfaces[key] = surf
+        self.nbytes += surf.width * surf.height * surf.get_bytesize()
+        while self.nbytes > self.budget and len(self.surfaces) > 1:
+            _, evicted = self.surfaces.popitem(last=False)
+            self.nbytes -= evicted.width * evicted.height * evicted.get_bytesize()
+        return surf
+
+    def clear(self):
+        self.surfaces.clear()
+        self.nbytes = 0
+
+
+text_cache = TextCache()
+
+def render_text(font: pygame.Font, text: str, antialias: bool, color: pygame.typing.ColorLike) -> pygame.Surface:
+    return text_cache.render(font,text,antialias,color)
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from typing import Any, Callable
+
+from settings import *
+
+
+class TransformCache():
+    """Surfaces derived from other surfaces, least recently used first out.
+
+    Results are keyed by the source surface and the operation with its
+    arguments. Each entry keeps its source alive so the key can never be
+    reused by another surface. Entries are dropped once the derived surfaces
+    add up to more than `budget` bytes. Callers must treat results as
+    read-only.
+    """
+
+    def __init__(self, budget: int = TRANSFORM_CACHE_BUDGET):
+        self.budget = budget
+        self.entries: OrderedDict[tuple, tuple[pygame.Surface, Any, int]] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, surf: pygame.Surface, operation: str, func: Callable[[], Any], *args) -> Any:
+        key = (id(surf),operation,*args)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        result = func()
+        size = result.width * result.height * result.get_bytesize() if isinstance(result,pygame.Surface) else 0
+        self.entries[key] = (surf,result,size)
+        self.nbytes += size
+        while self.nbytes > self.budget and len(self.entries) > 1:
+            _, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.nbytes -= evicted_size
+        return result
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+
+transform_cache = TransformCache()
+
+def flip(surf: pygame.Surface, flip_x: bool, flip_y: bool) -> pygame.Surface:
+    return transform_cache.get(surf,'flip',lambda: pygame.transform.flip(surf,flip_x,flip_y),flip_x,flip_y)
+
+def grayscale(surf: pygame.Surface) -> pygame.Surface:
+    return transform_cache.get(surf,'grayscale',lambda: pygame.transform.grayscale(surf))
+
+def scale_by(surf: pygame.Surface, factor: float) -> pygame.Surface:
+    return transform_cache.get(surf,'scale_by',lambda: pygame.transform.scale_by(surf,factor),factor)
+
+def scale2x(surf: pygame.Surface) -> pygame.Surface:
+    return transform_cache.get(surf,'scale2x',lambda: pygame.transform.scale2x(surf))
+
+def silhouette(surf: pygame.Surface) -> pygame.Surface:
+    def create():
+        white_surf = pygame.mask.from_surface(surf).to_surface()
+        white_surf.set_colorkey('black')
+        return white_surf
+    return transform_cache.get(surf,'silhouette',create)
+
+def bounding_rects(surf: pygame.Surface) -> tuple[pygame.Rect, ...]:
+    return transform_cache.get(surf,'bounding_rects',lambda: tuple(pygame.mask.from_surface(surf).get_bounding_rects()))